@@ -0,0 +1,217 @@
+# app/accounts.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.email_sender import send_emails
+from app.journal import campaign_key, recipient_key
+
+
+# Multi-account settings
+SENDER_DAILY_QUOTA = int(os.getenv("SENDER_DAILY_QUOTA", "0"))  # per mailbox, 0 = unlimited
+SENDER_SHARDING = os.getenv("SENDER_SHARDING", "weight").lower()  # "weight" or "quota"
+QUOTA_WINDOW = 24 * 3600
+
+
+class SenderAccount:
+    def __init__(self, address, password, display_name=None, weight=1, daily_quota=SENDER_DAILY_QUOTA):
+        if not address or not password:
+            raise ValueError("❌ Укажите почту и пароль приложения")
+        try:
+            weight = float(weight)
+            daily_quota = int(daily_quota or 0)
+        except (TypeError, ValueError):
+            raise ValueError("❌ Вес и квота должны быть числами")
+        if weight <= 0:
+            raise ValueError("❌ Вес ящика должен быть больше нуля")
+        if daily_quota < 0:
+            raise ValueError("❌ Дневная квота не может быть отрицательной")
+        self.address = address
+        self.password = password
+        self.display_name = display_name or default_display_name(address)
+        self.weight = weight
+        self.daily_quota = daily_quota
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['address'], data['password'], data.get('display_name'), data.get('weight', 1),
+                   data.get('daily_quota', SENDER_DAILY_QUOTA))
+
+    def to_dict(self):
+        return {
+            'address': self.address,
+            'password': self.password,
+            'display_name': self.display_name,
+            'weight': self.weight,
+            'daily_quota': self.daily_quota
+        }
+
+    def remaining_quota(self, journal=None, now=None):
+        # None means the mailbox has no configured limit
+        if not self.daily_quota:
+            return None
+        used = journal.sent_since(self.address, (now or time.time()) - QUOTA_WINDOW) if journal else 0
+        return max(0, self.daily_quota - used)
+
+
+def default_display_name(address):
+    return address.split('@')[0].replace('.', ' ').title()
+
+
+def shard_sizes(total, weights, caps):
+    # Splits `total` proportionally to weights (largest remainder); an account that hits
+    # its cap (None = no cap) passes the rest of its share on to the others
+    sizes = [0] * len(weights)
+    active = [i for i, w in enumerate(weights) if w > 0 and (caps[i] is None or caps[i] > 0)]
+    left = total
+    while left and active:
+        weight_sum = sum(weights[i] for i in active)
+        exact = {i: left * weights[i] / weight_sum for i in active}
+        shares = {i: int(exact[i]) for i in active}
+        for i in sorted(active, key=lambda i: exact[i] - shares[i], reverse=True)[:left - sum(shares.values())]:
+            shares[i] += 1
+
+        saturated = set()
+        for i in active:
+            room = None if caps[i] is None else caps[i] - sizes[i]
+            take = shares[i] if room is None else min(shares[i], room)
+            sizes[i] += take
+            left -= take
+            if room is not None and take == room:
+                saturated.add(i)
+        if not saturated:
+            break
+        active = [i for i in active if i not in saturated]
+
+    if left:
+        capacity = total - left
+        raise ValueError(f"❌ Недостаточно дневной квоты: сегодня можно отправить ещё {capacity} из {total} писем")
+    return sizes
+
+
+def shard_contacts(contacts, accounts, journal=None, strategy=SENDER_SHARDING):
+    # Returns [(account, contacts)] with a contiguous slice of the list per mailbox
+    caps = [account.remaining_quota(journal) for account in accounts]
+    if strategy == "quota":
+        known = [cap for cap in caps if cap is not None]
+        unlimited = max(known) if known else 1
+        weights = [unlimited if cap is None else cap for cap in caps]
+    else:
+        weights = [account.weight for account in accounts]
+
+    sizes = shard_sizes(len(contacts), weights, caps)
+    shards = []
+    start = 0
+    for account, size in zip(accounts, sizes):
+        if size:
+            shards.append((account, contacts[start:start + size]))
+        start += size
+    return shards
+
+
+class ShardedReport:
+    # Totals per mailbox, fed with every result (including those of a mailbox that failed midway)
+
+    def __init__(self, campaign_id=None):
+        self.campaign_id = campaign_id
+        self.accounts = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, result):
+        outcome = result['status'] if result['status'] in ("sent", "skipped") else "failed"
+        with self._lock:
+            counts = self.accounts.setdefault(result.get('account'), {'sent': 0, 'failed': 0, 'skipped': 0})
+            counts[outcome] += 1
+
+    def _total(self, outcome):
+        with self._lock:
+            return sum(counts[outcome] for counts in self.accounts.values())
+
+    @property
+    def sent(self):
+        return self._total('sent')
+
+    @property
+    def failed(self):
+        return self._total('failed')
+
+    @property
+    def skipped(self):
+        return self._total('skipped')
+
+    def per_account(self):
+        with self._lock:
+            summary = {address: dict(counts, error=None) for address, counts in self.accounts.items() if address}
+        for address, error in self.errors.items():
+            summary.setdefault(address, {'sent': 0, 'failed': 0, 'skipped': 0})['error'] = error
+        return summary
+
+
+def send_sharded(accounts, contacts, cc_addresses, brand, period, doc, template_text, on_result=None, journal=None,
+                 resume=False, strategy=SENDER_SHARDING, campaign_id=None, **options):
+    # One send_emails run per mailbox, all in parallel. The campaign id is derived from the
+    # first account and the whole list, so a resumed campaign finds its deliveries however it is re-sharded
+    campaign_id = campaign_id or campaign_key(accounts[0].address, contacts, cc_addresses, brand, period, doc,
+                                              template_text)
+    report = ShardedReport(campaign_id)
+
+    def record(result):
+        report.record(result)
+        if on_result:
+            on_result(result)
+
+    if journal and resume:
+        done = journal.delivered(campaign_id)
+        pending = []
+        for contact in contacts:
+            if recipient_key(contact) in done:
+                result = {'email': contact['email'], 'recipients': [], 'status': "skipped", 'error': None,
+                          'seconds': None, 'account': None}
+                record(result)
+            else:
+                pending.append(contact)
+        contacts = pending
+
+    if not contacts:
+        return report
+
+    shards = shard_contacts(contacts, accounts, journal=journal, strategy=strategy)
+
+    def run(account, shard):
+        return send_emails(
+            my_address=account.address,
+            password=account.password,
+            contacts=shard,
+            cc_addresses=cc_addresses,
+            brand=brand,
+            period=period,
+            doc=doc,
+            template_text=template_text,
+            display_name=account.display_name,
+            on_result=record,
+            journal=journal,
+            campaign_id=campaign_id,
+            **options
+        )
+
+    if len(shards) == 1:
+        run(*shards[0])
+        return report
+
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="account") as executor:
+        futures = [(account, executor.submit(run, account, shard)) for account, shard in shards]
+    failures = []
+    for account, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            report.errors[account.address] = str(e)
+            failures.append(e)
+
+    # One mailbox failing leaves the others' results standing; only a total failure aborts the campaign
+    if len(failures) == len(shards):
+        raise failures[0]
+    return report
@@ -0,0 +1,312 @@
+# app/async_smtp.py
+
+import asyncio
+import base64
+import os
+import re
+import smtplib
+import socket
+import ssl
+from functools import lru_cache
+
+from app.metrics import span
+from app.smtp_pool import DISCONNECT_ERRORS
+
+
+# Async transport settings
+SMTP_ASYNC_TIMEOUT = float(os.getenv("SMTP_ASYNC_TIMEOUT", "60"))
+
+CRLF = b"\r\n"
+_EOL_RE = re.compile(rb'(?:\r\n|\n|\r(?!\n))')
+_LEADING_DOT_RE = re.compile(rb'(?m)^\.')
+
+
+@lru_cache(maxsize=1)
+def local_hostname():
+    return socket.getfqdn()
+
+
+def _b64(text):
+    return base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def quote_data(data):
+    # Same transformation smtplib.sendmail applies before DATA
+    data = _LEADING_DOT_RE.sub(b'..', _EOL_RE.sub(CRLF, data))
+    if not data.endswith(CRLF):
+        data += CRLF
+    return data + b"." + CRLF
+
+
+class AsyncSMTP:
+    # A minimal asyncio SMTP client: EHLO, STARTTLS, AUTH PLAIN/LOGIN and sendmail.
+    # Errors are the smtplib exceptions, so callers handle both transports the same way
+
+    def __init__(self, host, port, protocol="SSL", timeout=SMTP_ASYNC_TIMEOUT, context=None):
+        self.host = host
+        self.port = port
+        self.protocol = protocol.upper()
+        self.timeout = timeout
+        self.context = context or ssl.create_default_context()
+        self.features = {}
+        self._reader = None
+        self._writer = None
+
+    @property
+    def pipelining(self):
+        return 'pipelining' in self.features
+
+    async def connect(self):
+        context = self.context if self.protocol == "SSL" else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), self.timeout
+        )
+        code, message = await self.read_reply()
+        if code != 220:
+            self.abort()
+            raise smtplib.SMTPConnectError(code, message)
+
+        await self.ehlo()
+        if self.protocol == "STARTTLS":
+            if 'starttls' not in self.features:
+                raise smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server.")
+            code, message = await self.command("STARTTLS")
+            if code != 220:
+                raise smtplib.SMTPResponseException(code, message)
+            await self._writer.start_tls(self.context, server_hostname=self.host)
+            await self.ehlo()
+
+    async def read_reply(self):
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except ConnectionError:
+                self.abort()
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            if not line:
+                self.abort()
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            try:
+                code = int(line[:3])
+            except ValueError:
+                code = -1
+            lines.append(line[4:].strip())
+            if line[3:4] != b"-":
+                break
+        if code == 421:
+            # The server is closing the channel; the reply is still reported to the caller
+            self.abort()
+        return code, b"\n".join(lines)
+
+    def write(self, *lines):
+        if self._writer is None:
+            raise smtplib.SMTPServerDisconnected("please run connect() first")
+        self._writer.write(b"".join(line.encode('utf-8') + CRLF for line in lines))
+
+    async def command(self, line):
+        self.write(line)
+        await self._writer.drain()
+        return await self.read_reply()
+
+    async def ehlo(self):
+        code, message = await self.command(f"EHLO {local_hostname()}")
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, message)
+        self.features = {}
+        for line in message.decode('latin-1').split('\n')[1:]:
+            keyword, _, params = line.partition(' ')
+            self.features[keyword.lower()] = params.strip()
+
+    async def login(self, user, password):
+        if 'auth' not in self.features:
+            raise smtplib.SMTPNotSupportedError("SMTP AUTH extension not supported by server.")
+        mechanisms = self.features['auth'].upper().split()
+
+        if 'PLAIN' in mechanisms:
+            code, message = await self.command(f"AUTH PLAIN {_b64(chr(0) + user + chr(0) + password)}")
+        elif 'LOGIN' in mechanisms:
+            code, message = await self.command("AUTH LOGIN")
+            if code == 334:
+                code, message = await self.command(_b64(user))
+            if code == 334:
+                code, message = await self.command(_b64(password))
+        else:
+            raise smtplib.SMTPException("No suitable authentication method found.")
+
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, message)
+
+    async def rset(self):
+        try:
+            await self.command("RSET")
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    async def sendmail(self, from_addr, to_addrs, data):
+        # Returns the refused recipients like smtplib.sendmail; with PIPELINING the
+        # envelope goes out in one write and the replies are read back in order
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        envelope = [f"MAIL FROM:<{from_addr}>"] + [f"RCPT TO:<{addr}>" for addr in to_addrs]
+
+        replies = []
+        if self.pipelining:
+            self.write(*envelope, "DATA")
+            await self._writer.drain()
+            for _ in range(len(envelope) + 1):
+                replies.append(await self.read_reply())
+                if replies[-1][0] == 421:
+                    break
+        else:
+            for line in envelope:
+                replies.append(await self.command(line))
+                if replies[0][0] != 250 or replies[-1][0] == 421:
+                    break
+            if len(replies) == len(envelope) and any(code in (250, 251) for code, _ in replies[1:]):
+                replies.append(await self.command("DATA"))
+
+        if replies[-1][0] == 421:
+            # The server dropped the session mid-transaction
+            raise smtplib.SMTPResponseException(*replies[-1])
+
+        mail_reply, rcpt_replies = replies[0], replies[1:len(envelope)]
+        data_reply = replies[len(envelope)] if len(replies) > len(envelope) else None
+        refused = {
+            addr: reply for addr, reply in zip(to_addrs, rcpt_replies) if reply[0] not in (250, 251)
+        }
+
+        if data_reply and data_reply[0] == 354 and (mail_reply[0] != 250 or len(refused) == len(to_addrs)):
+            # Only a broken server accepts DATA here; end it without a body
+            self.write(".")
+            await self._writer.drain()
+            await self.read_reply()
+            data_reply = None
+
+        if mail_reply[0] != 250:
+            await self.rset()
+            raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+        if len(refused) == len(to_addrs):
+            await self.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if data_reply[0] != 354:
+            await self.rset()
+            raise smtplib.SMTPDataError(*data_reply)
+
+        self._writer.write(quote_data(data))
+        await self._writer.drain()
+        code, message = await self.read_reply()
+        if code != 250:
+            if code != 421:
+                await self.rset()
+            raise smtplib.SMTPDataError(code, message)
+        return refused
+
+    async def quit(self):
+        try:
+            await self.command("QUIT")
+        except (smtplib.SMTPException, OSError, asyncio.TimeoutError):
+            pass
+        self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.transport.abort()
+        self.close()
+
+
+class AsyncSMTPPool:
+    # Asyncio counterpart of SMTPConnectionPool: up to `size` logged-in sessions on one event loop
+
+    def __init__(self, user, password, host, port, protocol="SSL", size=1, timeout=SMTP_ASYNC_TIMEOUT):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.protocol = protocol.upper()
+        self.size = max(1, int(size))
+        self.timeout = timeout
+
+        self._idle = []
+        self._clients = set()
+        self._slots = asyncio.Semaphore(self.size)
+        self._closed = False
+
+    async def __aenter__(self):
+        # Log in once up front so bad credentials fail before any message is queued
+        self._idle.append(await self._connect())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def _connect(self):
+        with span("smtp_login"):
+            client = AsyncSMTP(self.host, self.port, self.protocol, timeout=self.timeout)
+            self._clients.add(client)
+            try:
+                await client.connect()
+                await client.login(self.user, self.password)
+            except BaseException:
+                self._discard(client)
+                raise
+            return client
+
+    def _discard(self, client):
+        self._clients.discard(client)
+        client.abort()
+
+    async def acquire(self):
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, client, broken=False):
+        if broken or self._closed:
+            self._discard(client)
+        else:
+            self._idle.append(client)
+        self._slots.release()
+
+    async def sendmail(self, from_addr, to_addrs, data, retries=1):
+        # A dropped connection is replaced with a fresh login and the message is sent again
+        for attempt in range(retries + 1):
+            client = await self.acquire()
+            try:
+                result = await client.sendmail(from_addr, to_addrs, data)
+            except DISCONNECT_ERRORS:
+                self.release(client, broken=True)
+                if attempt == retries:
+                    raise
+            except smtplib.SMTPResponseException as e:
+                self.release(client, broken=e.smtp_code == 421)
+                raise
+            except smtplib.SMTPException:
+                self.release(client)
+                raise
+            except BaseException:
+                # A cancelled or half-written transaction leaves the session in an unknown state
+                self.release(client, broken=True)
+                raise
+            else:
+                self.release(client)
+                return result
+
+    async def close(self):
+        self._closed = True
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(client.quit() for client in idle))
+        for client in list(self._clients):
+            self._discard(client)
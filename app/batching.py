@@ -0,0 +1,55 @@
+# app/batching.py
+
+import os
+
+
+# Envelope planning settings
+SMTP_MERGE_ENVELOPES = os.getenv("SMTP_MERGE_ENVELOPES", "0") == "1"
+SMTP_MAX_RECIPIENTS = int(os.getenv("SMTP_MAX_RECIPIENTS", "35"))  # per transaction, To + Cc
+
+# Contact fields that end up in the subject or the body of a letter
+MESSAGE_FIELDS = ('city', 'mall', 'name', 'rim', 'link', 'min', 'sec')
+
+
+def email_domain(address):
+    return address.rpartition('@')[2].strip().lower()
+
+
+def message_key(contact):
+    # Two contacts with the same key get byte-identical letters apart from the To header
+    return (
+        email_domain(contact['email']),
+        tuple(str(contact.get(field, '')) for field in MESSAGE_FIELDS),
+        frozenset(contact.get('_cc_emails') or ()),
+    )
+
+
+def plan_envelopes(contacts, merge=SMTP_MERGE_ENVELOPES, max_recipients=SMTP_MAX_RECIPIENTS, cc_addresses=()):
+    # Orders contacts by recipient domain (stable, so the file order holds within a domain).
+    # With merge, contacts of one domain whose letters only differ in To share one
+    # multi-RCPT transaction: the envelope keeps the first contact's fields, lists every
+    # address in _to_emails and the original contacts in _merged
+    ordered = sorted(contacts, key=lambda contact: email_domain(contact['email']))
+    if not merge:
+        return ordered
+
+    envelopes = []
+    open_envelopes = {}
+    for contact in ordered:
+        key = message_key(contact)
+        cc = set(cc_addresses) | set(contact.get('_cc_emails') or ())
+        envelope = open_envelopes.get(key)
+        if envelope is not None and len(envelope['_to_emails']) + 1 + len(cc) <= max_recipients \
+                and contact['email'] not in envelope['_to_emails']:
+            envelope['_to_emails'].append(contact['email'])
+            envelope['_merged'].append(contact)
+            continue
+        envelope = dict(contact, _to_emails=[contact['email']], _merged=[contact])
+        open_envelopes[key] = envelope
+        envelopes.append(envelope)
+    return envelopes
+
+
+def envelope_contacts(contact):
+    # The original contacts an envelope stands for
+    return contact.get('_merged') or [contact]
@@ -0,0 +1,73 @@
+# app/contacts.py
+
+import sys
+from collections.abc import Mapping
+
+
+# Columns of a normalized contact list (app.normalize), one letter per record
+CONTACT_FIELDS = ('city', 'mall', 'email', 'name', 'rim', 'link', 'min', 'sec', '_cc_emails')
+_FIELD_SET = frozenset(CONTACT_FIELDS)
+
+# Columns whose values repeat across many records of a list
+INTERNED_FIELDS = ('city', 'mall', 'name')
+
+
+class Contact(Mapping):
+    # A compact record in place of a to_dict() row: no per-record dict, interned city/mall/name
+    # strings, CC tuples shared between records. Reads like the dict it replaces
+    # (contact['email'], contact.get('rim', ''), dict(contact)), so the sender, batching and the
+    # journal take either
+
+    __slots__ = CONTACT_FIELDS
+
+    def __init__(self, city='', mall='', email='', name='', rim='', link='', min='', sec='', _cc_emails=()):
+        self.city = city
+        self.mall = mall
+        self.email = email
+        self.name = name
+        self.rim = rim
+        self.link = link
+        self.min = min
+        self.sec = sec
+        self._cc_emails = _cc_emails
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def __iter__(self):
+        return iter(CONTACT_FIELDS)
+
+    def __len__(self):
+        return len(CONTACT_FIELDS)
+
+    def __reduce__(self):
+        # Positional and compact on the way to a render process
+        return Contact, tuple(getattr(self, field) for field in CONTACT_FIELDS)
+
+    def __repr__(self):
+        return f"Contact({', '.join(f'{field}={getattr(self, field)!r}' for field in CONTACT_FIELDS)})"
+
+
+def contacts_from_frame(df):
+    # df: output of normalize_contacts -> list of Contact, built column by column
+    size = len(df)
+    columns = []
+    for field in CONTACT_FIELDS:
+        if field not in df.columns:
+            columns.append([() if field == '_cc_emails' else ''] * size)
+        elif field in INTERNED_FIELDS:
+            columns.append([sys.intern(value) for value in df[field].tolist()])
+        elif field == '_cc_emails':
+            shared = {(): ()}
+            columns.append([shared.setdefault(cc, cc) for cc in map(tuple, df[field].tolist())])
+        else:
+            columns.append(df[field].tolist())
+    return [Contact(*values) for values in zip(*columns)]
@@ -0,0 +1,71 @@
+# app/dead_letters.py
+
+import csv
+import os
+import smtplib
+import threading
+from datetime import datetime
+
+from app.rate_limit import reply_code
+
+
+# Dead letter settings
+DEAD_LETTER_DIR = os.getenv("DEAD_LETTER_DIR", "app/data/dead_letters")
+
+DEAD_LETTER_FIELDS = ['failed_at', 'email', 'recipients', 'city', 'mall', 'code', 'reason', 'attempts', 'account']
+
+_write_lock = threading.Lock()
+
+
+def reply_text(message):
+    return message.decode('utf-8', 'replace') if isinstance(message, bytes) else str(message)
+
+
+def describe_error(exc):
+    # The server's own words where there are any, rather than smtplib's repr of the reply
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return reply_text(exc.smtp_error)
+    if isinstance(exc, smtplib.SMTPRecipientsRefused) and exc.recipients:
+        return "; ".join(f"{address}: {reply_text(message)}" for address, (_, message) in exc.recipients.items())
+    return str(exc) or type(exc).__name__
+
+
+class DeadLetterFile:
+    # Recipients a campaign gave up on, one CSV row each with the last reply. The shards of a
+    # campaign append to the same file; utf-8-sig so that Excel opens it with Cyrillic intact
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_job(cls, job_id, directory=DEAD_LETTER_DIR):
+        return cls(os.path.join(directory, f"{job_id}.csv"))
+
+    def add(self, contact, recipients, error, attempts, account=None):
+        row = {
+            'failed_at': datetime.now().isoformat(timespec='seconds'),
+            'email': contact['email'],
+            'recipients': ", ".join(recipients),
+            'city': contact.get('city', ''),
+            'mall': contact.get('mall', ''),
+            'code': reply_code(error) or '',
+            'reason': describe_error(error),
+            'attempts': attempts,
+            'account': account or '',
+        }
+        with _write_lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            new = not os.path.exists(self.path)
+            with open(self.path, 'a', encoding='utf-8-sig' if new else 'utf-8', newline='') as file:
+                writer = csv.DictWriter(file, DEAD_LETTER_FIELDS)
+                if new:
+                    writer.writeheader()
+                writer.writerow(row)
+        return row
+
+    def rows(self):
+        try:
+            with open(self.path, encoding='utf-8-sig', newline='') as file:
+                return list(csv.DictReader(file))
+        except FileNotFoundError:
+            return []
@@ -0,0 +1,146 @@
+# app/disk_cache.py
+
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from importlib.util import find_spec
+
+# pyarrow is optional (without it entries are stored as pickles) and only imported on first use
+ARROW_AVAILABLE = find_spec('pyarrow') is not None
+
+
+# Disk cache settings
+DISK_CACHE_DIR = os.getenv("DISK_CACHE_DIR", "app/data/cache")
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+DISK_CACHE_TTL = int(os.getenv("DISK_CACHE_TTL", str(7 * 24 * 3600)))
+
+INDEX_COLUMN = '_row'
+# Tokens are sha256 hex digests (parse_cache.content_hash); anything else never touches the disk
+TOKEN_RE = re.compile(r'[0-9a-f]{64}')
+
+
+class FrameDiskCache:
+    # Parsed upload frames on disk, one file per content hash, shared by every worker process.
+    # Arrow IPC (memory-mapped on read) when pyarrow is installed, pickle otherwise.
+    # A hit refreshes the file's mtime; eviction drops entries unused for `ttl` seconds,
+    # then the least recently used ones until the directory fits in `max_bytes`.
+    # `version` is part of every file name: frames written by an older reader are never read
+    # back, and age out like any other unused entry
+
+    def __init__(self, directory=DISK_CACHE_DIR, max_bytes=DISK_CACHE_MAX_BYTES, ttl=DISK_CACHE_TTL,
+                 clock=time.time, use_arrow=None, version=0):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self.use_arrow = ARROW_AVAILABLE if use_arrow is None else use_arrow
+        self.suffix = ".arrow" if self.use_arrow else ".pkl"
+        self._lock = threading.Lock()
+
+    def path(self, token):
+        return os.path.join(self.directory, f"{token}.v{self.version}{self.suffix}")
+
+    def get(self, token):
+        if not TOKEN_RE.fullmatch(token or ''):
+            return None
+        path = self.path(token)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime + self.ttl <= self._clock():
+            self._remove(path)
+            return None
+        try:
+            df = self._read(path)
+        except Exception:
+            # A truncated or foreign file is dropped and the upload parsed again
+            self._remove(path)
+            return None
+        now = self._clock()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return df
+
+    def put(self, token, df):
+        if not TOKEN_RE.fullmatch(token):
+            raise ValueError(f"Invalid cache token: {token!r}")
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            self._write(df, tmp_path)
+            # Another worker may write the same token concurrently; either copy is complete
+            os.replace(tmp_path, self.path(token))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+        return df
+
+    def _write(self, df, path):
+        if self.use_arrow:
+            import pyarrow.feather as feather
+
+            # Feather keeps no pandas index; the excel row numbers travel as a column.
+            # Uncompressed, so reads can map the file instead of decoding it
+            frame = df.rename_axis(INDEX_COLUMN).reset_index()
+            feather.write_feather(frame, path, compression='uncompressed')
+        else:
+            with open(path, 'wb') as file:
+                pickle.dump(df, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _read(self, path):
+        if self.use_arrow:
+            import pyarrow.feather as feather
+
+            table = feather.read_table(path, memory_map=True)
+            return table.to_pandas().set_index(INDEX_COLUMN).rename_axis(None)
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        # [(mtime, size, path)] of cached frames, oldest first
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        with self._lock:
+            now = self._clock()
+            entries = []
+            for mtime, size, path in self.entries():
+                if mtime + self.ttl <= now:
+                    self._remove(path)
+                else:
+                    entries.append((mtime, size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
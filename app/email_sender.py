@@ -1,98 +1,57 @@
 # app/email_sender.py
 
+import asyncio
 import smtplib
-import ssl
-import re
-import pandas as pd
 import os
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
+import threading
+import time
+from functools import partial
 from string import Template
-from pathlib import Path
+
+from app.smtp_pool import SMTPConnectionPool
+from app.async_smtp import AsyncSMTPPool
+from app.rate_limit import TEMPORARY_CODES, get_limiter, is_fatal, is_temporary, is_transient, reply_code
+from app.retry import SMTP_RETRY_BASE, RetryQueue
+from app.metrics import messages_total, retries_total, smtp_replies_total, stage_seconds
+from app.journal import campaign_key, recipient_key
+from app.contacts import contacts_from_frame
+from app.suppression import hard_bounces
+from app.readers import UPLOAD_COLUMNS, read_frame
+from app.normalize import normalize_contacts, check_template
+from app.templating import compile_template
+from app.batching import SMTP_MERGE_ENVELOPES, SMTP_MAX_RECIPIENTS, envelope_contacts, plan_envelopes
+from app.mime_pipeline import (
+    RENDER_PROCESSES, StageTimings, make_renderer, iter_rendered, run_pipeline, run_pipeline_async
+)
 
 
 # SMTP settings
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.yandex.ru")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
 SMTP_PROTOCOL = os.getenv("SMTP_PROTOCOL", "SSL").upper()
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_TEMP_RETRIES = int(os.getenv("SMTP_TEMP_RETRIES", "3"))  # further attempts after a transient failure
+# "threads" (smtplib, one thread per connection) or "asyncio" (all connections on one event loop)
+SMTP_TRANSPORT = os.getenv("SMTP_TRANSPORT", "threads").lower()
+# Sessions the asyncio transport opens to one mailbox; the same as the threaded pool unless raised on
+# purpose for a relay that allows it, since public providers throttle or block a mailbox that opens dozens
+SMTP_ASYNC_POOL_SIZE = int(os.getenv("SMTP_ASYNC_POOL_SIZE", str(SMTP_POOL_SIZE)))
 
 
-def get_contacts_from_excel(filepath, template_text=None, doc=None):
-    df = pd.read_excel(filepath)
-    cols = [c for c in ['email', 'name', 'mall', 'city', 'rim'] if c in df.columns]
-    if 'email' not in cols:
-        raise ValueError("❌ Нет обязательного столбца: email")
-    
-    df = df[cols].fillna('').astype(str).apply(lambda x: x.str.strip())
-    
-    
-    email_regex = r'^[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}$'
-    contacts = []
-    for idx, row in df.iterrows():
-        parts = split_emails(row['email'])
-        if not parts:
-            raise ValueError(f"❌ Строка {idx + 2} не содержит email. Удалите её или заполните.")
-        for e in parts:
-            if not re.match(email_regex, e):
-                raise ValueError(f"❌ Неверный формат email: {e} в строке {idx + 2}")
-        primary = parts[0]
-        cc = parts[1:]
-        contact = {
-            'email': primary,
-            'name': row.get('name', ''),
-            'mall': row.get('mall', ''),
-            'city': row.get('city', ''),
-            'rim': row.get('rim', ''),
-            '_cc_emails': cc
-        }
-        contacts.append(contact)
-    
-    df = pd.DataFrame(contacts)
-    for col in ['email', 'name', 'mall', 'city', 'rim']:
-        if col in df.columns:
-            df[col] = df[col].fillna('').astype(str).str.strip()
-    
-    if 'name' in df.columns:
-        df.loc[df['name'] == '', 'name'] = 'Коллеги'
-    
-    # Group by city,mall,email,name and concatenate rim with newline
-    if 'rim' in df.columns:
-        agg_map = {'rim': lambda x: '\n'.join(filter(lambda v: v != '', map(str, x)))}
-        if '_cc_emails' in df.columns:
-            agg_map['_cc_emails'] = lambda lists: list({email for lst in lists for email in (lst if isinstance(lst, list) else [lst]) if email})
-        df = df.groupby(['city', 'mall', 'email', 'name'], as_index=False).agg(agg_map)
-
-    if template_text:
-        required_map = {
-            "RIM": "rim",
-            "LINK": "link",
-            "MIN": "min",
-            "SEC": "sec"
-        }
-        placeholders = set(re.findall(r"\$\{(\w+)\}", template_text))
+def get_contacts_from_excel(filepath, template_text=None, doc=None, add_prefix=False):
+    return get_contacts_from_frame(read_frame(filepath, UPLOAD_COLUMNS), template_text=template_text, doc=doc,
+                                   add_prefix=add_prefix)
 
-        needed_columns = [required_map[p] for p in placeholders if p in required_map]
-        missing_cols = [col for col in needed_columns if col not in df.columns]
-        if missing_cols:
-            raise ValueError(f"❌ Нет необходимого столбца(ов): {', '.join(missing_cols)}")
 
-        empty_required = []
-        for ph, col in required_map.items():
-            if ph in placeholders and col in df.columns:
-                if df[col].fillna('').astype(str).str.strip().eq('').any():
-                    empty_required.append(col)
-        if empty_required:
-            raise ValueError(
-                "❌ В обязательных столбцах есть пустые значения: "
-                + ", ".join(empty_required)
-                + ". Заполните их или удалите строки."
-            )
+def get_contacts_from_frame(frame, template_text=None, doc=None, add_prefix=False):
+    return prepare_contacts(normalize_contacts(frame, add_prefix=add_prefix), template_text=template_text, doc=doc)
 
-        if "DOC" in placeholders and not (doc and str(doc).strip()):
-            raise ValueError("❌ Нет необходимого поля doc (ссылка)")
 
-    return df.to_dict(orient='records')
+def prepare_contacts(df, template_text=None, doc=None):
+    # df: output of normalize_contacts
+    placeholders = compile_template(template_text).placeholders if template_text else None
+    check_template(df, {'template_text': template_text, 'doc': doc, 'placeholders': placeholders})
+    return contacts_from_frame(df)
 
 
 def read_template(template_path):
@@ -100,64 +59,253 @@ def read_template(template_path):
         return Template(file.read())
 
 
-def send_emails(my_address, password, contacts, cc_addresses, brand, period, doc, template_text, display_name):
-    template = Template(template_text)
-    context = ssl.create_default_context()
+class SendReport:
+    def __init__(self, account=None):
+        self.account = account
+        self.results = []
+        self.campaign_id = None
+        self.timings = StageTimings()
+        self._lock = threading.Lock()
+
+    def add(self, email, recipients, status="sent", error=None, seconds=None):
+        result = {
+            'email': email,
+            'recipients': recipients,
+            'status': status,
+            'error': error,
+            'seconds': seconds,
+            'account': self.account
+        }
+        with self._lock:
+            self.results.append(result)
+        return result
+
+    @property
+    def sent(self):
+        return sum(1 for r in self.results if r['status'] == "sent")
+
+    @property
+    def failed(self):
+        return sum(1 for r in self.results if r['status'] == "failed")
+
+    @property
+    def skipped(self):
+        return sum(1 for r in self.results if r['status'] == "skipped")
+
+    def __len__(self):
+        return len(self.results)
+
+
+def mixed_refusal(refused):
+    # Both temporary (4xx) and permanent (5xx) replies among the refused recipients
+    classes = {code // 100 for code, _ in refused.values()}
+    return classes >= {4, 5}
+
+
+def record_replies(refused, recipients):
+    # sendmail only returns the recipients it refused; the rest got 250
+    refused = refused or {}
+    for code, _ in refused.values():
+        smtp_replies_total.inc(code=code)
+    if recipients > len(refused):
+        smtp_replies_total.inc(recipients - len(refused), code=250)
+
+
+def send_emails(my_address, password, contacts, cc_addresses, brand, period, doc, template_text, display_name,
+                pool_size=None, on_result=None, limiter=None, journal=None, campaign_id=None, resume=False,
+                render_processes=None, transport=None, merge_envelopes=None, dead_letters=None, retry_base=None,
+                suppression=None):
+    # A failed message never stops the others: transient failures (4xx, dropped connection) are
+    # retried later with backoff, permanent ones are recorded and go to dead_letters. Only errors
+    # of the session itself (login, our From refused) end the run. Recipients refused with a 5xx
+    # go to the suppression list, if there is one, so later campaigns skip them
+    template = compile_template(template_text).bind(BRAND=brand, PERIOD=period, DOC=doc or "")
     cc_addresses = cc_addresses or []
+    report = SendReport(account=my_address)
+    limiter = limiter or get_limiter(my_address)
+    transport = (transport or SMTP_TRANSPORT).lower()
+    retries = RetryQueue(base=SMTP_RETRY_BASE if retry_base is None else retry_base)
+
+    if journal and not campaign_id:
+        campaign_id = campaign_key(my_address, contacts, cc_addresses, brand, period, doc, template_text)
+    report.campaign_id = campaign_id
 
-    if SMTP_PROTOCOL == "SSL":
-        server_cm = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context)
-    else:
-        server_cm = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    def finish(contact, result):
+        if journal:
+            journal.record(campaign_id, contact, result)
+        if on_result:
+            on_result(result)
 
-    with server_cm as server:
-        server.set_debuglevel(1)
-        server.ehlo()
-        if SMTP_PROTOCOL == "STARTTLS":
-            server.starttls(context=context)
-            server.ehlo()
+    def timed(start):
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(seconds, stage="smtp_send")
+        return seconds
 
-        server.login(my_address, password)
+    def retry_later(item, attempt, e):
+        smtp_replies_total.inc(code=reply_code(e) or "error")
+        retries_total.inc()
+        if is_temporary(e):
+            limiter.backoff()
+        retries.push(item, attempt + 1)
 
+    def suppress(refused):
+        if suppression is not None:
+            suppression.add_many(hard_bounces(refused), source=my_address)
+
+    def delivered(item, attempt, refused, elapsed):
+        contact, recipients, data = item
+        limiter.success()
+        record_replies(refused, len(recipients))
+        suppress(refused)
+        report.timings.add('send', elapsed)
+        settle_members(item, attempt, refused or {}, elapsed)
+
+    def settle_members(item, attempt, refused, elapsed):
+        # Per-recipient replies decide each member of the envelope on its own: accepted ones are
+        # sent, a 4xx gets the message again for that address alone, a 5xx fails the member.
+        # Refused CC addresses with a 4xx go along with the first member that is retried
+        contact, recipients, data = item
+        members = envelope_contacts(contact)
+        own = {member['email'] for member in members}
+        pending_cc = [address for address in recipients
+                      if address not in own and address in refused and 400 <= refused[address][0] < 500]
+        for member in members:
+            reply = refused.get(member['email'])
+            if reply is None:
+                messages_total.inc(outcome="sent")
+                finish(member, report.add(member['email'], recipients, seconds=elapsed))
+            elif 400 <= reply[0] < 500 and attempt < SMTP_TEMP_RETRIES:
+                retries_total.inc()
+                retries.push((member, [member['email']] + pending_cc, data), attempt + 1)
+                pending_cc = []
+            else:
+                refusal = smtplib.SMTPRecipientsRefused({member['email']: reply})
+                failed_member(member, recipients, refusal, elapsed, attempt + 1)
+
+    def failed(contact, recipients, e, elapsed, attempts):
+        smtp_replies_total.inc(code=reply_code(e) or "error")
+        report.timings.add('send', elapsed)
+        if isinstance(e, smtplib.SMTPRecipientsRefused):
+            suppress(e.recipients)
+        for member in envelope_contacts(contact):
+            failed_member(member, recipients, e, elapsed, attempts)
+
+    def failed_member(member, recipients, e, elapsed, attempts):
+        messages_total.inc(outcome="failed")
+        finish(member, report.add(member['email'], recipients, status="failed", error=str(e), seconds=elapsed))
+        if dead_letters is not None and not is_fatal(e):
+            dead_letters.add(member, recipients, e, attempts, account=my_address)
+
+    def settle(item, attempt, e, elapsed):
+        # Decides the fate of a failed attempt; True when the whole run has to stop
+        contact, recipients, _ = item
+        if is_fatal(e):
+            failed(contact, recipients, e, elapsed, attempt + 1)
+            retries.close()
+            return True
+        if isinstance(e, smtplib.SMTPRecipientsRefused) and mixed_refusal(e.recipients):
+            # Some addresses only have to wait, others are gone: only the former are sent again
+            record_replies(e.recipients, len(recipients))
+            suppress(e.recipients)
+            report.timings.add('send', elapsed)
+            if any(code in TEMPORARY_CODES for code, _ in e.recipients.values()):
+                limiter.backoff()
+            settle_members(item, attempt, e.recipients, elapsed)
+        elif is_transient(e) and attempt < SMTP_TEMP_RETRIES:
+            retry_later(item, attempt, e)
+        else:
+            failed(contact, recipients, e, elapsed, attempt + 1)
+        return False
+
+    def transmit(pool, entry):
+        attempt, item = entry
+        contact, recipients, data = item
+        elapsed = 0.0
+        try:
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                refused = pool.sendmail(my_address, recipients, data)
+            finally:
+                elapsed = timed(start)
+        except Exception as e:
+            if settle(item, attempt, e, elapsed):
+                raise
+        else:
+            delivered(item, attempt, refused, elapsed)
+        finally:
+            retries.done()
+
+    async def transmit_async(pool, entry):
+        attempt, item = entry
+        contact, recipients, data = item
+        elapsed = 0.0
+        try:
+            await limiter.acquire_async()
+            start = time.perf_counter()
+            try:
+                refused = await pool.sendmail(my_address, recipients, data)
+            finally:
+                elapsed = timed(start)
+        except Exception as e:
+            if settle(item, attempt, e, elapsed):
+                raise
+        else:
+            delivered(item, attempt, refused, elapsed)
+        finally:
+            retries.done()
+
+    def closing_feed(consume):
+        # An error escaping a send (journal, on_result, dead letters) stops run_pipeline, whose
+        # workers then skip the queued items without settling them; closing the feed keeps it
+        # from waiting on those forever
+        def run(entry):
+            try:
+                consume(entry)
+            except BaseException:
+                retries.close()
+                raise
+        return run
+
+    async def send_async(rendered, size):
+        async with AsyncSMTPPool(my_address, password, SMTP_HOST, SMTP_PORT, SMTP_PROTOCOL, size=size) as pool:
+            await run_pipeline_async(retries.feed_async(rendered), partial(transmit_async, pool),
+                                     concurrency=pool.size)
+
+    if journal and resume:
+        done = journal.delivered(campaign_id)
+        pending = []
         for contact in contacts:
-            msg = MIMEMultipart()
-            
-            mall_name = contact['mall'].replace('"', '')
-            
-            message = template.safe_substitute(
-                NAME=contact['name'],
-                BRAND=brand,
-                PERIOD=period,
-                MALL=mall_name,
-                RIM=contact.get('rim', ''),
-                LINK=contact.get('link', ''),
-                MIN=contact.get('min', ''),
-                SEC=contact.get('sec', ''),
-                DOC=doc or ""
-            )
-
-            contact_cc = contact.get('_cc_emails', [])
-            all_cc = list(set(cc_addresses + contact_cc))
-            
-            msg['From'] = formataddr((display_name, my_address))
-            msg['To'] = contact['email']
-            if all_cc:
-                msg['Cc'] = ", ".join(all_cc)
-
-            msg['Subject'] = f"{mall_name} (г. {contact['city']}) // {brand} // {period}"
-
-            msg.attach(MIMEText(message, 'plain'))
-            recipients = [contact['email']] + all_cc
-            server.send_message(msg, from_addr=my_address, to_addrs=recipients)
-            del msg
-
-
-def split_emails(email_str):
-    s = str(email_str)
-    for sep in [',', ';', '/', '|', ' и ']:
-        s = s.replace(sep, ' ')
-    parts = [p.strip() for p in s.split() if p.strip()]
-    return parts
+            if recipient_key(contact) in done:
+                result = report.add(contact['email'], [], status="skipped")
+                if on_result:
+                    on_result(result)
+            else:
+                pending.append(contact)
+        contacts = pending
+
+    if not contacts:
+        return report
+
+    merge = SMTP_MERGE_ENVELOPES if merge_envelopes is None else merge_envelopes
+    contacts = plan_envelopes(contacts, merge=merge, max_recipients=SMTP_MAX_RECIPIENTS, cc_addresses=cc_addresses)
+
+    render = make_renderer(template, cc_addresses, brand, period, my_address, display_name)
+    processes = RENDER_PROCESSES if render_processes is None else render_processes
+    rendered = iter_rendered(contacts, render, processes=processes, timings=report.timings)
+
+    if transport == "asyncio":
+        asyncio.run(send_async(rendered, min(pool_size or SMTP_ASYNC_POOL_SIZE, len(contacts))))
+        return report
+
+    pool = SMTPConnectionPool(
+        my_address, password, SMTP_HOST, SMTP_PORT, SMTP_PROTOCOL,
+        size=pool_size or SMTP_POOL_SIZE
+    )
+    with pool:
+        run_pipeline(retries.feed(rendered), closing_feed(partial(transmit, pool)), workers=max(1, min(pool.size, len(contacts))))
+
+    return report
 
 
 def pluralize(n, forms):
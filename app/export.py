@@ -0,0 +1,209 @@
+# app/export.py
+#
+# Offline export of a campaign: the same contacts, template and campaign fields as send_emails,
+# rendered on a process pool and written to .eml files, a Maildir or an mbox instead of an SMTP
+# server, next to a manifest of who each message goes to.
+# python -m app.export contacts.xlsx --template new_rim --brand B --period P [--format eml] [--out DIR]
+
+import argparse
+import csv
+import mailbox
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from app.batching import SMTP_MAX_RECIPIENTS, SMTP_MERGE_ENVELOPES, plan_envelopes
+from app.mime_pipeline import iter_rendered, make_renderer, message_subject
+from app.templating import TEMPLATE_NAMES, TemplateStore, compile_template
+
+
+# Export settings
+EXPORT_DIR = os.getenv("EXPORT_DIR", "app/data/exports")
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", str(os.cpu_count() or 1)))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "256"))  # messages per task handed to a worker
+
+EXPORT_FORMATS = ('eml', 'maildir', 'mbox')
+MANIFEST_NAME = 'manifest.csv'
+MBOX_NAME = 'campaign.mbox'
+UNSAFE_NAME_RE = re.compile(r'[^\w.@+-]')
+MANIFEST_FIELDS = ['n', 'file', 'email', 'to', 'cc', 'recipients', 'subject', 'city', 'mall', 'bytes']
+
+# One Maildir handle per worker process
+_maildirs = {}
+
+
+def eml_name(n, email):
+    return f"{n:06d}-{UNSAFE_NAME_RE.sub('_', email)}.eml"
+
+
+def manifest_row(n, file, rendered, brand, period, size):
+    contact, recipients, _ = rendered
+    to_addrs = contact.get('_to_emails') or [contact['email']]
+    return {
+        'n': n,
+        'file': file,
+        'email': contact['email'],
+        'to': ", ".join(to_addrs),
+        'cc': ", ".join(recipients[len(to_addrs):]),
+        'recipients': len(recipients),
+        'subject': message_subject(contact, brand, period),
+        'city': contact['city'],
+        'mall': contact['mall'],
+        'bytes': size,
+    }
+
+
+def write_message(entry, render, fmt, directory, brand, period):
+    # Renders and stores one message inside the worker, so only its manifest row travels back
+    n, contact = entry
+    rendered = render(contact)
+    data = rendered[2]
+    if fmt == 'eml':
+        file = eml_name(n, contact['email'])
+        with open(os.path.join(directory, file), 'wb') as out:
+            out.write(data)  # the exact bytes sendmail would put on the wire
+    else:
+        maildir = _maildirs.get(directory)
+        if maildir is None:
+            maildir = _maildirs[directory] = mailbox.Maildir(directory, factory=None, create=False)
+        # Maildir files use the platform's line endings
+        file = os.path.join('new', maildir.add(data.replace(b'\r\n', b'\n')))
+    return manifest_row(n, file, rendered, brand, period, len(data))
+
+
+def write_mbox(path, rendered, my_address, brand, period):
+    box = mailbox.mbox(path)
+    box.lock()
+    try:
+        from_line = f"From {my_address} {time.asctime(time.gmtime())}\n".encode()
+        for n, item in enumerate(rendered, 1):
+            data = item[2]
+            box.add(from_line + data.replace(b'\r\n', b'\n'))
+            yield manifest_row(n, MBOX_NAME, item, brand, period, len(data))
+        box.flush()
+    finally:
+        box.unlock()
+        box.close()
+
+
+def export_emails(my_address, contacts, cc_addresses, brand, period, doc, template_text, display_name, directory,
+                  fmt='eml', processes=None, merge_envelopes=None, chunk_size=EXPORT_CHUNK_SIZE, on_result=None):
+    # Writes every message of the campaign into directory (created if needed) plus manifest.csv;
+    # with processes > 0 rendering and, for eml and maildir, writing happen on a process pool
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"❌ Неизвестный формат выгрузки: {fmt}. Доступны: {', '.join(EXPORT_FORMATS)}")
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        raise ValueError(f"❌ В каталоге {directory} уже есть выгрузка.")
+
+    start = time.perf_counter()
+    template = compile_template(template_text).bind(BRAND=brand, PERIOD=period, DOC=doc or "")
+    cc_addresses = cc_addresses or []
+    merge = SMTP_MERGE_ENVELOPES if merge_envelopes is None else merge_envelopes
+    contacts = plan_envelopes(contacts, merge=merge, max_recipients=SMTP_MAX_RECIPIENTS, cc_addresses=cc_addresses)
+    render = make_renderer(template, cc_addresses, brand, period, my_address, display_name)
+    processes = EXPORT_PROCESSES if processes is None else processes
+
+    for sub in ('tmp', 'new', 'cur') if fmt == 'maildir' else ('',):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+    report = {'format': fmt, 'directory': directory, 'manifest': manifest_path, 'messages': 0, 'bytes': 0}
+
+    with open(manifest_path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.DictWriter(file, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+
+        def record(row):
+            writer.writerow(row)
+            report['messages'] += 1
+            report['bytes'] += row['bytes']
+            if on_result:
+                on_result(row)
+
+        if fmt == 'mbox':
+            rendered = iter_rendered(contacts, render, processes=processes)
+            for row in write_mbox(os.path.join(directory, MBOX_NAME), rendered, my_address, brand, period):
+                record(row)
+        else:
+            write = partial(write_message, render=render, fmt=fmt, directory=directory, brand=brand, period=period)
+            entries = enumerate(contacts, 1)
+            if processes <= 0:
+                for row in map(write, entries):
+                    record(row)
+            else:
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    for row in executor.map(write, entries, chunksize=max(1, chunk_size)):
+                        record(row)
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def read_export(directory):
+    # Yields (manifest row, message bytes with CRLF line endings) in manifest order, ready to be
+    # replayed through any transport
+    with open(os.path.join(directory, MANIFEST_NAME), newline='', encoding='utf-8-sig') as file:
+        rows = list(csv.DictReader(file))
+    box = None
+    if rows and rows[0]['file'] == MBOX_NAME:
+        box = mailbox.mbox(os.path.join(directory, MBOX_NAME), create=False)
+    try:
+        keys = iter(box.iterkeys()) if box is not None else None
+        for row in rows:
+            if box is not None:
+                data = box.get_bytes(next(keys))
+            else:
+                with open(os.path.join(directory, row['file']), 'rb') as message:
+                    data = message.read()
+            yield row, data.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+    finally:
+        if box is not None:
+            box.close()
+
+
+def load_template(name):
+    # A stored template by name, or a path to a template file
+    if name in TEMPLATE_NAMES:
+        return TemplateStore().get(name)
+    with open(name, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.export")
+    parser.add_argument('contacts', help=".xlsx/.csv contact list")
+    parser.add_argument('--template', required=True, help=f"one of {', '.join(TEMPLATE_NAMES)} or a file path")
+    parser.add_argument('--brand', required=True)
+    parser.add_argument('--period', required=True)
+    parser.add_argument('--doc', default="")
+    parser.add_argument('--cc', default="", help="comma-separated addresses copied on every message")
+    parser.add_argument('--sender', default="export@example.com")
+    parser.add_argument('--display-name', default="")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='eml')
+    parser.add_argument('--out', help=f"defaults to a new directory under {EXPORT_DIR}")
+    parser.add_argument('--processes', type=int, default=EXPORT_PROCESSES)
+    parser.add_argument('--merge', action='store_true', help="merge envelopes like SMTP_MERGE_ENVELOPES=1")
+    parser.add_argument('--add-prefix', action='store_true', help="add the ТЦ prefix to mall names")
+    args = parser.parse_args(argv)
+
+    # Imported here: the data stack is only needed once there is a list to read
+    from app.email_sender import get_contacts_from_excel
+
+    template_text = load_template(args.template)
+    contacts = get_contacts_from_excel(args.contacts, template_text=template_text, doc=args.doc,
+                                       add_prefix=args.add_prefix)
+    directory = args.out or os.path.join(EXPORT_DIR, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    cc_addresses = [email.strip() for email in args.cc.split(',') if email.strip()]
+
+    report = export_emails(args.sender, contacts, cc_addresses, args.brand, args.period, args.doc, template_text,
+                           args.display_name, directory, fmt=args.format, processes=args.processes,
+                           merge_envelopes=args.merge)
+    print(f"{report['messages']} messages, {report['bytes'] / 2 ** 20:.1f} MB in {report['seconds']:.2f}s "
+          f"({report['messages'] / report['seconds']:,.0f} msg/s) -> {directory}")
+    print(f"manifest: {report['manifest']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# app/jobs.py
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Job queue settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+
+
+class Job:
+    def __init__(self, job_id, owner=None):
+        self.id = job_id
+        self.owner = owner  # the mailbox whose session started the job
+        self.state = "queued"
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.accounts = {}
+        self.message = ""
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def remaining(self):
+        return max(0, self.total - self.sent - self.failed - self.skipped)
+
+    @property
+    def finished(self):
+        return self.state in ("done", "failed")
+
+    def update(self, **fields):
+        with self._changed:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            if self.finished and self.finished_at is None:
+                self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def record(self, result):
+        # Progress callback for send_emails, called once per message
+        outcome = result['status'] if result['status'] in ("sent", "skipped") else "failed"
+        with self._changed:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            account = result.get('account')
+            if account:
+                counts = self.accounts.setdefault(account, {'sent': 0, 'failed': 0, 'skipped': 0})
+                counts[outcome] += 1
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def to_dict(self):
+        with self._changed:
+            return {
+                'id': self.id,
+                'state': self.state,
+                'total': self.total,
+                'sent': self.sent,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'remaining': self.remaining,
+                'accounts': {account: dict(counts) for account, counts in self.accounts.items()},
+                'message': self.message,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="campaign")
+
+    def submit(self, fn, *args, owner=None, **kwargs):
+        job = Job(uuid.uuid4().hex, owner=owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        # Forget the oldest finished jobs once history is full
+        excess = len(self._jobs) - self.history
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, fn, args, kwargs):
+        job.update(state="running")
+        try:
+            message = fn(job, *args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            job.update(state="failed", message=f"❌ Ошибка: {str(e)}")
+        else:
+            job.update(state="done", message=message or "")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,121 @@
+# app/journal.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Journal settings
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "app/data/journal.sqlite3")
+
+
+def recipient_key(contact):
+    # The same address can receive one letter per mall, so the mall is part of the key
+    return "|".join(str(contact.get(field, '')) for field in ('email', 'city', 'mall'))
+
+
+def campaign_key(my_address, contacts, cc_addresses, brand, period, doc, template_text):
+    digest = hashlib.sha256()
+    for part in (my_address, brand, period, doc or '', template_text, ",".join(sorted(cc_addresses or []))):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    for key in sorted(recipient_key(contact) for contact in contacts):
+        digest.update(key.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:32]
+
+
+class DeliveryJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " campaign_id TEXT NOT NULL,"
+            " recipient TEXT NOT NULL,"
+            " email TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " error TEXT,"
+            " recipients TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_campaign ON deliveries (campaign_id, recipient)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(deliveries)")}
+        if 'sender' not in columns:
+            # Journals written before multi-account sending have no sender column
+            self._conn.execute("ALTER TABLE deliveries ADD COLUMN sender TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_sender ON deliveries (sender, created_at)"
+        )
+        self._conn.commit()
+
+    def record(self, campaign_id, contact, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO deliveries"
+                " (campaign_id, recipient, email, status, error, recipients, created_at, sender)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    campaign_id,
+                    recipient_key(contact),
+                    result['email'],
+                    result['status'],
+                    result.get('error'),
+                    json.dumps(result.get('recipients') or [], ensure_ascii=False),
+                    time.time(),
+                    result.get('account')
+                )
+            )
+            self._conn.commit()
+
+    def delivered(self, campaign_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT recipient FROM deliveries WHERE campaign_id = ? AND status = 'sent'",
+                (campaign_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def sent_since(self, sender, since):
+        # Messages the provider has counted against this mailbox's quota since `since`
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM deliveries WHERE sender = ? AND status = 'sent' AND created_at >= ?",
+                (sender, since)
+            ).fetchone()
+        return row[0]
+
+    def outcomes(self, campaign_id):
+        # Latest outcome per recipient
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT recipient, status, error FROM deliveries WHERE campaign_id = ? ORDER BY rowid",
+                (campaign_id,)
+            ).fetchall()
+        return {recipient: (status, error) for recipient, status, error in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = DeliveryJournal()
+        return _journal
@@ -0,0 +1,135 @@
+# app/metrics.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[1] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (buckets, count, total) in sorted(self._series.items()):
+                for bound, hits in zip(self.buckets, buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {hits}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "dooh_stage_duration_seconds", "Time spent in each ingestion and sending stage")
+messages_total = registry.counter(
+    "dooh_messages_total", "Messages handled by send_emails, by outcome")
+retries_total = registry.counter(
+    "dooh_smtp_retries_total", "Sends repeated after a temporary SMTP reply")
+smtp_replies_total = registry.counter(
+    "dooh_smtp_replies_total", "Final SMTP reply codes per message or recipient")
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
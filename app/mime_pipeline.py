@@ -0,0 +1,214 @@
+# app/mime_pipeline.py
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from email.generator import BytesGenerator
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+from functools import partial
+from io import BytesIO
+from queue import Queue, Full
+
+from app.metrics import stage_seconds
+
+
+# Pipeline settings
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "256"))
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", "0"))
+
+_DONE = object()
+
+
+class StageTimings:
+    # Accumulated wall time per pipeline stage ('render', 'send')
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, count=1):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    def to_dict(self):
+        with self._lock:
+            return {stage: {'seconds': self.seconds[stage], 'count': self.counts[stage]} for stage in self.seconds}
+
+
+def message_subject(contact, brand, period):
+    mall_name = contact['mall'].replace('"', '')
+    return f"{mall_name} (г. {contact['city']}) // {brand} // {period}"
+
+
+def build_message(contact, template, cc_addresses, brand, period, my_address, display_name):
+    msg = MIMEMultipart()
+
+    mall_name = contact['mall'].replace('"', '')
+
+    # template is bound to BRAND, PERIOD and DOC once per campaign
+    message = template.render(
+        NAME=contact['name'],
+        MALL=mall_name,
+        RIM=contact.get('rim', ''),
+        LINK=contact.get('link', ''),
+        MIN=contact.get('min', ''),
+        SEC=contact.get('sec', '')
+    )
+
+    contact_cc = contact.get('_cc_emails', [])
+    all_cc = list(set(cc_addresses + list(contact_cc)))
+    # A merged envelope (app.batching) addresses several contacts at once
+    to_addrs = contact.get('_to_emails') or [contact['email']]
+
+    msg['From'] = formataddr((display_name, my_address))
+    msg['To'] = ", ".join(to_addrs)
+    if all_cc:
+        msg['Cc'] = ", ".join(all_cc)
+
+    msg['Subject'] = message_subject(contact, brand, period)
+
+    msg.attach(MIMEText(message, 'plain'))
+    recipients = to_addrs + all_cc
+    return msg, recipients
+
+
+def message_bytes(msg):
+    # Same wire format smtplib.send_message produces
+    buffer = BytesIO()
+    BytesGenerator(buffer, policy=msg.policy.clone(linesep='\r\n')).flatten(msg, linesep='\r\n')
+    return buffer.getvalue()
+
+
+def render_message(contact, template, cc_addresses, brand, period, my_address, display_name):
+    msg, recipients = build_message(contact, template, cc_addresses, brand, period, my_address, display_name)
+    return contact, recipients, message_bytes(msg)
+
+
+def make_renderer(template, cc_addresses, brand, period, my_address, display_name):
+    # A picklable callable, so rendering can move to a process pool
+    return partial(render_message, template=template, cc_addresses=cc_addresses, brand=brand, period=period,
+                   my_address=my_address, display_name=display_name)
+
+
+def iter_rendered(contacts, render, processes=RENDER_PROCESSES, window=RENDER_QUEUE_SIZE, timings=None):
+    # Yields render(contact) in input order, on a process pool when processes > 0
+    if processes <= 0:
+        for contact in contacts:
+            start = time.perf_counter()
+            item = render(contact)
+            elapsed = time.perf_counter() - start
+            stage_seconds.observe(elapsed, stage="render")
+            if timings is not None:
+                timings.add('render', elapsed)
+            yield item
+        return
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = deque()
+        for contact in contacts:
+            pending.append(executor.submit(render, contact))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    if timings is not None:
+        # Rendering overlaps with sending here, so this is the wall time of the pool
+        timings.add('render', time.perf_counter() - start, count=0)
+
+
+def run_pipeline(items, consume, workers, queue_size=RENDER_QUEUE_SIZE):
+    # One producer fills a bounded queue from `items`, `workers` threads call consume(item);
+    # the first error stops the pipeline and is re-raised
+    queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def fail(exc):
+        errors.append(exc)
+        stop.set()
+
+    def produce():
+        try:
+            for item in items:
+                while not stop.is_set():
+                    try:
+                        queue.put(item, timeout=0.1)
+                        break
+                    except Full:
+                        continue
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            for _ in range(workers):
+                queue.put(_DONE)
+
+    def transmit():
+        while True:
+            item = queue.get()
+            if item is _DONE:
+                return
+            if stop.is_set():
+                continue
+            try:
+                consume(item)
+            except BaseException as e:
+                fail(e)
+
+    threads = [threading.Thread(target=produce, name="render")]
+    threads += [threading.Thread(target=transmit, name=f"smtp-{i}") for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+async def aiterate(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def run_pipeline_async(items, consume, concurrency):
+    # Async twin of run_pipeline: up to `concurrency` consume(item) coroutines in flight on one loop;
+    # items (an iterable or an async iterable) are pulled on the loop itself, so rendering stays
+    # in step with sending
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+    errors = []
+
+    def done(task):
+        tasks.discard(task)
+        slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    try:
+        async for item in aiterate(items):
+            await slots.acquire()
+            if errors:
+                break
+            task = asyncio.create_task(consume(item))
+            tasks.add(task)
+            task.add_done_callback(done)
+    finally:
+        if tasks:
+            await asyncio.wait(list(tasks))
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,163 @@
+# app/normalize.py
+
+import re
+
+from app.readers import CONTACT_COLUMNS
+from app.validation import validate_contacts
+from app.metrics import span
+
+
+REQUIRED_COLUMNS = ['email', 'mall', 'city']
+GROUP_KEYS = ['city', 'mall', 'email', 'name']
+EXTRA_COLUMNS = ['link', 'min', 'sec']
+MALL_PREFIXES = ("ТЦ", "ТРЦ", "ТРК", "ТД", "ТК")
+DEFAULT_NAME = 'Коллеги'
+
+# Template placeholders that need a non-empty contact column
+PLACEHOLDER_COLUMNS = {
+    "RIM": "rim",
+    "LINK": "link",
+    "MIN": "min",
+    "SEC": "sec"
+}
+PLACEHOLDER_RE = re.compile(r"\$\{(\w+)\}")
+
+
+def require_columns(df, ctx):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"❌ В файле отсутствуют обязательные столбцы: {', '.join(missing)}")
+    df = df.copy()
+    for col in CONTACT_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    return df
+
+
+def validate_emails(df, ctx):
+    return validate_contacts(df)
+
+
+def fix_mall_names(df, ctx):
+    mall = df['mall'].str.replace('"', '', regex=False)
+    if ctx.get('add_prefix'):
+        needs_prefix = mall.ne('') & ~mall.str.startswith(MALL_PREFIXES)
+        mall = mall.where(~needs_prefix, "ТЦ " + mall)
+    df['mall'] = mall
+    return df
+
+
+def default_names(df, ctx):
+    df.loc[df['name'] == '', 'name'] = DEFAULT_NAME
+    return df
+
+
+def group_codes(df, keys):
+    # One integer per row naming its group, numbered in the sorted order of the key values
+    # (what groupby(sort=True) yields), built from each key column's categorical codes
+    import numpy as np
+    import pandas as pd
+
+    codes = np.zeros(len(df), dtype=np.int64)
+    for key in keys:
+        column_codes, uniques = pd.factorize(df[key], sort=True)
+        # Re-factorizing the combined codes keeps them dense, so the next product cannot overflow
+        codes, _ = pd.factorize(codes * len(uniques) + column_codes, sort=True)
+    return codes
+
+
+def join_by_group(codes, values, ngroups, sep=None, distinct=False):
+    # values[i] belongs to group codes[i] -> one list per group in file order, or the list
+    # joined with sep; with distinct, only the first occurrence of a value in a group
+    import numpy as np
+    import pandas as pd
+
+    if distinct and len(values):
+        value_codes, uniques = pd.factorize(values)
+        _, first = np.unique(codes * len(uniques) + value_codes, return_index=True)
+        first.sort()
+        codes, values = codes[first], values[first]
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(ngroups + 1)).tolist()
+    values = values[order].tolist()
+    if sep is not None:
+        return [sep.join(values[start:end]) for start, end in zip(bounds, bounds[1:])]
+    return [values[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def group_column(values, index):
+    # A column of join_by_group output; with no groups an empty list would come out as float, which
+    # .str and the CC joins downstream refuse
+    import pandas as pd
+
+    return pd.Series(values, index=index, dtype=None if len(values) else object)
+
+
+def group_contacts(df, ctx):
+    # One letter per (city, mall, email, name), in that sorted order, whether or not the sheet
+    # has a rim column: rim values are joined with newlines, CC addresses are merged, link/min/sec
+    # keep their distinct values. The key columns are
+    # encoded as group codes once and every column is gathered with array operations instead
+    # of a Python callback per group
+    import numpy as np
+
+    codes = group_codes(df, GROUP_KEYS)
+    ngroups = int(codes.max()) + 1 if len(codes) else 0
+    _, first_rows = np.unique(codes, return_index=True)
+    # infer_objects: the key columns get the dtype groupby would give them
+    out = df.iloc[first_rows][GROUP_KEYS].reset_index(drop=True).infer_objects()
+
+    rim = df['rim'].to_numpy(dtype=object)
+    filled = rim != ''
+    out['rim'] = group_column(join_by_group(codes[filled], rim[filled], ngroups, sep='\n'), out.index)
+
+    for col in [c for c in EXTRA_COLUMNS if c in df.columns]:
+        values = df[col].to_numpy(dtype=object)
+        filled = values != ''
+        out[col] = group_column(join_by_group(codes[filled], values[filled], ngroups, sep=', ', distinct=True),
+                                out.index)
+
+    cc_lists = df['_cc_emails'].tolist()
+    lengths = np.fromiter(map(len, cc_lists), dtype=np.int64, count=len(cc_lists))
+    cc = np.array([address for addresses in cc_lists for address in addresses], dtype=object)
+    out['_cc_emails'] = group_column(join_by_group(np.repeat(codes, lengths), cc, ngroups, distinct=True), out.index)
+    return out
+
+
+def check_template(df, ctx):
+    template_text = ctx.get('template_text')
+    if not template_text:
+        return df
+    placeholders = ctx.get('placeholders')
+    if placeholders is None:
+        placeholders = set(PLACEHOLDER_RE.findall(template_text))
+
+    needed_columns = [PLACEHOLDER_COLUMNS[p] for p in placeholders if p in PLACEHOLDER_COLUMNS]
+    missing_cols = [col for col in needed_columns if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"❌ Нет необходимого столбца(ов): {', '.join(missing_cols)}")
+
+    empty_required = [col for col in needed_columns if df[col].eq('').any()]
+    if empty_required:
+        raise ValueError(
+            "❌ В обязательных столбцах есть пустые значения: "
+            + ", ".join(empty_required)
+            + ". Заполните их или удалите строки."
+        )
+
+    if "DOC" in placeholders and not (ctx.get('doc') and str(ctx['doc']).strip()):
+        raise ValueError("❌ Нет необходимого поля doc (ссылка)")
+    return df
+
+
+NORMALIZE_STAGES = (require_columns, validate_emails, fix_mall_names, default_names, group_contacts)
+
+
+def normalize_contacts(frame, add_prefix=False, stages=NORMALIZE_STAGES, **options):
+    # frame: raw string columns as produced by readers.read_frame
+    ctx = dict(options, add_prefix=add_prefix)
+    df = frame
+    for stage in stages:
+        with span(f"normalize.{stage.__name__}"):
+            df = stage(df, ctx)
+    return df
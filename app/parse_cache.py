@@ -0,0 +1,93 @@
+# app/parse_cache.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Parse cache settings
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", "3600"))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ParseCache:
+    # `store` is an optional second tier (app.disk_cache.FrameDiskCache) for parsed uploads:
+    # it outlives the process and is shared between workers
+    def __init__(self, max_bytes=PARSE_CACHE_MAX_BYTES, ttl=PARSE_CACHE_TTL, clock=time.monotonic, store=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def size(self):
+        return self._bytes
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                value, size, expires = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(token)
+                    return value
+                self._remove(token)
+        if self.store is None:
+            return None
+        value = self.store.get(token)
+        if value is not None:
+            self.put(token, value)
+        return value
+
+    def put(self, token, value, size=None):
+        size = frame_size(value) if size is None else size
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            if size > self.max_bytes:
+                return value
+            self._entries[token] = (value, size, self._clock() + self.ttl)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def get_or_load(self, token, load):
+        # Returns (token, parsed value); token is the upload's content hash (see
+        # app.uploads.save_upload), so load() only runs on the first upload of these bytes
+        value = self.get(token)
+        if value is None:
+            value = self.put(token, load())
+            if self.store is not None:
+                self.store.put(token, value)
+        return token, value
+
+    def _remove(self, token):
+        _, size, _ = self._entries.pop(token)
+        self._bytes -= size
+
+    def _evict(self):
+        now = self._clock()
+        for token in [t for t, (_, _, expires) in self._entries.items() if expires <= now]:
+            self._remove(token)
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
@@ -0,0 +1,147 @@
+# app/rate_limit.py
+
+import asyncio
+import os
+import smtplib
+import threading
+import time
+
+from app.smtp_pool import DISCONNECT_ERRORS
+
+
+# Rate limit settings (0 disables the limit)
+SMTP_RATE_PER_SEC = float(os.getenv("SMTP_RATE_PER_SEC", "5"))
+SMTP_RATE_PER_HOUR = float(os.getenv("SMTP_RATE_PER_HOUR", "0"))
+
+# Replies that mean "slow down / try later" rather than a permanent refusal
+TEMPORARY_CODES = {421, 450, 451, 452, 454}
+
+
+def reply_code(exc):
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code
+    if isinstance(exc, smtplib.SMTPRecipientsRefused) and exc.recipients:
+        # The most severe reply: one permanent refusal makes the whole envelope permanent
+        return max(code for code, _ in exc.recipients.values())
+    return None
+
+
+def is_temporary(exc):
+    return reply_code(exc) in TEMPORARY_CODES
+
+
+def is_transient(exc):
+    # Worth another attempt later: any 4xx reply, or the connection going away
+    code = reply_code(exc)
+    if code is not None:
+        return 400 <= code < 500
+    if isinstance(exc, DISCONNECT_ERRORS):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def is_fatal(exc):
+    # Failures of the session itself rather than of one message: every other letter would fail too
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return True
+    return isinstance(exc, smtplib.SMTPSenderRefused) and not is_transient(exc)
+
+
+class TokenBucket:
+    def __init__(self, per_second=SMTP_RATE_PER_SEC, per_hour=SMTP_RATE_PER_HOUR,
+                 min_rate=0.2, recover_after=20, max_cooldown=60.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.ceiling = per_second
+        self.rate = per_second
+        self.per_hour = per_hour
+        self.min_rate = min(min_rate, per_second) if per_second else min_rate
+        self.recover_after = recover_after
+        self.max_cooldown = max_cooldown
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        now = clock()
+        self._tokens = max(1.0, per_second)
+        self._hour_tokens = per_hour
+        self._updated = now
+        self._blocked_until = now
+        self._clean_streak = 0
+        self._strikes = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate:
+            self._tokens = min(max(1.0, self.rate), self._tokens + elapsed * self.rate)
+        if self.per_hour:
+            self._hour_tokens = min(self.per_hour, self._hour_tokens + elapsed * self.per_hour / 3600)
+
+    def _wait_time(self, now):
+        wait = max(0.0, self._blocked_until - now)
+        if self.rate and self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        if self.per_hour and self._hour_tokens < 1:
+            wait = max(wait, (1 - self._hour_tokens) * 3600 / self.per_hour)
+        return wait
+
+    def _take(self):
+        # Takes a token and returns 0, or returns how long to wait before trying again
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait = self._wait_time(now)
+            if wait <= 0:
+                if self.rate:
+                    self._tokens -= 1
+                if self.per_hour:
+                    self._hour_tokens -= 1
+            return wait
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def backoff(self):
+        # Halve the rate and pause every sender on this account
+        with self._lock:
+            self._strikes += 1
+            self._clean_streak = 0
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, max(1.0, self.rate))
+            cooldown = min(self.max_cooldown, 2 ** (self._strikes - 1))
+            self._blocked_until = max(self._blocked_until, self._clock() + cooldown)
+
+    def success(self):
+        # Creep back towards the configured ceiling after a run of clean replies
+        with self._lock:
+            self._clean_streak += 1
+            if self._clean_streak < self.recover_after:
+                return
+            self._clean_streak = 0
+            self._strikes = max(0, self._strikes - 1)
+            if self.rate and self.rate < self.ceiling:
+                self.rate = min(self.ceiling, self.rate * 1.25)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(account):
+    with _limiters_lock:
+        limiter = _limiters.get(account)
+        if limiter is None:
+            limiter = _limiters[account] = TokenBucket()
+        return limiter
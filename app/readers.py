@@ -0,0 +1,254 @@
+# app/readers.py
+
+import codecs
+import csv
+import io
+import os
+import re
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from importlib.util import find_spec
+
+from app.metrics import span
+
+# pandas, openpyxl and the optional faster backends (python-calamine for workbooks, pyarrow for CSV)
+# are imported on first use: a worker that only serves /login never pays for them
+
+
+# Reader settings
+READER_BACKEND = os.getenv("READER_BACKEND", "auto")  # auto | openpyxl | calamine | csv | pyarrow
+CSV_EXTENSIONS = ('.csv', '.tsv', '.txt')
+CSV_ENCODINGS = ('utf-8-sig', 'cp1251')  # Excel on Russian Windows saves CSV in cp1251
+CSV_DELIMITERS = ',;\t'
+CSV_SAMPLE_BYTES = 64 * 1024
+
+
+# Bumped whenever read_frame returns something different for the same file, so parses cached
+# on disk by an earlier version are not served again
+READER_VERSION = 2
+
+CONTACT_COLUMNS = ['email', 'name', 'mall', 'city', 'rim']
+UPLOAD_COLUMNS = ['email', 'name', 'city', 'mall', 'rim', 'link', 'min', 'sec']
+EMAIL_RE = re.compile(r'^[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}$')
+
+
+def split_emails(email_str):
+    s = str(email_str)
+    for sep in [',', ';', '/', '|', ' и ']:
+        s = s.replace(sep, ' ')
+    parts = [p.strip() for p in s.split() if p.strip()]
+    return parts
+
+
+def cell_to_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return str(value)
+    return str(value).strip()
+
+
+def sheet_rows(rows, columns=None, start=2):
+    # rows: raw cell tuples of one sheet, header first. Returns (wanted column names, iterator of
+    # (row_number, values in the order of those names)) with blank rows skipped; a repeated
+    # header keeps its last column
+    header = next(rows, None) or ()
+    positions = {}
+    for i, h in enumerate(header):
+        name = cell_to_str(h).lstrip('\ufeff')
+        if name and (columns is None or name in columns):
+            positions[name] = i
+    names = list(positions)
+    wanted = list(positions.values())
+
+    def records():
+        for number, row in enumerate(rows, start=start):
+            size = len(row)
+            values = tuple(cell_to_str(row[i]) if i < size else '' for i in wanted)
+            if any(values):
+                yield number, values
+
+    return names, records()
+
+
+def check_row_limit(count, max_rows):
+    if max_rows and count > max_rows:
+        raise ValueError(f"❌ В файле больше {max_rows} строк. Разделите список на части.")
+
+
+def source_name(source):
+    return os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '') or ''
+
+
+def openpyxl_sheets(source):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def calamine_sheets(source):
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_object(os.fspath(source) if isinstance(source, os.PathLike) else source)
+    for name in wb.sheet_names:
+        # skip_empty_area would drop leading blank rows and shift the row numbers
+        rows = wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+        yield name, iter(rows)
+
+
+@contextmanager
+def binary_file(source):
+    # Paths are opened and closed here; a caller's file object is rewound and left open
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield file
+    else:
+        source.seek(0)
+        yield source
+
+
+@contextmanager
+def text_file(source, encoding):
+    with binary_file(source) as file:
+        text = io.TextIOWrapper(file, encoding=encoding, newline='')
+        try:
+            yield text
+        finally:
+            text.detach()
+
+
+def sniff_csv(source):
+    # (encoding, delimiter) from the first bytes of the file
+    with binary_file(source) as file:
+        sample = file.read(CSV_SAMPLE_BYTES)
+
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Incremental, so a multibyte character cut by the sample boundary is not an error
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        encoding = CSV_ENCODINGS[-1]
+        text = sample.decode(encoding, errors='replace')
+
+    if source_name(source).lower().endswith('.tsv'):
+        return encoding, '\t'
+    try:
+        return encoding, csv.Sniffer().sniff(text.split('\n', 1)[0], CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return encoding, ','
+
+
+def csv_sheets(source):
+    encoding, delimiter = sniff_csv(source)
+    with text_file(source, encoding) as file:
+        yield source_name(source), csv.reader(file, delimiter=delimiter)
+
+
+def pyarrow_sheets(source):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    encoding, delimiter = sniff_csv(source)
+    with text_file(source, encoding) as file:
+        header = next(csv.reader(file, delimiter=delimiter), None)
+    if not header:
+        return
+    # The header is read as a data row and every column as text, like the csv backend
+    names = [f"c{i}" for i in range(len(header))]
+    try:
+        with binary_file(source) as file:
+            table = pa_csv.read_csv(
+                file,
+                read_options=pa_csv.ReadOptions(column_names=names, encoding=encoding.replace('-sig', '')),
+                # Blank lines are kept so row numbers match the csv backend
+                parse_options=pa_csv.ParseOptions(delimiter=delimiter, newlines_in_values=True,
+                                                  ignore_empty_lines=False),
+                convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                      strings_can_be_null=False)
+            )
+    except pa.ArrowInvalid:
+        # Ragged rows, which the csv module reads and pyarrow refuses
+        yield from csv_sheets(source)
+        return
+    yield source_name(source), zip(*(table.column(name).to_pylist() for name in names))
+
+
+# Fastest first; a backend whose library is missing is skipped
+XLSX_READERS = {'calamine': calamine_sheets, 'openpyxl': openpyxl_sheets}
+CSV_READERS = {'pyarrow': pyarrow_sheets, 'csv': csv_sheets}
+READER_AVAILABLE = {
+    'calamine': find_spec('python_calamine') is not None,
+    'openpyxl': True,
+    'pyarrow': find_spec('pyarrow') is not None,
+    'csv': True,
+}
+
+
+def pick_reader(source, backend=READER_BACKEND):
+    # The reader for this file: the requested backend when it handles this format and is
+    # installed, otherwise the fastest available one
+    is_csv = source_name(source).lower().endswith(CSV_EXTENSIONS)
+    readers = CSV_READERS if is_csv else XLSX_READERS
+    if backend in readers and READER_AVAILABLE[backend]:
+        return readers[backend]
+    return next(reader for name, reader in readers.items() if READER_AVAILABLE[name])
+
+
+def read_frame(source, columns=None, max_rows=None, backend=READER_BACKEND):
+    # Columns present in the file (optionally limited to `columns`), as stripped strings,
+    # indexed by row number within the sheet; source is a path or a binary file object.
+    # Every sheet of a workbook is read; rows of a multi-sheet file get a _sheet column.
+    # Sheets without an email column (notes, summaries, pivots) are skipped; when no sheet has
+    # one, the frame keeps the other columns found so the caller can name what is missing
+    import pandas as pd
+
+    reader = pick_reader(source, backend)
+    needs_email = columns is None or 'email' in columns
+    with span('read_excel'):
+        # One list per column rather than a dict per row: the strings are all the frame holds
+        data = {}
+        numbers = array('q')  # row numbers, 8 bytes each instead of an int object each
+        sheet_names = []
+        sheets = []
+        skipped = []
+        count = 0
+        for sheet, raw_rows in reader(source):
+            names, rows = sheet_rows(raw_rows, columns)
+            if not names:
+                continue
+            if needs_email and 'email' not in names:
+                skipped += [name for name in names if name not in skipped]
+                continue
+            sheets.append(sheet)
+            for name in names:
+                if name not in data:
+                    data[name] = [''] * count
+            targets = [data[name].append for name in names]
+            missing = [data[name].append for name in data if name not in names]
+            for number, values in rows:
+                count += 1
+                check_row_limit(count, max_rows)
+                numbers.append(number)
+                sheet_names.append(sheet)
+                for append, value in zip(targets, values):
+                    append(value)
+                for append in missing:
+                    append('')
+
+        if not sheets:
+            data = {name: [] for name in skipped}
+        if len(sheets) > 1:
+            data['_sheet'] = sheet_names
+        # Empty columns would otherwise come out as float
+        return pd.DataFrame(data, index=numbers, columns=list(data), dtype=None if len(numbers) else object)
@@ -0,0 +1,141 @@
+# app/retry.py
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+
+# Retry settings
+SMTP_RETRY_BASE = float(os.getenv("SMTP_RETRY_BASE", "2"))  # seconds, doubled on every attempt
+SMTP_RETRY_MAX_DELAY = float(os.getenv("SMTP_RETRY_MAX_DELAY", "120"))
+
+# How often the async feed looks again while in-flight messages may still come back
+RETRY_POLL = 0.05
+
+_NO_ITEM = object()
+
+
+class RetryQueue:
+    # Messages that hit a transient failure wait here, ordered by when they are due, while the
+    # rest of the campaign keeps sending. feed() merges them back into the stream of fresh
+    # messages and ends once nothing is pending, waiting or in flight.
+    # Every item handed out by feed() must be settled with done(), after push() if it failed again
+
+    def __init__(self, base=SMTP_RETRY_BASE, max_delay=SMTP_RETRY_MAX_DELAY, clock=time.monotonic,
+                 rand=random.random):
+        self.base = base
+        self.max_delay = max_delay
+        self._clock = clock
+        self._rand = rand
+        self._heap = []
+        self._order = itertools.count()
+        self._in_flight = 0
+        self._closed = False
+        self._changed = threading.Condition()
+
+    def delay(self, attempt):
+        # Exponential backoff with full jitter: uniform over [0, base * 2**(attempt - 1)], capped
+        return self._rand() * min(self.max_delay, self.base * 2 ** (attempt - 1))
+
+    def push(self, item, attempt):
+        # attempt: how many attempts the item has had so far
+        due = self._clock() + self.delay(attempt)
+        with self._changed:
+            heapq.heappush(self._heap, (due, next(self._order), attempt, item))
+            self._changed.notify_all()
+        return due
+
+    def done(self):
+        with self._changed:
+            self._in_flight -= 1
+            self._changed.notify_all()
+
+    def close(self):
+        # Stops feeding; whatever still waits is dropped
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def __len__(self):
+        with self._changed:
+            return len(self._heap)
+
+    def _pop_due(self):
+        # (attempt, item) of the earliest retry if it is due; called with the lock held
+        if self._heap and self._heap[0][0] <= self._clock():
+            _, _, attempt, item = heapq.heappop(self._heap)
+            self._in_flight += 1
+            return attempt, item
+        return None
+
+    def _next(self, fresh=_NO_ITEM):
+        # A due retry, else the fresh item as attempt 0; None once closed or when there is neither
+        with self._changed:
+            if self._closed:
+                return None
+            entry = self._pop_due()
+            if entry is None and fresh is not _NO_ITEM:
+                self._in_flight += 1
+                entry = 0, fresh
+            return entry
+
+    def _finished(self):
+        return self._closed or not (self._heap or self._in_flight)
+
+    def _wait_time(self):
+        # Seconds until the next retry is due; None while only in-flight items can still come back
+        if self._heap:
+            return max(0.0, self._heap[0][0] - self._clock())
+        return None
+
+    def feed(self, items):
+        # Yields (attempt, item): fresh items as attempt 0, with retries slipped in as they come due
+        for item in items:
+            while True:
+                entry = self._next(item)
+                if entry is None:
+                    return
+                yield entry
+                if entry[0] == 0:
+                    break
+
+        while True:
+            with self._changed:
+                entry = None
+                while entry is None:
+                    if self._closed:
+                        return
+                    entry = self._pop_due()
+                    if entry is None:
+                        if self._finished():
+                            return
+                        self._changed.wait(self._wait_time())
+            yield entry
+
+    async def feed_async(self, items):
+        # feed() for run_pipeline_async: waiting happens on the event loop instead of a lock
+        for item in items:
+            while True:
+                entry = self._next(item)
+                if entry is None:
+                    return
+                yield entry
+                if entry[0] == 0:
+                    break
+
+        while True:
+            entry = self._next()
+            if entry is not None:
+                yield entry
+                continue
+            with self._changed:
+                if self._finished():
+                    return
+                wait = self._wait_time()
+                if self._in_flight:
+                    wait = RETRY_POLL if wait is None else min(wait, RETRY_POLL)
+            await asyncio.sleep(wait)
@@ -0,0 +1,131 @@
+# app/smtp_pool.py
+
+import os
+import smtplib
+import ssl
+import threading
+from queue import LifoQueue, Empty
+
+from app.metrics import span
+
+
+# Protocol tracing to stderr is opt-in: SMTP_DEBUG=1
+SMTP_DEBUG = int(os.getenv("SMTP_DEBUG", "0"))
+
+# Errors after which a socket is considered dead and must be replaced
+DISCONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPConnectionPool:
+    def __init__(self, user, password, host, port, protocol="SSL", size=1, debuglevel=SMTP_DEBUG):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.protocol = protocol.upper()
+        self.size = max(1, int(size))
+        self.debuglevel = debuglevel
+
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    def __enter__(self):
+        # Log in once up front so bad credentials fail before any worker starts
+        self._idle.put(self._connect())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _connect(self):
+        with span("smtp_login"):
+            context = ssl.create_default_context()
+            if self.protocol == "SSL":
+                server = smtplib.SMTP_SSL(self.host, self.port, context=context)
+            else:
+                server = smtplib.SMTP(self.host, self.port)
+
+            try:
+                if self.debuglevel:
+                    server.set_debuglevel(self.debuglevel)
+                server.ehlo()
+                if self.protocol == "STARTTLS":
+                    server.starttls(context=context)
+                    server.ehlo()
+
+                server.login(self.user, self.password)
+            except BaseException:
+                self._discard(server)
+                raise
+            return server
+
+    def _discard(self, server):
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def _quit(self, server):
+        # A polite QUIT on shutdown, as SMTP.__exit__ sends; the socket is closed either way
+        try:
+            server.quit()
+        except Exception:
+            pass
+        self._discard(server)
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        try:
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, server, broken=False):
+        if broken:
+            self._discard(server)
+        elif self._closed:
+            self._quit(server)
+        else:
+            self._idle.put(server)
+        self._slots.release()
+
+    def sendmail(self, from_addr, to_addrs, data, retries=1):
+        # data is an already serialized message; smtplib sends bytes as they are
+        return self._call(lambda server: server.sendmail(from_addr, to_addrs, data), retries)
+
+    def _call(self, fn, retries):
+        # A dropped socket is replaced with a fresh login and the call is repeated
+        for attempt in range(retries + 1):
+            server = self.acquire()
+            try:
+                result = fn(server)
+            except DISCONNECT_ERRORS:
+                self.release(server, broken=True)
+                if attempt == retries:
+                    raise
+            except smtplib.SMTPResponseException as e:
+                # smtplib closes the socket itself on a 421 reply
+                self.release(server, broken=e.smtp_code == 421)
+                raise
+            except BaseException:
+                self.release(server)
+                raise
+            else:
+                self.release(server)
+                return result
+
+    def close(self):
+        # Connections still in use are closed when they come back
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except Empty:
+                break
@@ -62,24 +62,36 @@ function initSubjectPreview() {
 }
 
 // Preview Excel upload
+// The server keeps the parsed sheet; the table only holds the rows in view and fetches pages on scroll
+const PREVIEW_PAGE_SIZE = 200;
+const PREVIEW_ROW_HEIGHT = 29;
+const PREVIEW_OVERSCAN = 10;
+
 let uploadedFile = null;
 function previewExcel(file) {
   if (!file) return;
   const preview = document.getElementById('preview');
+  const tokenInput = document.getElementById('contacts_token');
   preview.innerHTML = '<div class="loading-spinner"></div>';
+  if (tokenInput) tokenInput.value = '';
 
   const formData = new FormData();
   formData.append("contacts_file", file);
   const addPrefix = document.getElementById("add-tc-prefix").checked;
   formData.append("add_tc_prefix", addPrefix);
 
-  fetch("/preview-excel", { method: "POST", body: formData })
-    .then(response => {
-      if (!response.ok) throw new Error("Ошибка при чтении Excel");
-      return response.text();
-    })
-    .then(html => {
-      preview.innerHTML = html;
+  // format goes in the query string so that even a 413 for an oversized file answers in JSON
+  fetch("/preview-excel?format=json", { method: "POST", body: formData })
+    .then(response => response.json().catch(() => {
+      throw new Error("Ошибка при чтении Excel");
+    }))
+    .then(data => {
+      if (data.errors && data.errors.length) {
+        showPreviewErrors(preview, data.errors);
+        return;
+      }
+      renderVirtualPreview(preview, data, addPrefix);
+      if (tokenInput) tokenInput.value = data.token;
       preview.style.border = "none";
       preview.style.padding = "0";
       preview.style.minHeight = "0";
@@ -93,6 +105,111 @@ function previewExcel(file) {
       if (statusEl) statusEl.textContent = "";
     });
 }
+
+function showPreviewErrors(preview, errors) {
+  const box = document.createElement('div');
+  box.style.color = 'red';
+  errors.forEach((line, i) => {
+    if (i) box.appendChild(document.createElement('br'));
+    box.appendChild(document.createTextNode(line));
+  });
+  preview.replaceChildren(box);
+  const statusEl = document.getElementById('status');
+  if (statusEl) statusEl.textContent = "";
+}
+
+function renderVirtualPreview(preview, data, addPrefix) {
+  const { token, columns, total } = data;
+  const pages = new Map([[0, data.rows]]);
+  const loading = new Set();
+
+  // Subject preview and the send form read the first row from this element
+  const firstRow = document.createElement('div');
+  firstRow.id = 'first-row-data';
+  firstRow.style.display = 'none';
+  firstRow.dataset.token = token;
+  firstRow.dataset.mall = data.first_row.mall || '';
+  firstRow.dataset.city = data.first_row.city || '';
+
+  const summary = document.createElement('div');
+  summary.className = 'preview-summary';
+  summary.textContent = `Писем: ${total}`;
+
+  const header = document.createElement('table');
+  header.className = 'preview-table preview-header';
+  const headRow = header.createTHead().insertRow();
+  columns.forEach(column => {
+    const th = document.createElement('th');
+    th.textContent = column;
+    headRow.appendChild(th);
+  });
+
+  const viewport = document.createElement('div');
+  viewport.className = 'preview-viewport';
+  const spacer = document.createElement('div');
+  spacer.className = 'preview-spacer';
+  spacer.style.height = `${total * PREVIEW_ROW_HEIGHT}px`;
+  const table = document.createElement('table');
+  table.className = 'preview-table preview-body';
+  const body = table.createTBody();
+  spacer.appendChild(table);
+  viewport.appendChild(spacer);
+
+  preview.replaceChildren(firstRow, summary, header, viewport);
+
+  function ensurePage(index) {
+    if (index * PREVIEW_PAGE_SIZE >= total || pages.has(index) || loading.has(index)) return;
+    loading.add(index);
+    const params = new URLSearchParams({
+      offset: index * PREVIEW_PAGE_SIZE, limit: PREVIEW_PAGE_SIZE, add_tc_prefix: addPrefix
+    });
+    fetch(`/preview/${token}?${params}`)
+      .then(response => response.json())
+      .then(page => {
+        if (page.rows) {
+          pages.set(index, page.rows);
+          render();
+        }
+      })
+      .catch(() => {})
+      .finally(() => loading.delete(index));
+  }
+
+  function render() {
+    const first = Math.max(0, Math.floor(viewport.scrollTop / PREVIEW_ROW_HEIGHT) - PREVIEW_OVERSCAN);
+    const last = Math.min(total, Math.ceil((viewport.scrollTop + viewport.clientHeight) / PREVIEW_ROW_HEIGHT) + PREVIEW_OVERSCAN);
+    ensurePage(Math.floor(first / PREVIEW_PAGE_SIZE));
+    ensurePage(Math.floor(Math.max(first, last - 1) / PREVIEW_PAGE_SIZE));
+
+    const rows = document.createDocumentFragment();
+    for (let i = first; i < last; i++) {
+      const page = pages.get(Math.floor(i / PREVIEW_PAGE_SIZE));
+      const values = page ? page[i % PREVIEW_PAGE_SIZE] : null;
+      const tr = document.createElement('tr');
+      columns.forEach((column, c) => {
+        const td = document.createElement('td');
+        const value = values ? String(values[c]) : '…';
+        td.textContent = value.replace(/\n/g, ' / ');
+        td.title = value;
+        tr.appendChild(td);
+      });
+      rows.appendChild(tr);
+    }
+    body.replaceChildren(rows);
+    table.style.transform = `translateY(${first * PREVIEW_ROW_HEIGHT}px)`;
+  }
+
+  let scheduled = false;
+  viewport.addEventListener('scroll', () => {
+    if (scheduled) return;
+    scheduled = true;
+    requestAnimationFrame(() => {
+      scheduled = false;
+      render();
+    });
+  });
+  render();
+}
 function initPreviewHandlers() {
   const fileInput = document.getElementById("contacts_file");
   const addPrefix = document.getElementById("add-tc-prefix");
@@ -116,7 +233,7 @@ function initPreviewHandlers() {
 
 // Delayed submit with HTMX
 function initDelayedSubmit() {
-  const form = document.querySelector("form");
+  const form = document.getElementById("send-form");
   const delayedBtn = document.getElementById("delayed-submit");
   const countdownBox = document.getElementById("countdown-box");
   const countdownText = document.getElementById("countdown-text");
@@ -152,6 +269,9 @@ function initDelayedSubmit() {
           clearInterval(countdownTimer);
           countdownBox.style.display = "none";
           delayedBtn.disabled = false;
+          // The server already holds the parsed preview, so skip uploading the file again
+          const tokenInput = document.getElementById("contacts_token");
+          if (tokenInput && tokenInput.value) contactsInput.disabled = true;
           if (window.htmx) window.htmx.trigger(form, "submitForm");
         } else {
           countdownText.textContent = `Отправка через ${secondsLeft} сек...`;
@@ -160,6 +280,10 @@ function initDelayedSubmit() {
     });
   }
 
+  form.addEventListener("htmx:afterRequest", () => {
+    contactsInput.disabled = false;
+  });
+
   if (cancelBtn) {
     cancelBtn.addEventListener("click", () => {
       clearInterval(countdownTimer);
@@ -169,6 +293,51 @@ function initDelayedSubmit() {
   }
 }
 
+// Campaign progress (polled once a second)
+function renderJobProgress(el, job) {
+  if (job.state === 'done' || job.state === 'failed') {
+    el.textContent = job.message;
+    return;
+  }
+  if (!job.total) {
+    el.textContent = '⏳ Читаем список контактов...';
+    return;
+  }
+  const skipped = job.skipped ? `, пропущено: ${job.skipped}` : '';
+  const accounts = Object.entries(job.accounts || {});
+  const perAccount = accounts.length > 1
+    ? ' (' + accounts.map(([address, counts]) => `${address}: ${counts.sent}`).join(', ') + ')'
+    : '';
+  el.textContent = `⏳ Отправлено ${job.sent} из ${job.total}${perAccount}, ошибок: ${job.failed}${skipped}, осталось: ${job.remaining}`;
+}
+
+function pollJob(el, jobId) {
+  fetch(`/jobs/${jobId}`)
+    .then(response => response.json().then(job => {
+      if (!response.ok) throw new Error(job.error || "❌ Задача не найдена.");
+      return job;
+    }))
+    .then(job => {
+      renderJobProgress(el, job);
+      if (job.state !== 'done' && job.state !== 'failed') setTimeout(() => pollJob(el, jobId), 1000);
+    })
+    .catch(error => { el.textContent = error.message; });
+}
+
+function trackJob(el) {
+  // Short polling: each request is over in milliseconds, so a sync worker is never held by a
+  // watching tab the way an open /stream connection holds it
+  pollJob(el, el.dataset.jobId);
+}
+
+function initJobTracking() {
+  document.body.addEventListener('htmx:afterSwap', event => {
+    if (event.detail.target.id !== 'status') return;
+    const jobStatus = document.getElementById('job-status');
+    if (jobStatus) trackJob(jobStatus);
+  });
+}
+
 // Persist last inputs to datalist
 function initDatalistPersistence() {
   const fields = [
@@ -208,4 +377,5 @@ document.addEventListener("DOMContentLoaded", () => {
   initPreviewHandlers();
   initDelayedSubmit();
   initDatalistPersistence();
+  initJobTracking();
 });
\ No newline at end of file
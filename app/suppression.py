@@ -0,0 +1,177 @@
+# app/suppression.py
+#
+# Addresses that must not get mail any more: hard bounces recorded by earlier campaigns and
+# manual opt-outs.
+# python -m app.suppression add|remove ADDRESS... [--reason TEXT] | list
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from itertools import chain
+
+from app.dead_letters import reply_text
+
+
+# Suppression settings
+SUPPRESSION_PATH = os.getenv("SUPPRESSION_PATH", "app/data/suppression.sqlite3")
+
+
+def normalize_address(address):
+    return address.strip().lower()
+
+
+def hard_bounces(refused):
+    # refused: {address: (code, message)} as in SMTPRecipientsRefused or what sendmail returns;
+    # a 5xx reply to RCPT TO means the mailbox itself is gone or refuses us
+    return [(address, code, reply_text(message)) for address, (code, message) in (refused or {}).items()
+            if 500 <= code < 600]
+
+
+class SuppressionList:
+    # SQLite keeps the list across restarts; lookups go to a set loaded once per process and
+    # reloaded only when another connection has changed the file since
+
+    def __init__(self, path=SUPPRESSION_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS suppressed ("
+            " email TEXT PRIMARY KEY,"
+            " code INTEGER,"
+            " reason TEXT,"
+            " source TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._version = None
+        self.emails = frozenset()
+        self.refresh()
+
+    def refresh(self):
+        # data_version only moves when another connection commits, so this is one cheap query
+        # unless a worker next door has recorded bounces
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                self.emails = frozenset(row[0] for row in self._conn.execute("SELECT email FROM suppressed"))
+                self._version = version
+        return self
+
+    def __contains__(self, address):
+        return normalize_address(address) in self.emails
+
+    def __len__(self):
+        return len(self.emails)
+
+    def add(self, address, code=None, reason=None, source=None):
+        self.add_many([(address, code, reason)], source=source)
+
+    def add_many(self, entries, source=None):
+        # entries: (address, code, reason) tuples, e.g. from hard_bounces()
+        rows = [(normalize_address(address), code, reason, source, time.time()) for address, code, reason in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO suppressed (email, code, reason, source, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self.emails = self.emails | {row[0] for row in rows}
+
+    def remove(self, address):
+        address = normalize_address(address)
+        with self._lock:
+            self._conn.execute("DELETE FROM suppressed WHERE email = ?", (address,))
+            self._conn.commit()
+            self.emails = self.emails - {address}
+
+    def entries(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT email, code, reason, source, created_at FROM suppressed ORDER BY created_at"
+            ).fetchall()
+        return [dict(zip(('email', 'code', 'reason', 'source', 'created_at'), row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def drop_suppressed(df, suppression):
+    # df: output of normalize_contacts. Suppressed addresses leave their letter: when it is the
+    # primary one, the first remaining CC takes its place, and a letter with nobody left is dropped.
+    # Returns the filtered frame and how many addresses were taken out
+    emails = suppression.refresh().emails if suppression is not None else ()
+    if not emails or df.empty:
+        return df, 0
+
+    # One set intersection per column tells whether anything is suppressed at all; the cost
+    # follows the size of the upload, not of the list
+    primary = df['email'].tolist()
+    ccs = df['_cc_emails'].tolist()
+    lowered = [address.lower() for address in primary]
+    cc_lowered = [address.lower() for address in chain.from_iterable(ccs)]
+    bad = emails.intersection(lowered) | emails.intersection(cc_lowered)
+    if not bad:
+        return df, 0
+
+    hit = [address in bad for address in lowered]
+    owners = (pos for pos, row_cc in enumerate(ccs) for _ in row_cc)
+    for pos, address in zip(owners, cc_lowered):
+        if address in bad:
+            hit[pos] = True
+
+    removed = 0
+    keep = [not h for h in hit]
+    for pos in (pos for pos, h in enumerate(hit) if h):
+        addresses = [primary[pos]] + list(ccs[pos])
+        remaining = [address for address in addresses if address.lower() not in bad]
+        removed += len(addresses) - len(remaining)
+        if remaining:
+            primary[pos], ccs[pos] = remaining[0], remaining[1:]
+            keep[pos] = True
+    df = df.assign(email=primary, _cc_emails=ccs)
+    return df[keep].reset_index(drop=True), removed
+
+
+_suppression = None
+_suppression_lock = threading.Lock()
+
+
+def get_suppression_list():
+    global _suppression
+    with _suppression_lock:
+        if _suppression is None:
+            _suppression = SuppressionList()
+        return _suppression
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.suppression")
+    parser.add_argument('command', choices=('add', 'remove', 'list'))
+    parser.add_argument('addresses', nargs='*')
+    parser.add_argument('--reason', default="opt-out")
+    args = parser.parse_args(argv)
+
+    suppression = get_suppression_list()
+    if args.command == 'add':
+        suppression.add_many([(address, None, args.reason) for address in args.addresses], source="manual")
+    elif args.command == 'remove':
+        for address in args.addresses:
+            suppression.remove(address)
+    else:
+        for entry in suppression.entries():
+            print(f"{entry['email']}\t{entry['code'] or ''}\t{entry['reason'] or ''}\t{entry['source'] or ''}")
+    print(f"suppressed: {len(suppression)}")
+
+
+if __name__ == '__main__':
+    main()
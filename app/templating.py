@@ -0,0 +1,105 @@
+# app/templating.py
+
+import os
+import threading
+from functools import lru_cache
+from string import Template
+
+
+# Next to this module, so the app starts from any working directory
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_templates')
+TEMPLATE_NAMES = ['check', 'check_rim', 'confirm', 'new_rim', 'close', 'media']
+
+
+def _parse(text):
+    # Splits a string.Template into literal chunks and (name, source) placeholders
+    parts = []
+    pos = 0
+    for match in Template.pattern.finditer(text):
+        if match.start() > pos:
+            parts.append(text[pos:match.start()])
+        name = match.group('named') or match.group('braced')
+        if name is not None:
+            parts.append((name, match.group(0)))
+        elif match.group('escaped') is not None:
+            parts.append(Template.delimiter)
+        else:
+            parts.append(match.group(0))
+        pos = match.end()
+    if pos < len(text):
+        parts.append(text[pos:])
+    return _merge(parts)
+
+
+def _merge(parts):
+    merged = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return tuple(merged)
+
+
+class CompiledTemplate:
+    # Renders like Template.safe_substitute: unknown placeholders are left as written
+
+    def __init__(self, text, parts=None):
+        self.text = text
+        self.parts = _parse(text) if parts is None else parts
+        self.placeholders = frozenset(part[0] for part in self.parts if isinstance(part, tuple))
+
+    def bind(self, **fields):
+        # Substitutes campaign-wide fields once; the result only renders per-contact ones
+        parts = [
+            str(fields[part[0]]) if isinstance(part, tuple) and part[0] in fields else part
+            for part in self.parts
+        ]
+        return CompiledTemplate(self.text, _merge(parts))
+
+    def render(self, **fields):
+        return ''.join([
+            part if isinstance(part, str) else str(fields[part[0]]) if part[0] in fields else part[1]
+            for part in self.parts
+        ])
+
+
+@lru_cache(maxsize=64)
+def compile_template(text):
+    return CompiledTemplate(text)
+
+
+class TemplateStore:
+    def __init__(self, directory=TEMPLATES_DIR, names=TEMPLATE_NAMES):
+        self.directory = directory
+        self.names = list(names)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.txt")
+
+    def get(self, name):
+        # Re-reads a template only when its file changed on disk
+        path = self.path(name)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+        with self._lock:
+            self._cache[name] = (mtime, text)
+        return text
+
+    def compiled(self, name):
+        return compile_template(self.get(name))
+
+    def preload(self):
+        # Reads and compiles every template once, e.g. in the gunicorn master before the workers fork
+        for name in self.names:
+            self.compiled(name)
+
+    def all(self):
+        return {name: self.get(name) for name in self.names}
@@ -0,0 +1,165 @@
+import smtplib
+import sqlite3
+
+import pytest
+
+from app.accounts import SenderAccount, shard_sizes, shard_contacts, send_sharded
+from app.jobs import Job
+from app.journal import DeliveryJournal
+from app.rate_limit import TokenBucket
+from run import app as flask_app
+
+
+@pytest.fixture()
+def journal(tmp_path):
+    j = DeliveryJournal(str(tmp_path / "journal.sqlite3"))
+    yield j
+    j.close()
+
+
+def _send(accounts, contacts, **kwargs):
+    return send_sharded(accounts, contacts, [], "B", "P", "", "Hi", pool_size=1,
+                        limiter=TokenBucket(per_second=0, per_hour=0), **kwargs)
+
+
+def test_shard_sizes_follow_weights():
+    # Act
+    sizes = shard_sizes(10, [1, 1, 2], [None, None, None])
+
+    # Assert
+    assert sizes == [3, 2, 5]
+
+
+def test_shard_sizes_move_overflow_past_quota():
+    # Act
+    sizes = shard_sizes(100, [1, 1], [10, None])
+
+    # Assert
+    assert sizes == [10, 90]
+
+
+def test_shard_sizes_reject_list_larger_than_quota():
+    # Act / Assert
+    with pytest.raises(ValueError, match="квоты"):
+        shard_sizes(30, [1, 1], [10, 15])
+
+
+def test_quota_strategy_uses_remaining_quota(journal, make_contacts):
+    # Arrange
+    busy = SenderAccount("busy@example.com", "pwd", daily_quota=100)
+    fresh = SenderAccount("fresh@example.com", "pwd", daily_quota=100)
+    for contact in make_contacts(80):
+        journal.record("older", contact, {"email": contact["email"], "status": "sent", "account": busy.address})
+
+    # Act
+    shards = shard_contacts(make_contacts(60), [busy, fresh], journal=journal, strategy="quota")
+
+    # Assert
+    assert [(account.address, len(part)) for account, part in shards] == [
+        ("busy@example.com", 10), ("fresh@example.com", 50)
+    ]
+
+
+def test_send_sharded_splits_contacts_between_mailboxes(smtp, journal, make_contacts):
+    # Arrange
+    accounts = [SenderAccount("a@example.com", "pwd"), SenderAccount("b@example.com", "pwd", weight=3)]
+    job = Job("j")
+
+    # Act
+    report = _send(accounts, make_contacts(8), journal=journal, on_result=job.record)
+
+    # Assert
+    by_login = {}
+    for login, _, to_addrs, _ in smtp.sent:
+        by_login.setdefault(login, set()).add(to_addrs[0])
+    assert {login: len(r) for login, r in by_login.items()} == {"a@example.com": 2, "b@example.com": 6}
+    assert report.sent == 8
+    assert report.per_account()["b@example.com"] == {"sent": 6, "failed": 0, "skipped": 0, "error": None}
+    assert job.to_dict()["accounts"]["a@example.com"]["sent"] == 2
+    assert journal.sent_since("b@example.com", 0) == 6
+
+
+def test_one_failing_mailbox_does_not_stop_the_others(smtp, journal, make_contacts):
+    # Arrange
+    smtp.refuse_logins.add("bad@example.com")
+    accounts = [SenderAccount("good@example.com", "pwd"), SenderAccount("bad@example.com", "pwd")]
+
+    # Act
+    report = _send(accounts, make_contacts(6), journal=journal)
+
+    # Assert
+    assert report.sent == 3
+    assert "535" in report.per_account()["bad@example.com"]["error"]
+
+
+def test_all_mailboxes_failing_aborts(smtp, make_contacts):
+    # Arrange
+    smtp.refuse_logins.update({"a@example.com", "b@example.com"})
+    accounts = [SenderAccount("a@example.com", "pwd"), SenderAccount("b@example.com", "pwd")]
+
+    # Act / Assert
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        _send(accounts, make_contacts(4))
+
+
+def test_resume_skips_delivered_even_when_resharded(smtp, journal, make_contacts):
+    # Arrange
+    contacts = make_contacts(6)
+    _send([SenderAccount("a@example.com", "pwd")], contacts, journal=journal)
+    smtp.sent.clear()
+
+    # Act: the same campaign again, now with a second mailbox
+    report = _send([SenderAccount("a@example.com", "pwd"), SenderAccount("b@example.com", "pwd")], contacts,
+                   journal=journal, resume=True)
+
+    # Assert
+    assert report.skipped == 6
+    assert smtp.sent == []
+
+
+def test_journal_adds_sender_column_to_old_files(tmp_path, make_contacts):
+    # Arrange
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE deliveries (campaign_id TEXT NOT NULL, recipient TEXT NOT NULL, email TEXT NOT NULL,"
+                 " status TEXT NOT NULL, error TEXT, recipients TEXT, created_at REAL NOT NULL)")
+    conn.execute("INSERT INTO deliveries VALUES ('c', 'k', 'a@b.com', 'sent', NULL, '[]', 1)")
+    conn.commit()
+    conn.close()
+
+    # Act
+    journal = DeliveryJournal(path)
+    journal.record("c", make_contacts(1)[0], {"email": "to0@example.com", "status": "sent", "account": "me@b.com"})
+
+    # Assert
+    assert journal.delivered("c") == {"k", "to0@example.com|Москва|ТЦ Мега"}
+    assert journal.sent_since("me@b.com", 0) == 1
+    journal.close()
+
+
+def test_sender_routes_manage_session_list():
+    # Arrange
+    flask_app.config["TESTING"] = True
+    with flask_app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["MY_ADDRESS"] = "user@example.com"
+            sess["PASSWORD"] = "secret"
+
+        # Act
+        added = client.post("/senders", data={"email": "second@example.com", "password": "x", "weight": "2"})
+        duplicate = client.post("/senders", data={"email": "user@example.com", "password": "x"})
+        invalid = client.post("/senders", data={"email": "third@example.com", "password": "x", "weight": "abc"})
+        with client.session_transaction() as sess:
+            senders = sess["SENDERS"]
+        client.post("/senders/remove", data={"email": "second@example.com"})
+        with client.session_transaction() as sess:
+            remaining = sess["SENDERS"]
+
+    # Assert
+    assert added.status_code == 302
+    assert [s["address"] for s in senders] == ["second@example.com"]
+    assert senders[0]["weight"] == 2
+    assert duplicate.status_code == 400
+    assert invalid.status_code == 400
+    assert "числами" in invalid.get_data(as_text=True)
+    assert remaining == []
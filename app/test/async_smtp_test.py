@@ -0,0 +1,219 @@
+import asyncio
+import smtplib
+import socketserver
+import threading
+
+import pytest
+
+from app import email_sender
+from app.async_smtp import AsyncSMTP, AsyncSMTPPool, quote_data
+from app.email_sender import send_emails
+from app.rate_limit import TokenBucket
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self.reply("220 fake ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            with server.lock:
+                server.commands.append(command)
+
+            if verb == "EHLO":
+                features = ["fake"] + (["PIPELINING"] if server.pipelining else []) + [f"AUTH {server.auth}"]
+                for feature in features[:-1]:
+                    self.reply(f"250-{feature}")
+                self.reply(f"250 {features[-1]}")
+            elif verb == "AUTH":
+                if command.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    with server.lock:
+                        server.commands.append(self.rfile.readline().decode().strip())
+                    self.reply("334 UGFzc3dvcmQ6")
+                    with server.lock:
+                        server.commands.append(self.rfile.readline().decode().strip())
+                self.reply("535 Bad credentials" if server.reject_login else "235 OK")
+            elif verb == "MAIL":
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(':', 1)[1].strip('<>')
+                self.reply("550 No such user" if address in server.refuse else "250 OK")
+            elif verb == "DATA":
+                if server.data_failures:
+                    server.data_failures -= 1
+                    self.reply("451 Try again later")
+                    continue
+                self.reply("354 Go ahead")
+                body = b""
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    body += chunk
+                with server.lock:
+                    server.messages.append(body)
+                self.reply("250 Queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class FakeServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, pipelining=True, auth="PLAIN LOGIN", refuse=(), reject_login=False, data_failures=0):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.pipelining = pipelining
+        self.auth = auth
+        self.refuse = set(refuse)
+        self.reject_login = reject_login
+        self.data_failures = data_failures
+        self.commands = []
+        self.messages = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        return False
+
+
+def _send(server, to_addrs, data, **kwargs):
+    async def run():
+        client = AsyncSMTP("127.0.0.1", server.port, "PLAIN", **kwargs)
+        await client.connect()
+        await client.login("me@example.com", "secret")
+        try:
+            return await client.sendmail("me@example.com", to_addrs, data)
+        finally:
+            await client.quit()
+    return asyncio.run(run())
+
+
+def test_quote_data_matches_smtplib():
+    # Arrange
+    data = b"line\n.dot\r\n..two\rend"
+
+    # Act
+    quoted = quote_data(data)
+
+    # Assert
+    assert quoted == b"line\r\n..dot\r\n...two\r\nend\r\n.\r\n"
+
+
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_sendmail_delivers_and_reports_refused_recipients(pipelining):
+    # Arrange
+    with FakeServer(pipelining=pipelining, refuse={"gone@example.com"}) as server:
+        # Act
+        refused = _send(server, ["to@example.com", "gone@example.com"], b"Subject: hi\r\n\r\n.hello\r\n")
+
+    # Assert
+    assert refused == {"gone@example.com": (550, b"No such user")}
+    assert server.messages == [b"Subject: hi\r\n\r\n..hello\r\n"]
+    envelope = [c for c in server.commands if c.split(' ', 1)[0] in ("MAIL", "RCPT", "DATA")]
+    assert envelope == ["MAIL FROM:<me@example.com>", "RCPT TO:<to@example.com>",
+                        "RCPT TO:<gone@example.com>", "DATA"]
+
+
+def test_all_recipients_refused_raises_and_resets():
+    # Arrange
+    with FakeServer(pipelining=False, refuse={"gone@example.com"}) as server:
+        # Act
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            _send(server, ["gone@example.com"], b"x")
+
+    # Assert
+    assert "DATA" not in server.commands
+    assert "RSET" in server.commands
+    assert server.messages == []
+
+
+def test_login_falls_back_to_auth_login_and_reports_bad_credentials():
+    # Arrange
+    with FakeServer(auth="LOGIN", reject_login=True) as server:
+        # Act
+        with pytest.raises(smtplib.SMTPAuthenticationError) as error:
+            _send(server, ["to@example.com"], b"x")
+
+    # Assert
+    assert error.value.smtp_code == 535
+    assert "AUTH LOGIN" in server.commands
+
+
+def test_pool_reuses_sessions():
+    # Arrange
+    async def run(server):
+        async with AsyncSMTPPool("me@example.com", "secret", "127.0.0.1", server.port, "PLAIN", size=3) as pool:
+            await asyncio.gather(*(pool.sendmail("me@example.com", [f"to{i}@example.com"], b"x") for i in range(30)))
+
+    with FakeServer() as server:
+        # Act
+        asyncio.run(run(server))
+
+    # Assert
+    assert len(server.messages) == 30
+    assert 1 <= sum(1 for c in server.commands if c.startswith("EHLO")) <= 3
+
+
+def test_send_emails_over_asyncio_transport(monkeypatch):
+    # Arrange
+    contacts = [
+        {"email": f"to{i}@example.com", "name": "N", "mall": "M", "city": "C", "_cc_emails": []}
+        for i in range(20)
+    ]
+    results = []
+
+    with FakeServer(data_failures=1) as server:
+        monkeypatch.setattr(email_sender, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(email_sender, "SMTP_PORT", server.port)
+        monkeypatch.setattr(email_sender, "SMTP_PROTOCOL", "PLAIN")
+
+        # Act
+        report = send_emails(
+            "me@example.com", "secret", contacts, ["boss@example.com"], "B", "P", "", "Hello ${NAME}", "Me",
+            pool_size=5, on_result=results.append, transport="asyncio", retry_base=0,
+            limiter=TokenBucket(per_second=0, per_hour=0, max_cooldown=0)
+        )
+
+    # Assert
+    assert report.sent == 20
+    assert len(results) == 20
+    assert len(server.messages) == 20
+    assert sum(1 for c in server.commands if c == "RCPT TO:<boss@example.com>") == 21
+
+
+def test_send_emails_asyncio_transport_aborts_on_bad_login(monkeypatch):
+    # Arrange
+    contacts = [{"email": "to@example.com", "name": "N", "mall": "M", "city": "C", "_cc_emails": []}]
+
+    with FakeServer(reject_login=True) as server:
+        monkeypatch.setattr(email_sender, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(email_sender, "SMTP_PORT", server.port)
+        monkeypatch.setattr(email_sender, "SMTP_PROTOCOL", "PLAIN")
+        monkeypatch.setattr(email_sender, "SMTP_TRANSPORT", "asyncio")
+
+        # Act / Assert
+        with pytest.raises(smtplib.SMTPAuthenticationError):
+            send_emails("me@example.com", "bad", contacts, [], "B", "P", "", "Hi", "Me",
+                        limiter=TokenBucket(per_second=0, per_hour=0))
+        assert server.messages == []
@@ -0,0 +1,91 @@
+from app.batching import plan_envelopes, envelope_contacts
+from app.email_sender import send_emails
+from app.journal import DeliveryJournal
+from app.rate_limit import TokenBucket
+
+
+def _contact(address, mall="ТЦ Мега", cc=()):
+    return {"email": address, "name": "Коллеги", "mall": mall, "city": "Москва", "rim": "R1",
+            "_cc_emails": list(cc)}
+
+
+def test_contacts_are_ordered_by_domain_keeping_file_order():
+    # Arrange
+    contacts = [_contact("a@x.ru"), _contact("b@y.ru"), _contact("c@x.ru"), _contact("d@Y.ru")]
+
+    # Act
+    planned = plan_envelopes(contacts, merge=False)
+
+    # Assert
+    assert [c["email"] for c in planned] == ["a@x.ru", "c@x.ru", "b@y.ru", "d@Y.ru"]
+
+
+def test_identical_letters_of_one_domain_are_merged():
+    # Arrange
+    contacts = [
+        _contact("a@uk.ru", cc=["boss@uk.ru"]),
+        _contact("b@uk.ru", cc=["boss@uk.ru"]),
+        _contact("c@uk.ru", mall="ТЦ Вега", cc=["boss@uk.ru"]),
+        _contact("d@other.ru", cc=["boss@uk.ru"]),
+        _contact("e@uk.ru"),
+    ]
+
+    # Act
+    planned = plan_envelopes(contacts, merge=True)
+
+    # Assert
+    assert [e["_to_emails"] for e in planned] == [["d@other.ru"], ["a@uk.ru", "b@uk.ru"], ["c@uk.ru"], ["e@uk.ru"]]
+    assert [c["email"] for c in envelope_contacts(planned[1])] == ["a@uk.ru", "b@uk.ru"]
+
+
+def test_merged_envelopes_respect_recipient_limit():
+    # Arrange
+    contacts = [_contact(f"to{i}@uk.ru") for i in range(7)]
+
+    # Act
+    planned = plan_envelopes(contacts, merge=True, max_recipients=4, cc_addresses=["boss@x.ru"])
+
+    # Assert
+    assert [len(e["_to_emails"]) for e in planned] == [3, 3, 1]
+
+
+def test_send_emails_sends_one_transaction_per_envelope(smtp, tmp_path):
+    # Arrange
+    journal = DeliveryJournal(str(tmp_path / "journal.sqlite3"))
+    contacts = [_contact("a@uk.ru"), _contact("b@uk.ru"), _contact("c@mall.ru")]
+    results = []
+
+    # Act
+    report = send_emails("me@x.ru", "pwd", contacts, [], "B", "P", "", "Hi ${NAME}", "Me", pool_size=1,
+                         limiter=TokenBucket(per_second=0, per_hour=0), journal=journal, on_result=results.append,
+                         merge_envelopes=True)
+
+    # Assert
+    assert len(smtp.sent) == 2
+    merged = next(msg for msg in smtp.messages() if "a@uk.ru" in msg["To"])
+    assert merged["To"] == "a@uk.ru, b@uk.ru"
+    assert report.sent == 3 and len(results) == 3
+    assert len(journal.delivered(report.campaign_id)) == 3
+    journal.close()
+
+
+def test_refused_members_of_a_merged_envelope_are_not_reported_as_sent(smtp, tmp_path):
+    # Arrange
+    def refuse(to_addrs):
+        if len(to_addrs) > 1:
+            return {"b@uk.ru": (550, b"No such user"), "c@uk.ru": (451, b"Try later")}
+
+    smtp.reply = refuse
+    journal = DeliveryJournal(str(tmp_path / "journal.sqlite3"))
+    contacts = [_contact("a@uk.ru"), _contact("b@uk.ru"), _contact("c@uk.ru")]
+
+    # Act
+    report = send_emails("me@x.ru", "pwd", contacts, [], "B", "P", "", "Hi ${NAME}", "Me", pool_size=1,
+                         limiter=TokenBucket(per_second=0, per_hour=0, max_cooldown=0), journal=journal,
+                         merge_envelopes=True, retry_base=0)
+
+    # Assert: the 5xx member fails, the 4xx member alone gets the message again
+    assert smtp.envelopes == [["a@uk.ru", "b@uk.ru", "c@uk.ru"], ["c@uk.ru"]]
+    assert report.sent == 2 and report.failed == 1
+    assert sorted(key.split("|")[0] for key in journal.delivered(report.campaign_id)) == ["a@uk.ru", "c@uk.ru"]
+    journal.close()
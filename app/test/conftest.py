@@ -0,0 +1,119 @@
+import email
+import email.policy
+import smtplib
+import threading
+import time
+
+import pytest
+
+import run
+from app.disk_cache import FrameDiskCache
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(tmp_path_factory, monkeypatch):
+    # Parses made by route tests go to a temp directory, never to app/data/cache
+    store = FrameDiskCache(str(tmp_path_factory.mktemp("cache")))
+    monkeypatch.setattr(run.parse_cache, "store", store)
+    return store
+
+
+@pytest.fixture()
+def make_contacts():
+    # Sender-ready contacts to0@example.com, to1@example.com, ...; fields override the defaults for every row
+    def make(n, **fields):
+        contacts = []
+        for i in range(n):
+            contact = {"email": f"to{i}@example.com", "name": "Коллеги", "mall": "ТЦ Мега", "city": "Москва",
+                       "rim": f"R{i}", "_cc_emails": []}
+            contact.update(fields)
+            contact["_cc_emails"] = list(contact["_cc_emails"])
+            contacts.append(contact)
+        return contacts
+    return make
+
+
+class FakeMailServer:
+    # What every fake SMTP_SSL connection of a test saw, and how it answers
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = []
+        self.attempts = []      # first recipient of every sendmail call
+        self.envelopes = []     # all recipients of every sendmail call
+        self.sent = []          # (login, from_addr, to_addrs, msg) of accepted transactions
+        self.script = {}        # first recipient -> replies to its successive attempts: an exception or a refused dict
+        self.reply = None       # reply(to_addrs) for attempts the script has nothing for
+        self.refuse_logins = set()
+        self.disconnect_next = 0
+        self.delay = 0
+        self.active = 0
+        self.max_active = 0
+        self.debuglevel = None
+
+    def recipients(self):
+        return [to_addrs[0] for _, _, to_addrs, _ in self.sent]
+
+    def messages(self):
+        return [email.message_from_bytes(msg, policy=email.policy.default) for _, _, _, msg in self.sent]
+
+
+@pytest.fixture()
+def smtp(monkeypatch):
+    server = FakeMailServer()
+
+    class FakeSMTP:
+        def __init__(self, host, port, context=None):
+            self.host = host
+            self.port = port
+            self.user = None
+            self.logged_in = None
+            self.sent = []
+            self.closed = False
+            with server.lock:
+                server.connections.append(self)
+
+        def set_debuglevel(self, level): server.debuglevel = level
+        def ehlo(self): pass
+
+        def login(self, user, pwd):
+            if user in server.refuse_logins:
+                raise smtplib.SMTPAuthenticationError(535, b"Bad credentials")
+            self.user = user
+            self.logged_in = (user, pwd)
+
+        def sendmail(self, from_addr, to_addrs, msg):
+            to_addrs = list(to_addrs)
+            with server.lock:
+                server.attempts.append(to_addrs[0])
+                server.envelopes.append(to_addrs)
+                if server.disconnect_next:
+                    server.disconnect_next -= 1
+                    raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+                replies = server.script.get(to_addrs[0])
+                reply = replies.pop(0) if replies else None
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            try:
+                time.sleep(server.delay)
+                if reply is None and server.reply:
+                    reply = server.reply(to_addrs)
+                if isinstance(reply, Exception):
+                    raise reply
+                with server.lock:
+                    self.sent.append(to_addrs)
+                    server.sent.append((self.user, from_addr, to_addrs, msg))
+                return reply or {}
+            finally:
+                with server.lock:
+                    server.active -= 1
+
+        def quit(self): self.closed = True
+        def close(self): self.closed = True
+        def __enter__(self): return self
+
+        def __exit__(self, *exc):
+            self.closed = True
+            return False
+
+    monkeypatch.setattr("app.smtp_pool.smtplib.SMTP_SSL", FakeSMTP)
+    return server
@@ -0,0 +1,80 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from app.batching import plan_envelopes
+from app.contacts import Contact, contacts_from_frame
+from app.journal import recipient_key
+from app.mime_pipeline import iter_rendered, make_renderer
+from app.templating import compile_template
+
+
+def _frame(n):
+    return pd.DataFrame({
+        "city": ["Москва"] * n,
+        "mall": [f"Мега {i % 2}" for i in range(n)],
+        "email": [f"to{i}@example.com" for i in range(n)],
+        "name": ["Коллеги"] * n,
+        "rim": [f"R{i}" for i in range(n)],
+        "link": [""] * n,
+        "min": ["10"] * n,
+        "sec": ["5"] * n,
+        "_cc_emails": [["cc@example.com"] if i % 2 else [] for i in range(n)],
+    })
+
+
+def test_contact_reads_like_the_records_dict():
+    # Arrange
+    df = _frame(3)
+
+    # Act
+    contacts = contacts_from_frame(df)
+
+    # Assert
+    assert contacts == [dict(row, _cc_emails=tuple(row["_cc_emails"])) for row in df.to_dict(orient="records")]
+    contact = contacts[1]
+    assert contact["email"] == "to1@example.com" and contact.get("rim", "") == "R1"
+    assert contact.get("_to_emails") is None and contact.get("_merged", []) == []
+    assert "mall" in contact and "_merged" not in contact
+    with pytest.raises(KeyError):
+        contact["get"]
+    assert recipient_key(contact) == "to1@example.com|Москва|Мега 1"
+
+
+def test_repeated_values_are_shared_between_records():
+    # Act
+    contacts = contacts_from_frame(_frame(4))
+
+    # Assert
+    assert contacts[1]["_cc_emails"] is contacts[3]["_cc_emails"]
+    assert contacts[0]["city"] is contacts[3]["city"]
+    assert not hasattr(contacts[0], "__dict__")
+
+
+def test_records_survive_pickling_and_envelope_merging():
+    # Arrange
+    contacts = contacts_from_frame(_frame(4))
+
+    # Act
+    copy = pickle.loads(pickle.dumps(contacts[1]))
+    envelopes = plan_envelopes(contacts, merge=True)
+
+    # Assert
+    assert isinstance(copy, Contact) and copy == contacts[1]
+    assert [e["_to_emails"] for e in envelopes] == [["to0@example.com"], ["to1@example.com"],
+                                                    ["to2@example.com"], ["to3@example.com"]]
+
+
+def test_records_render_on_a_process_pool():
+    # Arrange
+    template = compile_template("${NAME}: ${RIM}").bind(BRAND="B", PERIOD="P", DOC="")
+    render = make_renderer(template, [], "B", "P", "me@example.com", "Me")
+
+    # Act
+    rendered = list(iter_rendered(contacts_from_frame(_frame(3)), render, processes=2))
+
+    # Assert
+    assert [recipients for _, recipients, _ in rendered] == [["to0@example.com"],
+                                                             ["to1@example.com", "cc@example.com"],
+                                                             ["to2@example.com"]]
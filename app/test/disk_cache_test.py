@@ -0,0 +1,115 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.disk_cache import FrameDiskCache
+from app.parse_cache import ParseCache, content_hash
+
+
+def _frame(n=3):
+    return pd.DataFrame({"email": [f"to{i}@b.com" for i in range(n)], "mall": ["Мега"] * n},
+                        index=range(2, n + 2))
+
+
+def test_frames_round_trip_with_excel_row_index(tmp_path):
+    # Arrange
+    cache = FrameDiskCache(str(tmp_path), use_arrow=False)
+    token = content_hash(b"book")
+
+    # Act
+    cache.put(token, _frame())
+    loaded = cache.get(token)
+
+    # Assert
+    pd.testing.assert_frame_equal(loaded, _frame())
+
+
+def test_arrow_files_round_trip(tmp_path):
+    # Arrange
+    pytest.importorskip("pyarrow")
+    cache = FrameDiskCache(str(tmp_path), use_arrow=True)
+    token = content_hash(b"book")
+
+    # Act
+    cache.put(token, _frame())
+
+    # Assert
+    assert os.path.exists(cache.path(token))
+    pd.testing.assert_frame_equal(cache.get(token), _frame(), check_index_type=False)
+
+
+def test_frames_of_another_reader_version_are_not_served(tmp_path):
+    # Arrange
+    token = content_hash(b"book")
+    FrameDiskCache(str(tmp_path), use_arrow=False, version=1).put(token, _frame())
+
+    # Act
+    newer = FrameDiskCache(str(tmp_path), use_arrow=False, version=2)
+
+    # Assert
+    assert newer.get(token) is None
+    assert len(newer.entries()) == 1  # still counted, so eviction removes it
+
+
+def test_tokens_that_are_not_hashes_never_touch_the_disk(tmp_path):
+    # Arrange
+    cache = FrameDiskCache(str(tmp_path / "cache"), use_arrow=False)
+
+    # Act / Assert
+    assert cache.get("../../etc/passwd") is None
+    assert cache.get(content_hash(b"x") + ":prefix") is None
+    with pytest.raises(ValueError):
+        cache.put("../evil", _frame())
+
+
+def test_expired_and_corrupt_entries_are_dropped(tmp_path):
+    # Arrange
+    cache = FrameDiskCache(str(tmp_path), ttl=60, use_arrow=False)
+    old, broken = content_hash(b"old"), content_hash(b"broken")
+    cache.put(old, _frame())
+    os.utime(cache.path(old), (1, 1))
+    with open(cache.path(broken), "wb") as f:
+        f.write(b"not a frame")
+
+    # Act / Assert
+    assert cache.get(old) is None
+    assert cache.get(broken) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_files_go_first(tmp_path):
+    # Arrange
+    probe = FrameDiskCache(str(tmp_path / "probe"), use_arrow=False)
+    probe.put(content_hash(b"probe"), _frame(50))
+    size = os.path.getsize(probe.path(content_hash(b"probe")))
+    cache = FrameDiskCache(str(tmp_path / "cache"), max_bytes=int(size * 2.5), use_arrow=False)
+    a, b, c = (content_hash(x) for x in (b"a", b"b", b"c"))
+    cache.put(a, _frame(50))
+    cache.put(b, _frame(50))
+    os.utime(cache.path(a), (1_000, 1_000))
+    os.utime(cache.path(b), (500, 500))
+    cache.ttl = 10 ** 12
+
+    # Act
+    cache.put(c, _frame(50))
+
+    # Assert
+    assert not os.path.exists(cache.path(b))
+    assert os.path.exists(cache.path(a)) and os.path.exists(cache.path(c))
+
+
+def test_second_worker_reads_the_parse_from_disk(tmp_path):
+    # Arrange
+    store = FrameDiskCache(str(tmp_path), use_arrow=False)
+    first_worker = ParseCache(store=store)
+    second_worker = ParseCache(store=FrameDiskCache(str(tmp_path), use_arrow=False))
+    token, _ = first_worker.get_or_load(content_hash(b"workbook"), _frame)
+
+    # Act
+    token2, frame = second_worker.get_or_load(token, lambda: pytest.fail("parsed again"))
+
+    # Assert
+    assert token2 == token
+    pd.testing.assert_frame_equal(frame, _frame())
+    assert second_worker.get(token) is frame
@@ -1,9 +1,5 @@
-import io
-import os
-import json
 import pytest
 import pandas as pd
-from email.message import Message
 
 from app.email_sender import get_contacts_from_excel, send_emails
 
@@ -116,29 +112,8 @@ def test_get_contacts_from_excel_template_validation_missing_link_column(tmp_pat
     assert "Нет необходимого столбца(ов)" in msg and "link" in msg
 
 
-def test_send_emails_builds_message_and_combines_cc(monkeypatch):
+def test_send_emails_builds_message_and_combines_cc(smtp):
     # Arrange
-    class DummySMTP:
-        instances = []
-
-        def __init__(self, host, port, context=None):
-            self.host = host
-            self.port = port
-            self.context = context
-            self.logged_in = None
-            self.sent_messages = []
-            DummySMTP.instances.append(self)
-
-        def set_debuglevel(self, level): self.debuglevel = level
-        def ehlo(self): self.did_ehlo = True
-        def login(self, user, pwd): self.logged_in = (user, pwd)
-        def send_message(self, msg: Message, from_addr: str, to_addrs):
-            self.sent_messages.append((msg, from_addr, list(to_addrs)))
-        def __enter__(self): return self
-        def __exit__(self, exc_type, exc, tb): return False
-
-    monkeypatch.setattr("app.email_sender.smtplib.SMTP_SSL", DummySMTP)
-
     my_address = "me@example.com"
     password = "secret"
     contacts = [
@@ -162,12 +137,13 @@ def test_send_emails_builds_message_and_combines_cc(monkeypatch):
     send_emails(my_address, password, contacts, cc_addresses, brand, period, doc, template_text, display_name)
 
     # Assert
-    smtp = DummySMTP.instances[-1]
-    assert smtp.host == "smtp.yandex.ru" and smtp.port == 465
-    assert smtp.logged_in == (my_address, password)
-    assert len(smtp.sent_messages) == 1
+    connection = smtp.connections[-1]
+    assert connection.host == "smtp.yandex.ru" and connection.port == 465
+    assert connection.logged_in == (my_address, password)
+    assert len(smtp.sent) == 1
 
-    msg, from_addr, to_addrs = smtp.sent_messages[0]
+    _, from_addr, to_addrs, _ = smtp.sent[0]
+    msg = smtp.messages()[0]
     assert from_addr == my_address
     assert set(to_addrs) == {"to@example.com", "cc1@example.com", "cc2@example.com", "cc3@example.com"}
     assert msg["To"] == "to@example.com"
@@ -0,0 +1,98 @@
+import email
+import email.policy
+import mailbox
+import os
+
+import pytest
+
+from app.export import MANIFEST_NAME, MBOX_NAME, eml_name, export_emails, read_export
+from app.mime_pipeline import make_renderer
+from app.templating import compile_template
+
+
+@pytest.fixture()
+def contacts(make_contacts):
+    contacts = make_contacts(3, mall='"Мега"')
+    contacts[1]["_cc_emails"] = ["cc1@example.com"]
+    return contacts
+
+
+def _export(directory, fmt, contacts, processes=0, **kwargs):
+    return export_emails("me@example.com", contacts, ["boss@example.com"], "B", "P", "",
+                         "${NAME}: ${RIM} // ${BRAND}", "Me", str(directory), fmt=fmt, processes=processes, **kwargs)
+
+
+def _wire_bytes(contact):
+    template = compile_template("${NAME}: ${RIM} // ${BRAND}").bind(BRAND="B", PERIOD="P", DOC="")
+    return make_renderer(template, ["boss@example.com"], "B", "P", "me@example.com", "Me")(contact)[2]
+
+
+@pytest.mark.parametrize("fmt", ["eml", "maildir", "mbox"])
+def test_export_writes_every_message_with_a_manifest(tmp_path, fmt, contacts):
+    # Act
+    report = _export(tmp_path, fmt, contacts)
+
+    # Assert
+    exported = list(read_export(str(tmp_path)))
+    assert report["messages"] == 3
+    assert [row["email"] for row, _ in exported] == ["to0@example.com", "to1@example.com", "to2@example.com"]
+    row, data = exported[1]
+    assert row["to"] == "to1@example.com"
+    assert set(row["cc"].split(", ")) == {"cc1@example.com", "boss@example.com"}
+    assert row["recipients"] == "3"
+    assert row["subject"] == "Мега (г. Москва) // B // P"
+    msg = email.message_from_bytes(data, policy=email.policy.default)
+    assert msg["Subject"] == row["subject"]
+    assert "Коллеги: R1 // B" in msg.get_payload()[0].get_content()
+    assert len(data) == int(row["bytes"])
+
+
+def test_eml_files_hold_the_exact_wire_bytes(tmp_path, contacts):
+    # Arrange
+    contact = contacts[0]
+
+    # Act
+    _export(tmp_path, "eml", [contact])
+
+    # Assert
+    with open(tmp_path / eml_name(1, "to0@example.com"), "rb") as file:
+        data = file.read()
+    # Only the multipart boundary differs between two renders
+    boundary = email.message_from_bytes(data).get_boundary().encode()
+    expected = _wire_bytes(contact)
+    assert data.replace(boundary, b"") == expected.replace(email.message_from_bytes(expected).get_boundary().encode(), b"")
+
+
+def test_maildir_and_mbox_open_with_the_standard_library(tmp_path, contacts):
+    # Act
+    _export(tmp_path / "maildir", "maildir", contacts)
+    _export(tmp_path / "mbox", "mbox", contacts)
+
+    # Assert
+    maildir = mailbox.Maildir(str(tmp_path / "maildir"), create=False)
+    box = mailbox.mbox(str(tmp_path / "mbox" / MBOX_NAME), create=False)
+    assert sorted(m["To"] for m in maildir) == ["to0@example.com", "to1@example.com", "to2@example.com"]
+    assert [m["To"] for m in box] == ["to0@example.com", "to1@example.com", "to2@example.com"]
+    assert all(m.get_from().startswith("me@example.com ") for m in box)
+    box.close()
+
+
+def test_process_pool_keeps_input_order(tmp_path, make_contacts):
+    # Act
+    _export(tmp_path, "eml", make_contacts(20, mall='"Мега"'), processes=2, chunk_size=3)
+
+    # Assert
+    rows = [row for row, _ in read_export(str(tmp_path))]
+    assert [row["n"] for row in rows] == [str(n) for n in range(1, 21)]
+    assert sorted(os.listdir(tmp_path)) == sorted([MANIFEST_NAME] + [row["file"] for row in rows])
+
+
+def test_export_refuses_unknown_format_and_existing_export(tmp_path, contacts):
+    # Arrange
+    _export(tmp_path, "eml", contacts)
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="уже есть выгрузка"):
+        _export(tmp_path, "eml", contacts)
+    with pytest.raises(ValueError, match="Неизвестный формат"):
+        _export(tmp_path / "other", "pst", contacts)
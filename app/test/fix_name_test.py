@@ -1,12 +1,8 @@
 import unittest
 
-def fix_mall(value: str, add_prefix: bool):
-                if not value:
-                    return ''
-                prefixes = ("ТЦ", "ТРЦ", "ТРК", "ТД", "ТК")
-                if any(value.startswith(prefix) for prefix in prefixes):
-                    return value
-                return f"ТЦ {value}" if add_prefix else value
+import pandas as pd
+
+from app.normalize import fix_mall_names
 
 class TestFixMall(unittest.TestCase):
     def test_fix_mall(self):
@@ -27,12 +23,25 @@ class TestFixMall(unittest.TestCase):
                     "name": "already_sorted",
                     "value": "ТРК \"Привет\"",
                     "add_prefix": True,
-                    "expected": "ТРК \"Привет\"",
+                    "expected": "ТРК Привет",
+                },
+                {
+                    "name": "no_prefix",
+                    "value": "Привет",
+                    "add_prefix": False,
+                    "expected": "Привет",
+                },
+                {
+                    "name": "empty",
+                    "value": "",
+                    "add_prefix": True,
+                    "expected": "",
                 },
             ]
 
             for case in testcases:
-                actual = fix_mall(case["value"], case["add_prefix"])
+                df = pd.DataFrame({"mall": [case["value"]]})
+                actual = fix_mall_names(df, {"add_prefix": case["add_prefix"]})["mall"][0]
                 self.assertEqual(
                     case["expected"],
                     actual,
@@ -0,0 +1,80 @@
+import threading
+
+from app.jobs import JobQueue
+
+
+def _wait(job):
+    version = None
+    while not job.finished:
+        version = job.wait_for_change(version, timeout=5)
+
+
+def test_job_reports_progress_and_result():
+    # Arrange
+    queue = JobQueue(workers=1)
+
+    def campaign(job):
+        job.update(total=3)
+        job.record({"status": "sent"})
+        job.record({"status": "sent"})
+        job.record({"status": "failed"})
+        return "✅ done"
+
+    # Act
+    job = queue.submit(campaign)
+    queue.shutdown()
+
+    # Assert
+    data = job.to_dict()
+    assert data["state"] == "done"
+    assert (data["sent"], data["failed"], data["remaining"]) == (2, 1, 0)
+    assert data["message"] == "✅ done"
+
+
+def test_job_failure_sets_error_message():
+    # Arrange
+    queue = JobQueue(workers=1)
+
+    def campaign(job):
+        raise ValueError("boom")
+
+    # Act
+    job = queue.submit(campaign)
+    queue.shutdown()
+
+    # Assert
+    assert job.state == "failed"
+    assert job.message == "❌ Ошибка: boom"
+
+
+def test_wait_for_change_wakes_on_update():
+    # Arrange
+    queue = JobQueue(workers=1)
+    gate = threading.Event()
+    job = queue.submit(lambda job: gate.wait(5))
+
+    # Act
+    gate.set()
+    _wait(job)
+    queue.shutdown()
+
+    # Assert
+    assert job.state == "done"
+
+
+def test_history_evicts_oldest_finished_jobs():
+    # Arrange
+    queue = JobQueue(workers=1, history=2)
+    first = queue.submit(lambda job: None)
+    _wait(first)
+    second = queue.submit(lambda job: None)
+    _wait(second)
+
+    # Act
+    third = queue.submit(lambda job: None)
+    queue.shutdown()
+
+    # Assert
+    assert queue.get(first.id) is None
+    assert queue.get(second.id) is second
+    assert queue.get(third.id) is third
@@ -0,0 +1,70 @@
+import smtplib
+
+import pytest
+
+from app.journal import DeliveryJournal, campaign_key, recipient_key
+from app.email_sender import send_emails
+from app.rate_limit import TokenBucket
+
+
+@pytest.fixture()
+def journal(tmp_path):
+    j = DeliveryJournal(str(tmp_path / "journal.sqlite3"))
+    yield j
+    j.close()
+
+
+def _send(contacts, journal, **kwargs):
+    return send_emails(
+        "me@example.com", "pwd", contacts, [], "B", "P", "", "Hi", "Me",
+        pool_size=1, limiter=TokenBucket(per_second=0, per_hour=0), journal=journal, **kwargs
+    )
+
+
+def test_journal_records_every_outcome(smtp, journal, make_contacts):
+    # Arrange
+    smtp.script["to2@example.com"] = [smtplib.SMTPDataError(554, b"Rejected")]
+    contacts = make_contacts(4)
+
+    # Act
+    _send(contacts, journal)
+
+    # Assert
+    campaign_id = campaign_key("me@example.com", contacts, [], "B", "P", "", "Hi")
+    outcomes = journal.outcomes(campaign_id)
+    assert outcomes[recipient_key(contacts[0])][0] == "sent"
+    assert outcomes[recipient_key(contacts[2])] == ("failed", "(554, b'Rejected')")
+    assert outcomes[recipient_key(contacts[3])][0] == "sent"
+
+
+def test_resume_skips_delivered_recipients(smtp, journal, make_contacts):
+    # Arrange
+    contacts = make_contacts(4)
+    smtp.script["to2@example.com"] = [smtplib.SMTPDataError(554, b"Rejected")]
+    _send(contacts, journal)
+    first = smtp.recipients()
+    smtp.sent.clear()
+
+    # Act
+    report = _send(contacts, journal, resume=True)
+    sent = smtp.recipients()
+
+    # Assert
+    assert sent == ["to2@example.com"]
+    assert not set(first) & set(sent)
+    assert set(first) | set(sent) == {c["email"] for c in contacts}
+    assert report.skipped == len(first) and report.sent == len(sent)
+
+
+def test_campaign_key_depends_on_content(make_contacts):
+    # Arrange
+    contacts = make_contacts(4)
+
+    # Act
+    first = campaign_key("me@example.com", contacts, [], "B", "P", "", "Hi")
+    reordered = campaign_key("me@example.com", list(reversed(contacts)), [], "B", "P", "", "Hi")
+    other = campaign_key("me@example.com", contacts, [], "B2", "P", "", "Hi")
+
+    # Assert
+    assert first == reordered
+    assert first != other
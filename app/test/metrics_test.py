@@ -0,0 +1,80 @@
+import pandas as pd
+
+from app.metrics import Counter, Histogram, stage_seconds, messages_total, smtp_replies_total, span
+from app.email_sender import send_emails, get_contacts_from_excel
+from app.rate_limit import TokenBucket
+from run import app as flask_app
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    # Arrange
+    counter = Counter("x_total", "Things")
+    histogram = Histogram("x_seconds", "Time", buckets=(0.1, 1.0))
+
+    # Act
+    counter.inc(code=250)
+    counter.inc(2, code=250)
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+
+    # Assert
+    text = "\n".join(counter.render() + histogram.render())
+    assert '# TYPE x_total counter' in text
+    assert 'x_total{code="250"} 3' in text
+    assert 'x_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'x_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'x_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'x_seconds_count{stage="a"} 2' in text
+
+
+def test_ingestion_stages_are_timed(tmp_path):
+    # Arrange
+    path = tmp_path / "contacts.xlsx"
+    pd.DataFrame([{"email": "a@b.com", "mall": "Мега", "city": "Москва"}]).to_excel(path, index=False)
+    before = stage_seconds.count(stage="read_excel")
+    grouped = stage_seconds.count(stage="normalize.group_contacts")
+
+    # Act
+    get_contacts_from_excel(path)
+
+    # Assert
+    assert stage_seconds.count(stage="read_excel") == before + 1
+    assert stage_seconds.count(stage="normalize.group_contacts") == grouped + 1
+
+
+def test_send_counts_outcomes_and_reply_codes(smtp):
+    # Arrange
+    smtp.reply = lambda to_addrs: {to_addrs[1]: (550, b"No such user")}
+    contacts = [{"email": "a@b.com", "name": "N", "mall": "M", "city": "C", "_cc_emails": ["gone@b.com"]}]
+    sent = messages_total.value(outcome="sent")
+    ok = smtp_replies_total.value(code=250)
+    refused = smtp_replies_total.value(code=550)
+    logins = stage_seconds.count(stage="smtp_login")
+
+    # Act
+    send_emails("me@b.com", "pwd", contacts, [], "B", "P", "", "Hi", "Me",
+                limiter=TokenBucket(per_second=0, per_hour=0))
+
+    # Assert
+    assert messages_total.value(outcome="sent") == sent + 1
+    assert smtp_replies_total.value(code=250) == ok + 1
+    assert smtp_replies_total.value(code=550) == refused + 1
+    assert stage_seconds.count(stage="smtp_login") == logins + 1
+    assert smtp.debuglevel is None
+
+
+def test_metrics_endpoint_exposes_registry():
+    # Arrange
+    flask_app.config["TESTING"] = True
+    with span("test_stage"):
+        pass
+
+    # Act
+    with flask_app.test_client() as client:
+        resp = client.get("/metrics")
+
+    # Assert
+    text = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    assert 'dooh_stage_duration_seconds_count{stage="test_stage"}' in text
@@ -0,0 +1,87 @@
+import email
+import email.policy
+import threading
+
+import pytest
+
+from app.mime_pipeline import StageTimings, iter_rendered, make_renderer, run_pipeline
+from app.templating import compile_template
+
+
+def _renderer():
+    template = compile_template("${NAME}, ${MALL}: ${RIM} // ${BRAND}").bind(BRAND="B", PERIOD="P", DOC="")
+    return make_renderer(template, ["boss@example.com"], "B", "P", "me@example.com", "Me")
+
+
+def test_rendered_bytes_parse_back_to_message(make_contacts):
+    # Arrange
+    render = _renderer()
+    contact = make_contacts(1, mall='"Мега"', _cc_emails=["cc@example.com"])[0]
+
+    # Act
+    contact, recipients, data = render(contact)
+
+    # Assert
+    msg = email.message_from_bytes(data, policy=email.policy.default)
+    assert set(recipients) == {"to0@example.com", "cc@example.com", "boss@example.com"}
+    assert msg["Subject"] == "Мега (г. Москва) // B // P"
+    assert "Коллеги, Мега: R0 // B" in msg.get_payload()[0].get_content()
+    assert data.count(b"\n") == data.count(b"\r\n")
+
+
+def test_process_pool_rendering_keeps_order(make_contacts):
+    # Arrange
+    contacts = make_contacts(20)
+    timings = StageTimings()
+
+    # Act
+    items = list(iter_rendered(contacts, _renderer(), processes=2, window=4, timings=timings))
+
+    # Assert
+    assert [c["email"] for c, _, _ in items] == [c["email"] for c in contacts]
+    assert "render" in timings.to_dict()
+
+
+def test_run_pipeline_delivers_every_item_across_workers():
+    # Arrange
+    seen = []
+    threads = set()
+    lock = threading.Lock()
+
+    def consume(item):
+        with lock:
+            seen.append(item)
+            threads.add(threading.current_thread().name)
+
+    # Act
+    run_pipeline(iter(range(100)), consume, workers=3, queue_size=5)
+
+    # Assert
+    assert sorted(seen) == list(range(100))
+    assert threads <= {"smtp-0", "smtp-1", "smtp-2"}
+
+
+def test_run_pipeline_stops_on_first_error():
+    # Arrange
+    consumed = []
+
+    def consume(item):
+        if item == 3:
+            raise RuntimeError("boom")
+        consumed.append(item)
+
+    # Act / Assert
+    with pytest.raises(RuntimeError):
+        run_pipeline(iter(range(10_000)), consume, workers=1, queue_size=2)
+    assert len(consumed) < 100
+
+
+def test_render_errors_surface_from_producer():
+    # Arrange
+    def items():
+        yield 1
+        raise ValueError("bad row")
+
+    # Act / Assert
+    with pytest.raises(ValueError):
+        run_pipeline(items(), lambda item: None, workers=2)
@@ -0,0 +1,144 @@
+import pandas as pd
+import pytest
+
+from app.normalize import normalize_contacts, check_template, fix_mall_names, NORMALIZE_STAGES
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows).fillna('')
+    df.index = range(2, len(df) + 2)
+    return df
+
+
+def test_normalize_groups_rim_cc_and_extra_columns():
+    # Arrange
+    frame = _frame([
+        {"email": "a@b.com, cc1@b.com", "mall": "Мега", "city": "Москва", "rim": "R1", "link": "http://x"},
+        {"email": "a@b.com; cc2@b.com", "mall": "Мега", "city": "Москва", "rim": "", "link": "http://x"},
+        {"email": "a@b.com", "mall": "Мега", "city": "Москва", "rim": "R2", "link": "http://y"},
+    ])
+
+    # Act
+    df = normalize_contacts(frame)
+
+    # Assert
+    assert len(df) == 1
+    row = df.iloc[0]
+    assert row["rim"] == "R1\nR2"
+    assert row["link"] == "http://x, http://y"
+    assert row["_cc_emails"] == ["cc1@b.com", "cc2@b.com"]
+    assert row["name"] == "Коллеги"
+
+
+def test_normalize_orders_groups_by_city_mall_email_name():
+    # Arrange
+    frame = _frame([
+        {"email": "z@b.com", "mall": "Б", "city": "Омск"},
+        {"email": "y@b.com", "mall": "А", "city": "Омск"},
+        {"email": "x@b.com", "mall": "В", "city": "Анапа"},
+    ])
+
+    # Act
+    df = normalize_contacts(frame)
+
+    # Assert
+    assert list(df["email"]) == ["x@b.com", "y@b.com", "z@b.com"]
+
+
+def test_sheet_without_rim_is_merged_and_sorted_too():
+    # Arrange: the sender always grouped; the preview now shows the same letters even without rim
+    frame = _frame([
+        {"email": "z@b.com", "mall": "Б", "city": "Омск"},
+        {"email": "x@b.com, cc@b.com", "mall": "В", "city": "Анапа"},
+        {"email": "z@b.com", "mall": "Б", "city": "Омск"},
+    ])
+
+    # Act
+    df = normalize_contacts(frame)
+
+    # Assert
+    assert "rim" not in frame.columns
+    assert list(df["email"]) == ["x@b.com", "z@b.com"]
+    assert list(df["rim"]) == ["", ""]
+    assert list(df["_cc_emails"]) == [["cc@b.com"], []]
+
+
+def test_grouping_keeps_file_order_within_each_letter():
+    # Arrange: groups interleaved in the file, a repeated rim, repeated link and CC values
+    frame = _frame([
+        {"email": "b@x.ru, cc2@x.ru", "mall": "Мега", "city": "Омск", "rim": "R3", "min": "10"},
+        {"email": "a@x.ru, cc9@x.ru", "mall": "Мега", "city": "Омск", "rim": "R1", "min": "15"},
+        {"email": "b@x.ru, cc1@x.ru, cc2@x.ru", "mall": "Мега", "city": "Омск", "rim": "R3", "min": "10"},
+        {"email": "a@x.ru", "mall": "Мега", "city": "Омск", "rim": "R0", "min": "5"},
+    ])
+
+    # Act
+    df = normalize_contacts(frame)
+
+    # Assert
+    assert df[["email", "rim", "min"]].values.tolist() == [["a@x.ru", "R1\nR0", "15, 5"], ["b@x.ru", "R3\nR3", "10"]]
+    assert df["_cc_emails"].tolist() == [["cc9@x.ru"], ["cc2@x.ru", "cc1@x.ru"]]
+    assert df.index.tolist() == [0, 1]
+
+
+def test_grouping_an_empty_list_gives_an_empty_frame():
+    # Arrange
+    frame = _frame([{"email": "a@x.ru", "mall": "Мега", "city": "Омск"}]).iloc[0:0]
+
+    # Act
+    df = normalize_contacts(frame)
+
+    # Assert
+    assert df.empty
+    assert {"city", "mall", "email", "name", "rim", "_cc_emails"} <= set(df.columns)
+    # No float columns: the preview joins CC lists and edits rim text on these
+    assert df["_cc_emails"].dtype == object and df["rim"].dtype == object
+    assert df["_cc_emails"].map(", ".join).tolist() == [] and df["rim"].str.replace("\n", "<br>").tolist() == []
+
+
+def test_normalize_requires_mall_and_city():
+    # Arrange
+    frame = _frame([{"email": "a@b.com"}])
+
+    # Act / Assert
+    with pytest.raises(ValueError) as ei:
+        normalize_contacts(frame)
+    assert "обязательные столбцы: mall, city" in str(ei.value)
+
+
+def test_fix_mall_names_strips_quotes_and_adds_prefix():
+    # Arrange
+    df = pd.DataFrame({"mall": ['"Мега"', "ТРК Вега", ""]})
+
+    # Act
+    out = fix_mall_names(df.copy(), {"add_prefix": True})
+
+    # Assert
+    assert list(out["mall"]) == ["ТЦ Мега", "ТРК Вега", ""]
+
+
+def test_normalize_stages_are_composable():
+    # Arrange
+    frame = _frame([{"email": "a@b.com", "mall": "Мега", "city": "Москва"}])
+    seen = []
+
+    def spy(df, ctx):
+        seen.append(ctx["add_prefix"])
+        return df
+
+    # Act
+    df = normalize_contacts(frame, add_prefix=True, stages=NORMALIZE_STAGES + (spy,))
+
+    # Assert
+    assert seen == [True]
+    assert df.iloc[0]["mall"] == "ТЦ Мега"
+
+
+def test_check_template_requires_filled_columns():
+    # Arrange
+    df = normalize_contacts(_frame([{"email": "a@b.com", "mall": "Мега", "city": "Москва", "sec": ""}]))
+
+    # Act / Assert
+    with pytest.raises(ValueError) as ei:
+        check_template(df, {"template_text": "${SEC} сек"})
+    assert "пустые значения: sec" in str(ei.value)
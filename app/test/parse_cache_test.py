@@ -0,0 +1,73 @@
+import pandas as pd
+
+from app.parse_cache import ParseCache, content_hash
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_or_load_parses_same_bytes_once():
+    # Arrange
+    cache = ParseCache(max_bytes=10_000, ttl=60)
+    token = content_hash(b"workbook")
+    calls = []
+
+    def load():
+        calls.append(token)
+        return pd.DataFrame({"email": ["a@b.com"]})
+
+    # Act
+    token1, first = cache.get_or_load(token, load)
+    token2, second = cache.get_or_load(token, load)
+
+    # Assert
+    assert token1 == token2 == token
+    assert first is second
+    assert len(calls) == 1
+
+
+def test_entries_expire_after_ttl():
+    # Arrange
+    clock = FakeClock()
+    cache = ParseCache(max_bytes=100, ttl=10, clock=clock)
+    cache.put("a", "value", size=1)
+
+    # Act
+    clock.now = 11
+
+    # Assert
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+
+def test_least_recently_used_evicted_when_over_size():
+    # Arrange
+    cache = ParseCache(max_bytes=10, ttl=60)
+    cache.put("a", "A", size=4)
+    cache.put("b", "B", size=4)
+    cache.get("a")
+
+    # Act
+    cache.put("c", "C", size=4)
+
+    # Assert
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.size == 8
+
+
+def test_oversized_value_not_cached():
+    # Arrange
+    cache = ParseCache(max_bytes=10, ttl=60)
+
+    # Act
+    value = cache.put("big", "X", size=11)
+
+    # Assert
+    assert value == "X"
+    assert len(cache) == 0
@@ -172,4 +172,92 @@ def test_preview_excel_groups_rim_with_br(client):
     assert resp.status_code == 200
     assert "123<br>456" in text  # newline converted to <br>
     # Existing prefixes should not be duplicated
-    assert "ТРЦ Мега" in text
\ No newline at end of file
+    assert "ТРЦ Мега" in text
+
+def test_preview_excel_json_returns_first_page_and_totals(client, monkeypatch):
+    # Arrange
+    monkeypatch.setattr("run.PREVIEW_PAGE_SIZE", 2)
+    rows = [{"email": f"to{i}@b.com", "mall": "Мега", "city": "Москва", "rim": f"R{i}"} for i in range(5)]
+
+    # Act
+    resp = client.post(
+        "/preview-excel",
+        data={"contacts_file": (_excel_file_from_rows(rows), "contacts.xlsx"), "format": "json"},
+        content_type="multipart/form-data",
+    )
+
+    # Assert
+    data = resp.get_json()
+    assert resp.status_code == 200
+    assert data["total"] == 5
+    assert data["columns"][:3] == ["city", "mall", "email"]
+    assert len(data["rows"]) == 2
+    assert data["first_row"] == {"mall": "ТЦ Мега", "city": "Москва"}
+    assert data["errors"] == []
+    assert data["token"]
+
+
+def test_preview_pages_are_served_from_the_cached_parse(client, monkeypatch):
+    # Arrange
+    rows = [{"email": f"to{i}@b.com", "mall": "Мега", "city": "Москва"} for i in range(5)]
+    first = client.post(
+        "/preview-excel",
+        data={"contacts_file": (_excel_file_from_rows(rows), "contacts.xlsx"), "format": "json"},
+        content_type="multipart/form-data",
+    ).get_json()
+    monkeypatch.setattr("run.parse_upload", lambda data: pytest.fail("file parsed twice"))
+
+    # Act
+    anonymous = client.get(f"/preview/{first['token']}")
+    with client.session_transaction() as sess:
+        sess["MY_ADDRESS"] = "user@example.com"
+    page = client.get(f"/preview/{first['token']}?offset=3&limit=10").get_json()
+    missing = client.get("/preview/unknown-token")
+
+    # Assert
+    email_col = page["columns"].index("email")
+    assert page["offset"] == 3
+    assert [row[email_col] for row in page["rows"]] == ["to3@b.com", "to4@b.com"]
+    assert missing.status_code == 404
+    assert anonymous.status_code == 401
+
+
+def test_preview_excel_json_reports_validation_errors(client):
+    # Arrange
+    bio = _excel_file_from_rows([{"email": "not-an-email", "mall": "Мега", "city": "Москва"}])
+
+    # Act
+    resp = client.post(
+        "/preview-excel",
+        data={"contacts_file": (bio, "contacts.xlsx"), "format": "json"},
+        content_type="multipart/form-data",
+    )
+
+    # Assert
+    assert resp.status_code == 400
+    assert "not-an-email" in resp.get_json()["errors"][0]
+
+
+@pytest.mark.parametrize("fmt", ["html", "json"])
+def test_preview_excel_header_only_sheet_gives_an_empty_table(client, fmt):
+    # Arrange: headers, no contacts
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        pd.DataFrame(columns=["email", "mall", "city", "rim"]).to_excel(writer, index=False)
+    bio.seek(0)
+
+    # Act
+    resp = client.post(
+        "/preview-excel",
+        data={"contacts_file": (bio, "contacts.xlsx"), "format": fmt},
+        content_type="multipart/form-data",
+    )
+
+    # Assert
+    assert resp.status_code == 200
+    if fmt == "json":
+        data = resp.get_json()
+        assert data["total"] == 0 and data["rows"] == [] and data["errors"] == []
+        assert data["first_row"] == {"mall": "", "city": ""}
+    else:
+        assert "preview-table" in resp.get_data(as_text=True)
@@ -0,0 +1,107 @@
+import smtplib
+
+import pytest
+
+from app.rate_limit import TokenBucket, is_temporary, reply_code, get_limiter
+from app.email_sender import send_emails
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_bucket_paces_to_per_second_rate():
+    # Arrange
+    clock = FakeClock()
+    bucket = TokenBucket(per_second=2, per_hour=0, clock=clock, sleep=clock.sleep)
+
+    # Act
+    for _ in range(6):
+        bucket.acquire()
+
+    # Assert: burst of 2, then one message every 0.5s
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_bucket_respects_hourly_quota():
+    # Arrange
+    clock = FakeClock()
+    bucket = TokenBucket(per_second=0, per_hour=2, clock=clock, sleep=clock.sleep)
+
+    # Act
+    for _ in range(3):
+        bucket.acquire()
+
+    # Assert
+    assert clock.now == pytest.approx(1800.0)
+
+
+def test_backoff_halves_rate_and_pauses():
+    # Arrange
+    clock = FakeClock()
+    bucket = TokenBucket(per_second=4, per_hour=0, clock=clock, sleep=clock.sleep)
+
+    # Act
+    bucket.backoff()
+    bucket.acquire()
+
+    # Assert
+    assert bucket.rate == 2
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_clean_replies_restore_rate_up_to_ceiling():
+    # Arrange
+    bucket = TokenBucket(per_second=4, per_hour=0, recover_after=2)
+    bucket.backoff()
+    bucket.backoff()
+
+    # Act
+    for _ in range(40):
+        bucket.success()
+
+    # Assert
+    assert bucket.rate == 4
+
+
+def test_reply_codes_classified():
+    # Arrange
+    busy = smtplib.SMTPSenderRefused(451, b"Try later", "me@example.com")
+    refused = smtplib.SMTPRecipientsRefused({"a@b.com": (550, b"No such user")})
+    throttled = smtplib.SMTPRecipientsRefused({"a@b.com": (454, b"Throttled")})
+
+    # Assert
+    assert is_temporary(busy)
+    assert not is_temporary(refused) and reply_code(refused) == 550
+    assert is_temporary(throttled)
+
+
+def test_send_emails_retries_after_temporary_reply(smtp):
+    # Arrange
+    smtp.script["to@example.com"] = [smtplib.SMTPDataError(451, b"Ratelimit exceeded")]
+    clock = FakeClock()
+    limiter = TokenBucket(per_second=10, per_hour=0, clock=clock, sleep=clock.sleep)
+    contacts = [{"email": "to@example.com", "name": "Коллеги", "mall": "ТЦ", "city": "Москва"}]
+
+    # Act
+    report = send_emails("me@example.com", "pwd", contacts, [], "B", "P", "", "Hi", "Me", limiter=limiter, retry_base=0)
+
+    # Assert
+    assert len(smtp.attempts) == 2
+    assert report.sent == 1
+    assert limiter.rate == 5
+
+
+def test_limiter_shared_per_account():
+    # Assert
+    assert get_limiter("a@example.com") is get_limiter("a@example.com")
+    assert get_limiter("a@example.com") is not get_limiter("b@example.com")
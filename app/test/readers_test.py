@@ -0,0 +1,173 @@
+import pandas as pd
+import pytest
+
+from app import readers
+from app.readers import split_emails, read_frame, pick_reader
+from app.normalize import normalize_contacts
+from app.validation import ContactValidationError
+
+
+def _write_xlsx(tmp_path, rows, name="contacts.xlsx"):
+    df = pd.DataFrame(rows)
+    path = tmp_path / name
+    with pd.ExcelWriter(path, engine="openpyxl") as w:
+        df.to_excel(w, index=False)
+    return path
+
+
+def _write_sheets(path, sheets):
+    with pd.ExcelWriter(path, engine="openpyxl") as w:
+        for name, rows in sheets.items():
+            pd.DataFrame(rows).to_excel(w, sheet_name=name, index=False)
+    return path
+
+
+def test_read_frame_skips_blank_rows_and_keeps_numbers_clean(tmp_path):
+    # Arrange
+    path = _write_xlsx(tmp_path, [
+        {"email": "a@b.com", "rim": 111},
+        {"email": None, "rim": None},
+        {"email": "c@d.com", "rim": 222.0},
+    ])
+
+    # Act
+    df = read_frame(path, ["email", "rim"], backend="openpyxl")
+
+    # Assert
+    assert list(df.columns) == ["email", "rim"]
+    assert list(df.index) == [2, 4]
+    assert df.to_dict("records") == [{"email": "a@b.com", "rim": "111"}, {"email": "c@d.com", "rim": "222"}]
+
+
+def test_split_emails_handles_all_separators():
+    # Assert
+    assert split_emails("a@b.com, c@d.com;e@f.com / g@h.com | i@j.com и k@l.com") == [
+        "a@b.com", "c@d.com", "e@f.com", "g@h.com", "i@j.com", "k@l.com"
+    ]
+
+
+def test_read_frame_reads_semicolon_csv_in_cp1251(tmp_path):
+    # Arrange: what Excel on a Russian Windows saves as "CSV"
+    path = tmp_path / "contacts.csv"
+    path.write_bytes("email;mall;city;min\na@b.com; Мега ;Москва;10\n;;;\nc@d.com;Вега;Казань;15\n".encode("cp1251"))
+
+    # Act
+    df = read_frame(path, ["email", "mall", "city", "min"], backend="csv")
+
+    # Assert
+    assert list(df.columns) == ["email", "mall", "city", "min"]
+    assert list(df.index) == [2, 4]
+    assert df.loc[2].to_dict() == {"email": "a@b.com", "mall": "Мега", "city": "Москва", "min": "10"}
+
+
+def test_read_frame_reads_tsv_with_bom(tmp_path):
+    # Arrange
+    path = tmp_path / "contacts.tsv"
+    path.write_text("\ufeffemail\tmall\tcity\na@b.com, c@d.com\tМега\tМосква\n", encoding="utf-8")
+
+    # Act
+    df = read_frame(path)
+
+    # Assert
+    assert df.to_dict("records") == [{"email": "a@b.com, c@d.com", "mall": "Мега", "city": "Москва"}]
+
+
+def test_read_frame_reads_every_sheet(tmp_path):
+    # Arrange: one sheet per city, plus a notes sheet without contact columns
+    path = _write_sheets(tmp_path / "cities.xlsx", {
+        "Москва": [{"email": "a@b.com", "mall": "Мега", "city": "Москва"}],
+        "Инфо": [{"Примечание": "не трогать"}],
+        "Казань": [{"email": "c@d.com", "mall": "Вега", "city": "Казань", "rim": "Экран"}],
+    })
+
+    # Act
+    df = read_frame(path, ["email", "mall", "city", "rim"])
+    contacts = normalize_contacts(df)
+
+    # Assert
+    assert list(df["_sheet"]) == ["Москва", "Казань"]
+    assert list(df.index) == [2, 2]
+    assert sorted(contacts["email"]) == ["a@b.com", "c@d.com"]
+
+
+def test_read_frame_skips_sheets_without_email(tmp_path):
+    # Arrange: a summary sheet shares the city column but lists no addresses
+    path = _write_sheets(tmp_path / "cities.xlsx", {
+        "Москва": [{"email": "a@b.com", "mall": "Мега", "city": "Москва"}],
+        "Итого": [{"city": "Москва", "mall": 1}, {"city": "Казань", "mall": 1}],
+        "Казань": [{"email": "c@d.com", "mall": "Вега", "city": "Казань"}],
+    })
+
+    # Act
+    df = read_frame(path, ["email", "mall", "city"])
+    contacts = normalize_contacts(df)
+
+    # Assert
+    assert list(df["_sheet"]) == ["Москва", "Казань"]
+    assert sorted(contacts["email"]) == ["a@b.com", "c@d.com"]
+
+
+def test_file_without_email_column_still_reports_it_missing(tmp_path):
+    # Arrange
+    path = _write_xlsx(tmp_path, [{"mall": "Мега", "city": "Москва"}])
+
+    # Act
+    df = read_frame(path, ["email", "mall", "city"])
+
+    # Assert
+    assert list(df.columns) == ["mall", "city"] and df.empty
+    with pytest.raises(ValueError, match="обязательные столбцы: email"):
+        normalize_contacts(df)
+
+
+def test_multi_sheet_errors_name_the_sheet(tmp_path):
+    # Arrange
+    path = _write_sheets(tmp_path / "cities.xlsx", {
+        "Москва": [{"email": "a@b.com", "mall": "Мега", "city": "Москва"}],
+        "Казань": [{"email": "bad", "mall": "Вега", "city": "Казань"}],
+    })
+
+    # Act
+    with pytest.raises(ContactValidationError) as ei:
+        normalize_contacts(read_frame(path))
+
+    # Assert
+    assert str(ei.value) == "❌ Неверный формат email: bad в строке 2 (лист «Казань»)"
+
+
+def test_pick_reader_falls_back_when_backend_is_missing(monkeypatch):
+    # Arrange
+    monkeypatch.setitem(readers.READER_AVAILABLE, "calamine", False)
+    monkeypatch.setitem(readers.READER_AVAILABLE, "pyarrow", False)
+
+    # Assert
+    assert pick_reader("list.xlsx", "calamine") is readers.openpyxl_sheets
+    assert pick_reader("list.CSV", "auto") is readers.csv_sheets
+    assert pick_reader("list.csv", "openpyxl") is readers.csv_sheets
+
+
+@pytest.mark.parametrize("backend, fallback, name", [
+    ("calamine", "openpyxl", "contacts.xlsx"),
+    ("pyarrow", "csv", "contacts.csv"),
+])
+def test_fast_backends_match_the_default_ones(tmp_path, backend, fallback, name):
+    # Arrange
+    if not readers.READER_AVAILABLE[backend]:
+        pytest.skip(f"{backend} is not installed")
+    rows = [
+        {"email": "a@b.com; c@d.com", "mall": "Мега", "city": "Москва", "min": 10},
+        {"email": "", "mall": "", "city": "", "min": None},
+        {"email": "e@f.com", "mall": "Вега", "city": "Казань", "min": 15},
+    ]
+    path = tmp_path / name
+    if name.endswith(".csv"):
+        pd.DataFrame(rows).to_csv(path, index=False)
+    else:
+        _write_xlsx(tmp_path, rows, name)
+
+    # Act
+    fast = read_frame(path, backend=backend)
+    default = read_frame(path, backend=fallback)
+
+    # Assert
+    pd.testing.assert_frame_equal(fast, default)
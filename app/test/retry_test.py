@@ -0,0 +1,223 @@
+import asyncio
+import smtplib
+import threading
+import time
+
+import pytest
+
+from app.dead_letters import DeadLetterFile, describe_error
+from app.email_sender import send_emails
+from app.rate_limit import TokenBucket, is_fatal, is_transient, reply_code
+from app.retry import RetryQueue
+import run
+from run import app as flask_app
+
+
+def _send(contacts, **kwargs):
+    return send_emails("me@example.com", "pwd", contacts, [], "B", "P", "", "Hi", "Me", pool_size=2,
+                       limiter=TokenBucket(per_second=0, per_hour=0, max_cooldown=0), retry_base=0, **kwargs)
+
+
+def test_retry_delay_grows_exponentially_with_full_jitter():
+    # Arrange
+    queue = RetryQueue(base=2, max_delay=30, rand=lambda: 1.0)
+    jittered = RetryQueue(base=2, max_delay=30, rand=lambda: 0.25)
+
+    # Assert
+    assert [queue.delay(attempt) for attempt in range(1, 6)] == [2, 4, 8, 16, 30]
+    assert jittered.delay(3) == 2
+
+
+def test_feed_interleaves_due_retries_and_waits_for_in_flight_items():
+    # Arrange
+    queue = RetryQueue(base=0)
+    seen = []
+
+    # Act: "b" fails once and comes back after the fresh items
+    for attempt, item in queue.feed(["a", "b", "c"]):
+        seen.append((attempt, item))
+        if (attempt, item) == (0, "b"):
+            queue.push(item, 1)
+        queue.done()
+
+    # Assert
+    assert seen == [(0, "a"), (0, "b"), (1, "b"), (0, "c")]
+
+
+def test_async_feed_waits_for_retries_pushed_late():
+    # Arrange
+    queue = RetryQueue(base=0.01)
+
+    async def run():
+        seen = []
+        async for attempt, item in queue.feed_async(["a"]):
+            seen.append((attempt, item))
+            if attempt < 2:
+                await asyncio.sleep(0.01)
+                queue.push(item, attempt + 1)
+            queue.done()
+        return seen
+
+    # Act
+    seen = asyncio.run(run())
+
+    # Assert
+    assert seen == [(0, "a"), (1, "a"), (2, "a")]
+
+
+def test_error_classification():
+    # Arrange
+    greylisted = smtplib.SMTPRecipientsRefused({"a@b.com": (450, b"Greylisted")})
+    unknown = smtplib.SMTPRecipientsRefused({"a@b.com": (550, b"No such user")})
+    login = smtplib.SMTPAuthenticationError(535, b"Bad credentials")
+    sender = smtplib.SMTPSenderRefused(553, b"Not owned by user", "me@example.com")
+
+    # Assert
+    assert is_transient(greylisted) and not is_fatal(greylisted)
+    assert not is_transient(unknown) and not is_fatal(unknown)
+    assert is_transient(smtplib.SMTPServerDisconnected("gone")) and is_transient(ConnectionResetError())
+    assert is_fatal(login) and is_fatal(sender)
+    assert describe_error(unknown) == "a@b.com: No such user"
+
+
+def test_bad_recipient_does_not_stop_the_campaign(smtp, tmp_path, make_contacts):
+    # Arrange
+    smtp.script["to1@example.com"] = [smtplib.SMTPRecipientsRefused({"to1@example.com": (550, b"No such user")})]
+    dead_letters = DeadLetterFile(str(tmp_path / "dead.csv"))
+
+    # Act
+    report = _send(make_contacts(5), dead_letters=dead_letters)
+
+    # Assert
+    assert report.sent == 4 and report.failed == 1
+    assert smtp.attempts.count("to1@example.com") == 1
+    rows = dead_letters.rows()
+    assert [(r["email"], r["code"], r["reason"], r["attempts"]) for r in rows] == [
+        ("to1@example.com", "550", "to1@example.com: No such user", "1")
+    ]
+
+
+def test_transient_failures_are_retried_until_they_succeed(smtp, tmp_path, make_contacts):
+    # Arrange
+    smtp.script["to0@example.com"] = [smtplib.SMTPServerDisconnected("gone"),
+                                         smtplib.SMTPDataError(451, b"Try again later")]
+    dead_letters = DeadLetterFile(str(tmp_path / "dead.csv"))
+
+    # Act
+    report = _send(make_contacts(3), dead_letters=dead_letters)
+
+    # Assert
+    assert report.sent == 3 and report.failed == 0
+    assert smtp.attempts.count("to0@example.com") == 3
+    assert dead_letters.rows() == []
+
+
+def test_retries_run_out_into_dead_letters(smtp, tmp_path, monkeypatch, make_contacts):
+    # Arrange
+    monkeypatch.setattr("app.email_sender.SMTP_TEMP_RETRIES", 2)
+    smtp.script["to0@example.com"] = [smtplib.SMTPDataError(421, b"Busy")] * 5
+    dead_letters = DeadLetterFile(str(tmp_path / "dead.csv"))
+
+    # Act
+    report = _send(make_contacts(2), dead_letters=dead_letters)
+
+    # Assert
+    assert report.sent == 1 and report.failed == 1
+    assert smtp.attempts.count("to0@example.com") == 3
+    assert [(r["code"], r["reason"], r["attempts"]) for r in dead_letters.rows()] == [("421", "Busy", "3")]
+
+
+def test_refused_sender_aborts_the_run(smtp, tmp_path, make_contacts):
+    # Arrange
+    smtp.script["to0@example.com"] = [smtplib.SMTPSenderRefused(553, b"Not owned by user", "me@example.com")]
+    dead_letters = DeadLetterFile(str(tmp_path / "dead.csv"))
+
+    # Act / Assert
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        send_emails("me@example.com", "pwd", make_contacts(3), [], "B", "P", "", "Hi", "Me", pool_size=1,
+                    limiter=TokenBucket(per_second=0, per_hour=0), dead_letters=dead_letters)
+    assert smtp.attempts == ["to0@example.com"]
+    assert dead_letters.rows() == []
+
+
+def test_mixed_refusal_retries_only_the_temporary_addresses(smtp, make_contacts):
+    # Arrange: each letter has one address greylisted and one that does not exist
+    contacts = make_contacts(2)
+    contacts[0]["_cc_emails"] = ["cc0@example.com"]
+    contacts[1]["_cc_emails"] = ["cc1@example.com"]
+    smtp.script = {
+        "to0@example.com": [smtplib.SMTPRecipientsRefused(
+            {"to0@example.com": (450, b"Greylisted"), "cc0@example.com": (550, b"No such user")})],
+        "to1@example.com": [smtplib.SMTPRecipientsRefused(
+            {"to1@example.com": (550, b"No such user"), "cc1@example.com": (450, b"Greylisted")})],
+    }
+
+    # Act
+    report = _send(contacts)
+
+    # Assert: to0 is sent again without its dead CC, to1 is refused for good and not retried
+    assert sorted(smtp.envelopes) == [["to0@example.com"], ["to0@example.com", "cc0@example.com"],
+                                         ["to1@example.com", "cc1@example.com"]]
+    assert report.sent == 1 and report.failed == 1
+
+
+def test_mixed_refusal_is_classified_by_its_most_severe_code():
+    # Arrange
+    refused = smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"Greylisted"), "b@example.com": (550, b"Gone")})
+
+    # Assert
+    assert reply_code(refused) == 550
+    assert not is_transient(refused)
+
+
+def test_failing_result_callback_ends_the_run_instead_of_hanging(smtp, make_contacts):
+    # Arrange
+    outcome = {}
+
+    def broken_callback(result):
+        # Late enough for every message to be queued and the feed to be waiting on them
+        time.sleep(0.2)
+        raise RuntimeError("journal is gone")
+
+    def campaign():
+        try:
+            _send(make_contacts(50), on_result=broken_callback)
+        except RuntimeError as e:
+            outcome["error"] = e
+
+    # Act
+    thread = threading.Thread(target=campaign, daemon=True)
+    thread.start()
+    thread.join(5)
+
+    # Assert
+    assert not thread.is_alive()
+    assert str(outcome["error"]) == "journal is gone"
+
+
+def test_dead_letters_route_serves_job_file(tmp_path, monkeypatch, make_contacts):
+    # Arrange
+    for_job = DeadLetterFile.for_job.__func__
+    monkeypatch.setattr(DeadLetterFile, "for_job", classmethod(lambda cls, job_id: for_job(cls, job_id, str(tmp_path))))
+    job_id = "0" * 32
+    contact = make_contacts(1)[0]
+    DeadLetterFile.for_job(job_id).add(contact, ["to0@example.com"], smtplib.SMTPDataError(554, b"Spam"), 1)
+    foreign = run.jobs.submit(lambda job: "", owner="other@example.com")
+    DeadLetterFile.for_job(foreign.id).add(contact, ["to0@example.com"], smtplib.SMTPDataError(554, b"Spam"), 1)
+    flask_app.config["TESTING"] = True
+
+    # Act
+    with flask_app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["MY_ADDRESS"] = "user@example.com"
+        found = client.get(f"/jobs/{job_id}/dead-letters")
+        missing = client.get(f"/jobs/{'1' * 32}/dead-letters")
+        invalid = client.get("/jobs/..%2Fjournal/dead-letters")
+        not_theirs = client.get(f"/jobs/{foreign.id}/dead-letters")
+
+    # Assert
+    assert found.status_code == 200
+    assert "to0@example.com" in found.get_data().decode("utf-8-sig")
+    assert missing.status_code == 404
+    assert invalid.status_code == 404
+    assert not_theirs.status_code == 404
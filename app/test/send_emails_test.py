@@ -2,9 +2,32 @@ import io
 import pytest
 import pandas as pd
 
+import run
 from run import app as flask_app
 
 
+def _excel_file_from_rows(rows):
+    df = pd.DataFrame(rows)
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False)
+    bio.seek(0)
+    return bio
+
+
+def _login(client):
+    with client.session_transaction() as sess:
+        sess["DISPLAY_NAME"] = "User"
+        sess["MY_ADDRESS"] = "user@example.com"
+        sess["PASSWORD"] = "secret"
+
+
+def _wait(job):
+    version = None
+    while not job.finished:
+        version = job.wait_for_change(version, timeout=5)
+
+
 @pytest.fixture()
 def client():
     # Arrange (shared): configure Flask test client
@@ -50,4 +73,91 @@ def test_send_emails_with_session_but_no_file_returns_error(client):
     # Assert
     text = resp.get_data(as_text=True)
     assert resp.status_code == 200
-    assert "Файл не загружен" in text
\ No newline at end of file
+    assert "Файл не загружен" in text
+
+def test_send_emails_queues_job_and_returns_id(client, monkeypatch):
+    # Arrange
+    _login(client)
+
+    started = []
+    monkeypatch.setattr("run.run_campaign", lambda job, **kwargs: started.append(kwargs) or "✅ ok")
+    bio = _excel_file_from_rows([{"email": "a@b.com", "mall": "Мега", "city": "Москва"}])
+    form = {
+        "brand": "X",
+        "period": "01.01.2025 - 31.01.2025",
+        "doc": "",
+        "message_template": "Hi",
+        "contacts_file": (bio, "contacts.xlsx"),
+    }
+
+    # Act
+    resp = client.post("/send-emails", data=form, content_type="multipart/form-data")
+
+    # Assert
+    text = resp.get_data(as_text=True)
+    assert resp.status_code == 202
+    assert 'data-job-id="' in text
+    job_id = text.split('data-job-id="')[1].split('"')[0]
+    _wait(run.jobs.get(job_id))
+    status = client.get(f"/jobs/{job_id}")
+    assert status.status_code == 200
+    assert status.get_json()["state"] == "done"
+    assert started[0]["my_address"] == "user@example.com"
+
+
+def test_unknown_job_returns_404(client):
+    # Arrange
+    _login(client)
+
+    # Act
+    resp = client.get("/jobs/does-not-exist")
+
+    # Assert
+    assert resp.status_code == 404
+
+
+def test_job_status_is_only_shown_to_its_owner(client):
+    # Arrange
+    job = run.jobs.submit(lambda job: "✅ ok", owner="user@example.com")
+    _wait(job)
+
+    # Act
+    anonymous = client.get(f"/jobs/{job.id}")
+    anonymous_stream = client.get(f"/jobs/{job.id}/stream")
+    with client.session_transaction() as sess:
+        sess["MY_ADDRESS"] = "other@example.com"
+    other = client.get(f"/jobs/{job.id}")
+    other_stream = client.get(f"/jobs/{job.id}/stream")
+    _login(client)
+    owner = client.get(f"/jobs/{job.id}")
+
+    # Assert
+    assert anonymous.status_code == anonymous_stream.status_code == 401
+    assert other.status_code == other_stream.status_code == 404
+    assert owner.status_code == 200 and owner.get_json()["message"] == "✅ ok"
+
+
+def test_send_emails_reuses_preview_parse_by_token(client, monkeypatch):
+    # Arrange
+    _login(client)
+    started = []
+    monkeypatch.setattr("run.run_campaign", lambda job, **kwargs: started.append(kwargs) or "✅ ok")
+    preview = client.post(
+        "/preview-excel",
+        data={"contacts_file": (_excel_file_from_rows([{"email": "a@b.com", "mall": "Мега", "city": "Москва"}]), "c.xlsx")},
+        content_type="multipart/form-data",
+    )
+    token = preview.get_data(as_text=True).split('data-token="')[1].split('"')[0]
+    monkeypatch.setattr("run.parse_upload", lambda data: pytest.fail("file parsed twice"))
+
+    # Act: no file attached, only the token from the preview step
+    resp = client.post(
+        "/send-emails",
+        data={"brand": "X", "period": "01", "message_template": "Hi", "contacts_token": token},
+        content_type="multipart/form-data",
+    )
+
+    # Assert
+    assert resp.status_code == 202
+    _wait(run.jobs.get(resp.get_data(as_text=True).split('data-job-id="')[1].split('"')[0]))
+    assert list(started[0]["frame"]["email"]) == ["a@b.com"]
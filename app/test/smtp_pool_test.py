@@ -0,0 +1,65 @@
+import smtplib
+
+import pytest
+
+from app.smtp_pool import SMTPConnectionPool
+from app.email_sender import send_emails
+from app.rate_limit import TokenBucket
+
+
+def test_pool_reuses_logged_in_connection(smtp):
+    # Arrange
+    pool = SMTPConnectionPool("me@example.com", "secret", "smtp.example.com", 465, size=2)
+
+    # Act
+    with pool:
+        for i in range(3):
+            pool.sendmail("me@example.com", [f"to{i}@example.com"], b"msg")
+
+    # Assert
+    assert len(smtp.connections) == 1
+    assert len(smtp.connections[0].sent) == 3
+    assert smtp.connections[0].closed
+
+
+def test_pool_reconnects_after_disconnect(smtp):
+    # Arrange
+    pool = SMTPConnectionPool("me@example.com", "secret", "smtp.example.com", 465, size=1)
+    smtp.disconnect_next = 1
+
+    # Act
+    with pool:
+        pool.sendmail("me@example.com", ["to@example.com"], b"msg")
+
+    # Assert
+    assert len(smtp.connections) == 2
+    assert smtp.connections[0].closed
+    assert smtp.connections[1].sent == [["to@example.com"]]
+
+
+def test_send_emails_spreads_contacts_across_pool(smtp, make_contacts):
+    # Arrange
+    smtp.delay = 0.01
+
+    # Act
+    report = send_emails(
+        "me@example.com", "secret", make_contacts(12), [], "Brand", "01", "", "Hi ${NAME}", "Me", pool_size=3,
+        limiter=TokenBucket(per_second=0, per_hour=0)
+    )
+
+    # Assert
+    assert report.sent == 12 and report.failed == 0
+    assert {r["email"] for r in report.results} == {f"to{i}@example.com" for i in range(12)}
+    assert 1 < smtp.max_active <= 3
+    assert len(smtp.connections) <= 3
+
+
+def test_pool_closes_a_connection_whose_login_fails(smtp):
+    # Arrange
+    smtp.refuse_logins.add("me@example.com")
+    pool = SMTPConnectionPool("me@example.com", "wrong", "smtp.example.com", 465, size=1)
+
+    # Act / Assert
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        pool.__enter__()
+    assert smtp.connections[0].closed
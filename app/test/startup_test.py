@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+from run import create_app, parse_cache, template_store
+
+
+def test_login_does_not_import_the_data_stack():
+    # Arrange: a fresh interpreter, as in a newly forked worker
+    code = (
+        "import sys, run\n"
+        "resp = run.app.test_client().get('/login')\n"
+        "print(resp.status_code, sorted(m for m in ('pandas', 'openpyxl') if m in sys.modules))\n"
+    )
+
+    # Act
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    # Assert
+    assert out.stdout.strip().splitlines()[-1] == "200 []"
+
+
+def test_create_app_preloads_templates():
+    # Act
+    app = create_app({"TESTING": True})
+
+    # Assert
+    assert set(template_store._cache) == set(template_store.names)
+    assert len(app.jinja_env.cache) == len(app.jinja_env.list_templates())
+    with app.test_client() as client:
+        assert client.get("/login").status_code == 200
+
+
+def test_create_app_keeps_parses_in_the_configured_directory(tmp_path):
+    # Act
+    create_app({"TESTING": True, "DISK_CACHE_DIR": str(tmp_path)})
+
+    # Assert
+    assert parse_cache.store.directory == str(tmp_path)
+
+
+def test_run_imports_from_any_directory_without_building_an_app(tmp_path):
+    # Arrange: what gunicorn does with "run:create_app()", started outside the repo
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = (
+        f"import sys; sys.path.insert(0, {root!r})\n"
+        "import run\n"
+        "built = run._app is not None\n"
+        "resp = run.create_app().test_client().get('/login')\n"
+        "print(built, resp.status_code, run.app is run.app)\n"
+    )
+
+    # Act
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=tmp_path)
+
+    # Assert
+    assert out.stdout.strip().splitlines()[-1] == "False 200 True"
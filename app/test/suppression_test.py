@@ -0,0 +1,146 @@
+import smtplib
+
+import pandas as pd
+import pytest
+
+import run
+from app.email_sender import send_emails
+from app.rate_limit import TokenBucket
+from app.suppression import SuppressionList, drop_suppressed, hard_bounces
+
+
+@pytest.fixture()
+def suppression(tmp_path):
+    store = SuppressionList(str(tmp_path / "suppression.sqlite3"))
+    yield store
+    store.close()
+
+
+def _frame(rows):
+    return pd.DataFrame([
+        {"city": "Москва", "mall": f"Мега {i}", "email": email, "name": "Коллеги", "rim": "", "_cc_emails": cc}
+        for i, (email, cc) in enumerate(rows)
+    ])
+
+
+def test_store_survives_reopening_and_ignores_case(tmp_path, suppression):
+    # Act
+    suppression.add(" Gone@Example.com ", code=550, reason="No such user", source="me@example.com")
+    reopened = SuppressionList(str(tmp_path / "suppression.sqlite3"))
+
+    # Assert
+    assert "gone@example.com" in reopened and "GONE@example.com" in suppression
+    assert "ok@example.com" not in reopened
+    assert reopened.entries()[0]["reason"] == "No such user"
+    reopened.close()
+
+
+def test_refresh_picks_up_bounces_recorded_by_another_process(tmp_path, suppression):
+    # Arrange
+    other = SuppressionList(str(tmp_path / "suppression.sqlite3"))
+
+    # Act
+    other.add("gone@example.com")
+    before = "gone@example.com" in suppression
+    suppression.refresh()
+
+    # Assert
+    assert not before
+    assert "gone@example.com" in suppression
+    other.close()
+
+
+def test_drop_suppressed_filters_primary_and_cc_addresses(suppression):
+    # Arrange
+    suppression.add_many([("a@x.ru", 550, ""), ("cc@x.ru", 550, ""), ("c@x.ru", 550, "")])
+    df = _frame([("a@x.ru", ["b@x.ru"]), ("d@x.ru", ["cc@x.ru", "e@x.ru"]), ("c@x.ru", []), ("f@x.ru", [])])
+
+    # Act
+    out, removed = drop_suppressed(df, suppression)
+
+    # Assert: the first remaining CC becomes the primary address, a letter with nobody left goes
+    assert removed == 3
+    assert out["email"].tolist() == ["b@x.ru", "d@x.ru", "f@x.ru"]
+    assert out["_cc_emails"].tolist() == [[], ["e@x.ru"], []]
+    assert df["email"].tolist()[0] == "a@x.ru"
+
+
+def test_drop_suppressed_without_hits_returns_the_same_frame(suppression):
+    # Arrange
+    df = _frame([("a@x.ru", [])])
+
+    # Act
+    out, removed = drop_suppressed(df, suppression)
+
+    # Assert
+    assert out is df and removed == 0
+
+
+def test_only_permanent_refusals_count_as_hard_bounces():
+    # Act
+    bounces = hard_bounces({"gone@x.ru": (550, b"No such user"), "busy@x.ru": (452, b"Mailbox full")})
+
+    # Assert
+    assert bounces == [("gone@x.ru", 550, "No such user")]
+
+
+def test_send_emails_records_refused_recipients(smtp, suppression):
+    # Arrange
+    def refuse(to_addrs):
+        if to_addrs[0] == "gone@example.com":
+            raise smtplib.SMTPRecipientsRefused({"gone@example.com": (550, b"No such user")})
+        if to_addrs[0] == "busy@example.com":
+            raise smtplib.SMTPRecipientsRefused({"busy@example.com": (450, b"Greylisted")})
+        return {"oldcc@example.com": (550, b"Unknown")}
+
+    smtp.reply = refuse
+    contacts = [
+        {"email": "ok@example.com", "name": "Коллеги", "mall": "Мега", "city": "Москва",
+         "_cc_emails": ["oldcc@example.com"]},
+        {"email": "gone@example.com", "name": "Коллеги", "mall": "Мега", "city": "Москва", "_cc_emails": []},
+        {"email": "busy@example.com", "name": "Коллеги", "mall": "Мега", "city": "Москва", "_cc_emails": []},
+    ]
+
+    # Act
+    send_emails("me@example.com", "pwd", contacts, [], "B", "P", "", "Hi", "Me", pool_size=1,
+                limiter=TokenBucket(per_second=0, per_hour=0, max_cooldown=0), retry_base=0, suppression=suppression)
+
+    # Assert
+    assert suppression.emails == {"gone@example.com", "oldcc@example.com"}
+
+
+def test_campaign_skips_suppressed_addresses_and_keeps_its_id(monkeypatch, suppression):
+    # Arrange
+    frame = pd.DataFrame([{"email": "a@x.ru, b@x.ru", "mall": "Мега", "city": "Москва"},
+                          {"email": "c@x.ru", "mall": "Вега", "city": "Тула"}]).astype(str)
+    calls = []
+    monkeypatch.setattr(run, "get_suppression_list", lambda: suppression)
+    monkeypatch.setattr(run, "get_journal", lambda: None)
+    monkeypatch.setattr(run, "normalized_contacts", lambda token, frame, add_prefix: run.normalize_contacts(frame))
+    monkeypatch.setattr(run, "send_sharded", lambda accounts, contacts, **kwargs: calls.append((contacts, kwargs))
+                        or type("Report", (), {"sent": len(contacts), "skipped": 0, "failed": 0})())
+
+    class Job:
+        id = "0" * 32
+        def update(self, **fields): pass
+        def record(self, result): pass
+
+    def campaign():
+        return run.run_campaign(Job(), token="t", frame=frame, add_prefix=False, my_address="me@example.com",
+                                password="pwd", cc_addresses=["boss@x.ru", "Left@X.ru"], brand="B", period="P",
+                                doc="", template_text="Hi", display_name="Me")
+
+    first = campaign()
+
+    # Act
+    suppression.add("a@x.ru")
+    suppression.add("left@x.ru")
+    status = campaign()
+
+    # Assert
+    contacts, kwargs = calls[1]
+    assert [(c["email"], list(c["_cc_emails"])) for c in contacts] == [("b@x.ru", []), ("c@x.ru", [])]
+    assert kwargs["cc_addresses"] == ["boss@x.ru"] and calls[0][1]["cc_addresses"] == ["boss@x.ru", "Left@X.ru"]
+    assert kwargs["suppression"] is suppression
+    assert kwargs["campaign_id"] == calls[0][1]["campaign_id"]
+    assert "Исключено адресов из стоп-листа: 2." in status and "стоп-листа" not in first
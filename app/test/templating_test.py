@@ -0,0 +1,56 @@
+import os
+from string import Template
+
+import pytest
+
+from app.templating import CompiledTemplate, TemplateStore, TEMPLATE_NAMES, compile_template
+
+
+FIELDS = dict(NAME="Иван", BRAND="Бренд ${NAME}", PERIOD="01-02", MALL="ТЦ Мега", RIM="R1\nR2",
+              LINK="http://x", MIN="15", SEC="10", DOC="http://doc")
+
+
+@pytest.mark.parametrize("name", TEMPLATE_NAMES)
+def test_render_matches_safe_substitute_for_shipped_templates(name):
+    # Arrange
+    text = TemplateStore().get(name)
+
+    # Act
+    rendered = compile_template(text).render(**FIELDS)
+
+    # Assert
+    assert rendered == Template(text).safe_substitute(**FIELDS)
+
+
+def test_bind_prefills_campaign_fields_once():
+    # Arrange
+    text = "$$5 ${NAME}: ${BRAND} / $PERIOD ${UNKNOWN} $"
+    bound = CompiledTemplate(text).bind(BRAND="B ${NAME}", PERIOD="P")
+
+    # Act
+    rendered = bound.render(NAME="N")
+
+    # Assert
+    assert rendered == Template(text).safe_substitute(NAME="N", BRAND="B ${NAME}", PERIOD="P")
+    assert bound.placeholders == {"NAME", "UNKNOWN"}
+
+
+def test_placeholders_exposed():
+    # Assert
+    assert compile_template("${RIM} $LINK $$MIN").placeholders == {"RIM", "LINK"}
+
+
+def test_store_reloads_only_when_file_changes(tmp_path):
+    # Arrange
+    path = tmp_path / "check.txt"
+    path.write_text("first", encoding="utf-8")
+    store = TemplateStore(directory=str(tmp_path), names=["check"])
+    assert store.get("check") == "first"
+
+    # Act
+    path.write_text("second", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    # Assert
+    assert store.all() == {"check": "second"}
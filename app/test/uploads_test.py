@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from app.readers import read_frame
+from app.uploads import save_upload, reap_uploads
+from run import app as flask_app
+
+
+def _excel_bytes(n):
+    df = pd.DataFrame([{"email": f"to{i}@b.com", "mall": "Мега", "city": "Москва"} for i in range(n)])
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False)
+    return bio.getvalue()
+
+
+def test_save_upload_streams_to_file_and_hashes(tmp_path):
+    # Arrange
+    data = os.urandom(200_000)
+
+    # Act
+    token, path = save_upload(io.BytesIO(data), "Contacts.XLSX", directory=str(tmp_path), chunk_size=4096)
+
+    # Assert
+    assert path.endswith(".xlsx")
+    assert token == hashlib.sha256(data).hexdigest()
+    with open(path, "rb") as file:
+        assert file.read() == data
+
+
+def test_save_upload_rejects_oversized_stream_and_removes_file(tmp_path):
+    # Act / Assert
+    with pytest.raises(ValueError, match="слишком большой"):
+        save_upload(io.BytesIO(b"x" * 5000), directory=str(tmp_path), max_bytes=4096, chunk_size=1024)
+    assert os.listdir(tmp_path) == []
+
+
+def test_reaper_removes_only_stale_uploads(tmp_path):
+    # Arrange
+    _, old = save_upload(io.BytesIO(b"old"), "old.xlsx", directory=str(tmp_path))
+    _, fresh = save_upload(io.BytesIO(b"fresh"), "fresh.xlsx", directory=str(tmp_path))
+    os.utime(old, (1000, 1000))
+    (tmp_path / "other.txt").write_text("keep")
+
+    # Act
+    removed = reap_uploads(str(tmp_path), ttl=60, now=os.stat(fresh).st_mtime + 1)
+
+    # Assert
+    assert removed == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(fresh), "other.txt"])
+
+
+def test_read_frame_stops_past_row_limit():
+    # Act / Assert
+    with pytest.raises(ValueError, match="больше 3 строк"):
+        read_frame(io.BytesIO(_excel_bytes(4)), max_rows=3)
+    assert len(read_frame(io.BytesIO(_excel_bytes(3)), max_rows=3)) == 3
+
+
+def test_preview_rejects_upload_over_request_limit(monkeypatch):
+    # Arrange
+    flask_app.config["TESTING"] = True
+    monkeypatch.setitem(flask_app.config, "MAX_CONTENT_LENGTH", 1024)
+
+    # Act
+    with flask_app.test_client() as client:
+        resp = client.post(
+            "/preview-excel?format=json",
+            data={"contacts_file": (io.BytesIO(b"x" * 4096), "contacts.xlsx")},
+            content_type="multipart/form-data",
+        )
+
+    # Assert
+    assert resp.status_code == 413
+    assert "слишком большой" in resp.get_json()["errors"][0]
+
+
+def test_preview_leaves_no_temp_files(tmp_path, monkeypatch):
+    # Arrange
+    flask_app.config["TESTING"] = True
+    monkeypatch.setattr("run.save_upload", lambda stream, filename: save_upload(stream, filename, directory=str(tmp_path)))
+
+    # Act
+    with flask_app.test_client() as client:
+        resp = client.post(
+            "/preview-excel",
+            data={"contacts_file": (io.BytesIO(_excel_bytes(2)), "contacts.xlsx"), "format": "json"},
+            content_type="multipart/form-data",
+        )
+
+    # Assert
+    assert resp.status_code == 200
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from app.validation import ContactValidationError, validate_contacts, MAX_REPORTED_ERRORS
+from app.email_sender import get_contacts_from_excel
+
+
+def _frame(emails):
+    return pd.DataFrame({"email": emails, "mall": "Мега", "city": "Москва"}, index=range(2, len(emails) + 2))
+
+
+def test_validate_contacts_splits_primary_and_cc():
+    # Arrange
+    df = _frame(["a@b.com, c@d.com и e@f.com", "x@y.ru"])
+
+    # Act
+    out = validate_contacts(df)
+
+    # Assert
+    assert list(out["email"]) == ["a@b.com", "x@y.ru"]
+    assert list(out["_cc_emails"]) == [["c@d.com", "e@f.com"], []]
+
+
+def test_validate_contacts_collects_every_bad_row():
+    # Arrange
+    df = _frame(["a@b.com", "", "bad; worse@", "ok@ok.com"])
+
+    # Act
+    with pytest.raises(ContactValidationError) as ei:
+        validate_contacts(df)
+
+    # Assert
+    assert [(e["row"], e["error"], e["email"]) for e in ei.value.errors] == [
+        (3, "missing", ""),
+        (4, "invalid", "bad"),
+        (4, "invalid", "worse@"),
+    ]
+    assert "Строка 3 не содержит email" in str(ei.value)
+
+
+def test_validation_message_is_capped():
+    # Arrange
+    df = _frame(["bad"] * (MAX_REPORTED_ERRORS + 5))
+
+    # Act
+    with pytest.raises(ContactValidationError) as ei:
+        validate_contacts(df)
+
+    # Assert
+    assert len(ei.value.errors) == MAX_REPORTED_ERRORS + 5
+    assert "и ещё ошибок: 5" in str(ei.value)
+
+
+def test_get_contacts_from_excel_reports_all_errors(tmp_path):
+    # Arrange
+    path = tmp_path / "contacts.xlsx"
+    pd.DataFrame([
+        {"email": "wrong", "mall": "Мега", "city": "Москва"},
+        {"email": "a@b.com", "mall": "Мега", "city": "Москва"},
+        {"email": "also wrong@", "mall": "Мега", "city": "Москва"},
+    ]).to_excel(path, index=False)
+
+    # Act
+    with pytest.raises(ValueError) as ei:
+        get_contacts_from_excel(path)
+
+    # Assert
+    assert "Неверный формат email: wrong в строке 2" in str(ei.value)
+    assert "Неверный формат email: wrong@ в строке 4" in str(ei.value)
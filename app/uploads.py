@@ -0,0 +1,96 @@
+# app/uploads.py
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+# Upload settings
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "dooh_uploads"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_MAX_ROWS = int(os.getenv("UPLOAD_MAX_ROWS", "100000"))  # 0 = unlimited
+UPLOAD_TTL = int(os.getenv("UPLOAD_TTL", "3600"))
+UPLOAD_REAP_INTERVAL = int(os.getenv("UPLOAD_REAP_INTERVAL", "300"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+UPLOAD_PREFIX = "upload-"
+
+
+def upload_suffix(filename):
+    # The temp file keeps the upload's extension: readers pick the format by it
+    return os.path.splitext(filename or '')[1].lower()
+
+
+def save_upload(stream, filename=None, directory=UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES,
+                chunk_size=UPLOAD_CHUNK_SIZE):
+    # Copies the stream to a fresh temp file chunk by chunk, hashing on the way.
+    # Returns (sha256 token, path); the caller removes the file once it is parsed
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix=UPLOAD_PREFIX, suffix=upload_suffix(filename))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ValueError(f"❌ Файл слишком большой: больше {max_bytes // (1024 * 1024)} МБ")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        discard_upload(path)
+        raise
+    return digest.hexdigest(), path
+
+
+def discard_upload(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def reap_uploads(directory=UPLOAD_DIR, ttl=UPLOAD_TTL, now=None):
+    # Removes uploads left behind by requests that died before cleaning up
+    now = time.time() if now is None else now
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if not name.startswith(UPLOAD_PREFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.stat(path).st_mtime + ttl <= now:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def start_reaper(directory=UPLOAD_DIR, ttl=UPLOAD_TTL, interval=UPLOAD_REAP_INTERVAL):
+    global _reaper
+
+    def run():
+        while True:
+            reap_uploads(directory, ttl)
+            time.sleep(interval)
+
+    with _reaper_lock:
+        # is_alive() is False in a forked child, which gets its own reaper
+        if _reaper is None or not _reaper.is_alive():
+            _reaper = threading.Thread(target=run, name="upload-reaper", daemon=True)
+            _reaper.start()
+        return _reaper
@@ -0,0 +1,70 @@
+# app/validation.py
+
+from app.readers import EMAIL_RE
+
+
+# How many individual problems are spelled out in the exception message
+MAX_REPORTED_ERRORS = 10
+
+
+class ContactValidationError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        messages = [e['message'] for e in errors[:MAX_REPORTED_ERRORS]]
+        if len(errors) > MAX_REPORTED_ERRORS:
+            messages.append(f"… и ещё ошибок: {len(errors) - MAX_REPORTED_ERRORS}")
+        super().__init__("\n".join(messages))
+
+
+def split_email_column(emails):
+    # Same separators as readers.split_emails, applied to the whole column at once
+    normalized = (emails.astype(str)
+                  .str.replace(r'[,;/|]', ' ', regex=True)
+                  .str.replace(' и ', ' ', regex=False))
+    return normalized.str.split()
+
+
+def find_email_errors(parts, sheets=None):
+    # parts: Series of address lists indexed by row number. sheets: the _sheet column of a
+    # multi-sheet upload, where row numbers repeat and each message names the sheet
+    rows = parts.index
+    parts = parts.reset_index(drop=True)
+    order = {}
+
+    def error(pos, email, kind):
+        row = int(rows[pos])
+        where = f"{row}"
+        found = {'row': row, 'email': email, 'error': kind}
+        if sheets is not None:
+            found['sheet'] = sheets.iloc[pos]
+            order.setdefault(found['sheet'], len(order))
+            where += f" (лист «{found['sheet']}»)"
+        if kind == 'missing':
+            found['message'] = f"❌ Строка {where} не содержит email. Удалите её или заполните."
+        else:
+            found['message'] = f"❌ Неверный формат email: {email} в строке {where}"
+        return found
+
+    empty = parts.str.len().eq(0)
+    errors = [error(pos, '', 'missing') for pos in parts.index[empty]]
+
+    exploded = parts[~empty].explode()
+    bad = exploded[~exploded.str.match(EMAIL_RE).astype(bool)]
+    errors += [error(pos, email, 'invalid') for pos, email in bad.items()]
+
+    errors.sort(key=lambda e: (order.get(e.get('sheet'), 0), e['row']))
+    return errors
+
+
+def validate_contacts(df):
+    # Replaces the raw email cell with the primary address and moves the rest to _cc_emails;
+    # raises ContactValidationError listing every bad row at once
+    parts = split_email_column(df['email'])
+    errors = find_email_errors(parts, df['_sheet'] if '_sheet' in df.columns else None)
+    if errors:
+        raise ContactValidationError(errors)
+
+    df = df.copy()
+    df['email'] = parts.str[0]
+    df['_cc_emails'] = parts.str[1:]
+    return df
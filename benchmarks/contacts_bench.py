@@ -0,0 +1,64 @@
+# benchmarks/contacts_bench.py
+#
+# Contact records: to_dict(orient='records') against app.contacts, on a normalized synthetic list.
+# Build time, memory held by the records, a sender-style read loop and pickled size.
+# python -m benchmarks.contacts_bench [rows]
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.contacts import contacts_from_frame
+from app.normalize import normalize_contacts
+from app.readers import UPLOAD_COLUMNS, read_frame
+from benchmarks.workbooks import write_csv
+
+
+def to_records(df):
+    # The format prepare_contacts returned before
+    return df.to_dict(orient='records')
+
+
+def build(convert, df):
+    start = time.perf_counter()
+    contacts = convert(df)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    held = convert(df)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return contacts, seconds, current
+
+
+def read_loop(contacts, repeat=5):
+    # The fields build_message, batching and the journal read per letter
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for contact in contacts:
+            contact['mall'], contact['city'], contact['name'], contact['email']
+            contact.get('rim', ''), contact.get('link', ''), contact.get('min', ''), contact.get('sec', '')
+            contact.get('_cc_emails', []), contact.get('_to_emails')
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        frame = read_frame(write_csv(os.path.join(tmp, 'contacts.csv'), rows), UPLOAD_COLUMNS)
+    df = normalize_contacts(frame)
+    print(f"rows: {rows}, contacts: {len(df)}")
+    for label, convert in (('dicts', to_records), ('records', contacts_from_frame)):
+        contacts, seconds, memory = build(convert, df)
+        loop = read_loop(contacts)
+        size = len(pickle.dumps(contacts, protocol=pickle.HIGHEST_PROTOCOL))
+        print(f"{label:<8} build {seconds:.3f}s  memory {memory / 2 ** 20:6.1f} MB  "
+              f"read loop {loop:.3f}s  pickled {size / 2 ** 20:5.1f} MB")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
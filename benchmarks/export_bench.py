@@ -0,0 +1,36 @@
+# benchmarks/export_bench.py
+#
+# Offline export per format and process count, on a synthetic list.
+# python -m benchmarks.export_bench [messages] [--processes 0 4]
+
+import argparse
+import os
+import tempfile
+
+from app.email_sender import get_contacts_from_excel
+from app.export import EXPORT_FORMATS, export_emails
+from benchmarks.pipeline_bench import TEMPLATE
+from benchmarks.workbooks import write_csv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('messages', nargs='?', type=int, default=50_000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, os.cpu_count() or 1])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        contacts = get_contacts_from_excel(write_csv(os.path.join(tmp, 'contacts.csv'), args.messages),
+                                           template_text=TEMPLATE)
+        print(f"messages: {len(contacts)}")
+        for fmt in EXPORT_FORMATS:
+            for processes in args.processes:
+                report = export_emails("bench@example.com", contacts, ["boss@example.com"], "Бренд", "01.01-31.01",
+                                       "", TEMPLATE, "Bench", os.path.join(tmp, f"{fmt}-{processes}"), fmt=fmt,
+                                       processes=processes)
+                print(f"{fmt:<8} processes={processes:<3} {report['seconds']:.2f}s "
+                      f"({report['messages'] / report['seconds']:,.0f} msg/s, {report['bytes'] / 2 ** 20:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
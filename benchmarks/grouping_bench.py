@@ -0,0 +1,69 @@
+# benchmarks/grouping_bench.py
+#
+# The group_contacts stage on a list with many rim rows per mall, against the groupby/agg
+# version it replaced. Both must produce the same frame.
+# python -m benchmarks.grouping_bench [rows] [--rims-per-mall 20]
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.normalize import EXTRA_COLUMNS, GROUP_KEYS, group_contacts, normalize_contacts, NORMALIZE_STAGES
+from app.readers import UPLOAD_COLUMNS, read_frame
+from benchmarks.workbooks import write_csv
+
+
+def group_with_agg(df, ctx):
+    # The groupby/agg stage used before the group-code engine
+    groups = df.groupby(GROUP_KEYS, sort=True)
+    out = groups.size().to_frame('_rows').reset_index()[GROUP_KEYS]
+    index = out.set_index(GROUP_KEYS).index
+
+    rim = df[df['rim'] != ''].groupby(GROUP_KEYS, sort=False)['rim'].agg('\n'.join)
+    out['rim'] = rim.reindex(index, fill_value='').to_numpy()
+
+    for col in [c for c in EXTRA_COLUMNS if c in df.columns]:
+        values = df.loc[df[col] != '', GROUP_KEYS + [col]].drop_duplicates()
+        joined = values.groupby(GROUP_KEYS, sort=False)[col].agg(', '.join)
+        out[col] = joined.reindex(index, fill_value='').to_numpy()
+
+    cc = df[GROUP_KEYS + ['_cc_emails']].explode('_cc_emails').dropna(subset=['_cc_emails']).drop_duplicates()
+    merged = cc.groupby(GROUP_KEYS, sort=False)['_cc_emails'].agg(list)
+    out['_cc_emails'] = [v if isinstance(v, list) else [] for v in merged.reindex(index)]
+    return out
+
+
+def measure(fn, df, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(df, {})
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('rows', nargs='?', type=int, default=100_000)
+    parser.add_argument('--rims-per-mall', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_csv(os.path.join(tmp, 'contacts.csv'), args.rows, malls=max(1, args.rows // args.rims_per_mall))
+        frame = read_frame(path, UPLOAD_COLUMNS)
+    # Everything up to the grouping stage
+    df = normalize_contacts(frame, stages=NORMALIZE_STAGES[:-1])
+
+    agg_seconds, expected = measure(group_with_agg, df)
+    codes_seconds, out = measure(group_contacts, df)
+    print(f"rows: {args.rows}, letters: {len(out)}")
+    print(f"groupby/agg:  {agg_seconds:.3f}s")
+    print(f"group codes:  {codes_seconds:.3f}s")
+    print(f"speedup:      x{agg_seconds / codes_seconds:.1f}")
+    if not out.equals(expected):
+        print("! outputs differ")
+
+
+if __name__ == '__main__':
+    main()
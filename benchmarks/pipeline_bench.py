@@ -0,0 +1,144 @@
+# benchmarks/pipeline_bench.py
+#
+# Ingest -> render -> send against a local SMTP sink.
+# python -m benchmarks.pipeline_bench [--sizes 1000 10000 100000] [--pool 4] [--latency-ms 0] [--transport threads]
+#                                     [--merge]
+#                                     [--out benchmarks/results] [--compare previous.json]
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app import email_sender
+from app.email_sender import get_contacts_from_excel, send_emails
+from app.rate_limit import TokenBucket
+from benchmarks.smtp_sink import SMTPSink
+from benchmarks.workbooks import write_workbook
+
+
+TEMPLATE = "${NAME}, доброго дня.\nТЦ ${MALL}, носитель ${RIM} (${LINK}), ${SEC} сек / ${MIN} мин.\n${BRAND} ${PERIOD}"
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def bench_parse(path, rows):
+    start = time.perf_counter()
+    contacts = get_contacts_from_excel(path, template_text=TEMPLATE)
+    seconds = time.perf_counter() - start
+
+    # Memory is measured on a second pass so tracing does not skew the timing
+    tracemalloc.start()
+    get_contacts_from_excel(path, template_text=TEMPLATE)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return contacts, {
+        'rows': rows,
+        'contacts': len(contacts),
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds,
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def bench_send(contacts, pool_size, latency, transport, merge=False):
+    with SMTPSink(latency=latency) as sink:
+        email_sender.SMTP_HOST = "127.0.0.1"
+        email_sender.SMTP_PORT = sink.port
+        email_sender.SMTP_PROTOCOL = "PLAIN"
+
+        start = time.perf_counter()
+        report = send_emails(
+            "bench@example.com", "secret", contacts, ["boss@example.com"], "Бренд", "01.01-31.01", "",
+            TEMPLATE, "Bench", pool_size=pool_size, transport=transport, merge_envelopes=merge,
+            limiter=TokenBucket(per_second=0, per_hour=0)
+        )
+        seconds = time.perf_counter() - start
+
+    latencies = [r['seconds'] for r in report.results if r['seconds'] is not None]
+    timings = report.timings.to_dict()
+    return {
+        'messages': report.sent,
+        'delivered_to_sink': sink.messages,  # SMTP transactions
+        'recipients': sink.recipients,
+        'seconds': seconds,
+        'messages_per_sec': report.sent / seconds,
+        'render_seconds': timings.get('render', {}).get('seconds', 0.0),
+        'send_seconds': timings.get('send', {}).get('seconds', 0.0),
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'latency_mean_ms': statistics.fmean(latencies) * 1000,
+    }
+
+
+def compare(current, previous):
+    before = {run['rows']: run for run in previous['runs']}
+    for run in current['runs']:
+        old = before.get(run['rows'])
+        if not old:
+            continue
+        for label, stage, key in (('parse rows/s', 'parse', 'rows_per_sec'), ('send msg/s', 'send', 'messages_per_sec')):
+            new_value, old_value = run[stage][key], old[stage][key]
+            print(f"{run['rows']:>7} rows  {label:<13} {old_value:>10.0f} -> {new_value:>10.0f}  "
+                  f"({new_value / old_value - 1:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest -> render -> send benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--pool', type=int, default=4)
+    parser.add_argument('--transport', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--merge', action='store_true', help="merge identical letters into multi-RCPT envelopes")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="delay the sink adds before every reply")
+    parser.add_argument('--out', default='benchmarks/results')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    result = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'pool_size': args.pool,
+        'transport': args.transport,
+        'merge_envelopes': args.merge,
+        'sink_latency_ms': args.latency_ms,
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            path = write_workbook(os.path.join(tmp, f"contacts_{rows}.xlsx"), rows)
+            contacts, parse = bench_parse(path, rows)
+            send = bench_send(contacts, args.pool, args.latency_ms / 1000, args.transport, args.merge)
+            result['runs'].append({'rows': rows, 'parse': parse, 'send': send})
+            print(
+                f"{rows:>7} rows  parse {parse['rows_per_sec']:>9.0f} rows/s  peak {parse['peak_memory_mb']:>7.1f} MB  "
+                f"send {send['messages_per_sec']:>7.0f} msg/s  "
+                f"p50 {send['latency_p50_ms']:.2f} ms  p99 {send['latency_p99_ms']:.2f} ms"
+            )
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"saved {out_path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/reader_bench.py
+#
+# Upload parsing per reader backend, on the same synthetic list saved as .xlsx and .csv, and the
+# peak memory of reading the workbook against a plain pandas.read_excel of it.
+# python -m benchmarks.reader_bench [rows]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app import readers
+from app.readers import UPLOAD_COLUMNS, read_frame
+from benchmarks.workbooks import write_csv, write_workbook
+
+
+BACKENDS = (('.xlsx', 'openpyxl'), ('.xlsx', 'calamine'), ('.csv', 'csv'), ('.csv', 'pyarrow'))
+
+
+def measure(path, backend, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read_frame(path, UPLOAD_COLUMNS, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return best, df
+
+
+def peak_memory(read):
+    # Peak MB traced while reading
+    tracemalloc.start()
+    try:
+        read()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def main(rows=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            '.xlsx': write_workbook(os.path.join(tmp, 'contacts.xlsx'), rows),
+            '.csv': write_csv(os.path.join(tmp, 'contacts.csv'), rows),
+        }
+        print(f"rows: {rows}")
+        reference = None
+        for suffix, backend in BACKENDS:
+            if not readers.READER_AVAILABLE[backend]:
+                print(f"{backend:<9} {suffix:<5} not installed")
+                continue
+            seconds, df = measure(paths[suffix], backend)
+            if len(df) != rows:
+                raise SystemExit(f"{backend}: read {len(df)} rows out of {rows}")
+            # Every backend has to hand the same frame to normalization
+            same = reference is None or df.equals(reference)
+            reference = df if reference is None else reference
+            print(f"{backend:<9} {suffix:<5} {seconds:.3f}s ({rows / seconds:,.0f} rows/s)"
+                  + ("" if same else "  ! differs from openpyxl"))
+
+        baseline = peak_memory(lambda: pd.read_excel(paths['.xlsx'], dtype=str))
+        peak = peak_memory(lambda: read_frame(paths['.xlsx'], UPLOAD_COLUMNS, backend='openpyxl'))
+        print(f"peak memory: read_frame {peak:.1f} MB, pandas.read_excel {baseline:.1f} MB"
+              + ("" if peak <= baseline else "  ! above pandas.read_excel"))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,101 @@
+# benchmarks/smtp_sink.py
+#
+# A minimal local SMTP server that accepts everything and throws the mail away.
+# python -m benchmarks.smtp_sink [port]
+
+import socketserver
+import sys
+import threading
+import time
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    # Pipelined replies go out one by one; with Nagle on they would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode('ascii') + b"\r\n")
+
+    def handle(self):
+        self.reply("220 sink ESMTP")
+        recipients = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-sink\r\n250-PIPELINING\r\n250-8BITMIME\r\n")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                # Any credentials are accepted; PLAIN may come without the initial response
+                if len(command.split()) == 2:
+                    self.reply("334 ")
+                    self.rfile.readline()
+                self.reply("235 Authentication succeeded")
+            elif verb == "MAIL":
+                recipients = 0
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients += 1
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    size += len(chunk)
+                self.server.record(recipients, size)
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        super().__init__((host, port), SinkHandler)
+        self.latency = latency
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, recipients, size):
+        with self._lock:
+            self.messages += 1
+            self.recipients += recipients
+            self.bytes += size
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        return False
+
+
+if __name__ == '__main__':
+    sink = SMTPSink(port=int(sys.argv[1]) if len(sys.argv) > 1 else 2525)
+    print(f"SMTP sink on 127.0.0.1:{sink.port}")
+    sink.serve_forever()
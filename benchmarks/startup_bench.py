@@ -0,0 +1,69 @@
+# benchmarks/startup_bench.py
+#
+# Cold start of a worker, each run in a fresh interpreter: importing run.py (which creates the app),
+# the first /login, and the first upload preview, which pays for pandas and openpyxl.
+# python -m benchmarks.startup_bench [--runs 5] [--rows 100]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.workbooks import write_workbook
+
+
+PROBE = r"""
+import json, sys, time
+
+start = time.perf_counter()
+import run
+imported = time.perf_counter()
+
+client = run.app.test_client()
+client.get('/login')
+login = time.perf_counter()
+heavy_after_login = [m for m in ('pandas', 'openpyxl') if m in sys.modules]
+
+with open(sys.argv[1], 'rb') as file:
+    client.post('/preview-excel', data={'contacts_file': (file, 'contacts.xlsx'), 'format': 'json'},
+                content_type='multipart/form-data')
+upload = time.perf_counter()
+
+print(json.dumps({
+    'import_seconds': imported - start,
+    'first_login_seconds': login - imported,
+    'first_upload_seconds': upload - login,
+    'heavy_after_login': heavy_after_login,
+}))
+"""
+
+
+def probe(path, env):
+    out = subprocess.run([sys.executable, '-c', PROBE, path], capture_output=True, text=True, check=True, env=env)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_workbook(os.path.join(tmp, 'contacts.xlsx'), args.rows)
+        # A private cache so that every run parses the upload instead of finding it on disk
+        env = dict(os.environ, DISK_CACHE_DIR=os.path.join(tmp, 'cache'), DISK_CACHE_MAX_BYTES='0')
+        runs = [probe(path, env) for _ in range(args.runs)]
+
+    print(f"runs: {args.runs}, upload rows: {args.rows}")
+    for key in ('import_seconds', 'first_login_seconds', 'first_upload_seconds'):
+        values = [run[key] for run in runs]
+        print(f"{key:<22} median {statistics.median(values) * 1000:7.1f} ms  (min {min(values) * 1000:.1f})")
+    print(f"loaded by /login:      {', '.join(runs[0]['heavy_after_login']) or 'nothing heavy'}")
+
+
+if __name__ == '__main__':
+    main()
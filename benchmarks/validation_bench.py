@@ -0,0 +1,65 @@
+# benchmarks/validation_bench.py
+#
+# python -m benchmarks.validation_bench [rows]
+
+import random
+import sys
+import time
+
+import pandas as pd
+
+from app.readers import EMAIL_RE, split_emails
+from app.validation import validate_contacts
+
+
+def make_frame(rows, seed=1):
+    rnd = random.Random(seed)
+    emails = []
+    for i in range(rows):
+        extra = rnd.randint(0, 3)
+        cells = [f"user{i}.{k}@mall{i % 500}.ru" for k in range(extra + 1)]
+        emails.append(rnd.choice([", ", "; ", " и ", " / "]).join(cells))
+    return pd.DataFrame({
+        'email': emails,
+        'name': '',
+        'mall': [f"Мега {i % 500}" for i in range(rows)],
+        'city': [f"Город {i % 50}" for i in range(rows)],
+        'rim': [str(i) for i in range(rows)],
+    }, index=range(2, rows + 2))
+
+
+def validate_with_iterrows(df):
+    # The per-row loop get_contacts_from_excel used before the vectorized stage
+    contacts = []
+    for idx, row in df.iterrows():
+        parts = split_emails(row['email'])
+        if not parts:
+            raise ValueError(f"❌ Строка {idx} не содержит email. Удалите её или заполните.")
+        for e in parts:
+            if not EMAIL_RE.match(e):
+                raise ValueError(f"❌ Неверный формат email: {e} в строке {idx}")
+        contacts.append({'email': parts[0], '_cc_emails': parts[1:]})
+    return contacts
+
+
+def measure(fn, df, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows=100_000):
+    df = make_frame(rows)
+    loop = measure(validate_with_iterrows, df)
+    vectorized = measure(validate_contacts, df)
+    print(f"rows: {rows}")
+    print(f"iterrows:   {loop:.3f}s ({rows / loop:,.0f} rows/s)")
+    print(f"vectorized: {vectorized:.3f}s ({rows / vectorized:,.0f} rows/s)")
+    print(f"speedup:    x{loop / vectorized:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,51 @@
+# benchmarks/workbooks.py
+#
+# Synthetic contact workbooks shaped like real campaign lists:
+# multi-address email cells and several rim rows per mall.
+
+import csv
+import random
+
+from openpyxl import Workbook
+
+
+HEADER = ['email', 'name', 'city', 'mall', 'rim', 'link', 'min', 'sec']
+SEPARATORS = [", ", "; ", " и ", " / ", " | "]
+
+
+def synthetic_rows(rows, malls=None, seed=1):
+    rnd = random.Random(seed)
+    malls = malls or max(1, rows // 4)
+    for i in range(rows):
+        mall = i % malls
+        city = mall % 60
+        cc = [f"manager{mall % 40}@uk{mall % 40}.ru" for _ in range(rnd.randint(0, 2))]
+        email = SEPARATORS[i % len(SEPARATORS)].join([f"reklama@mall{mall}.ru"] + cc)
+        yield [
+            email,
+            rnd.choice(["", "Анна", "Игорь", "Мария"]) if mall % 3 else "",
+            f"Город {city}",
+            f"Мега {mall}" if mall % 2 else f'ТРЦ "Вега {mall}"',
+            f"Экран {i % 7 + 1}",
+            f"https://example.com/rim/{i % 7 + 1}",
+            rnd.choice([10, 15, 20]),
+            rnd.choice([5, 10, 15]),
+        ]
+
+
+def write_workbook(path, rows, seed=1):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("contacts")
+    ws.append(HEADER)
+    for row in synthetic_rows(rows, seed=seed):
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+def write_csv(path, rows, seed=1, delimiter=';', encoding='utf-8-sig', malls=None):
+    with open(path, 'w', encoding=encoding, newline='') as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow(HEADER)
+        writer.writerows(synthetic_rows(rows, malls=malls, seed=seed))
+    return path
@@ -1,42 +1,104 @@
 # run.py
 
-import io
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from app.email_sender import send_emails, get_contacts_from_excel, pluralize
+import json
+import re
+from flask import Flask, Blueprint, render_template, request, jsonify, session, redirect, url_for, Response, \
+    stream_with_context, send_file
+from app.email_sender import prepare_contacts, pluralize
+from app.accounts import SenderAccount, send_sharded
+from app.dead_letters import DeadLetterFile
+from app.jobs import JobQueue
+from app.journal import campaign_key, get_journal
+from app.suppression import drop_suppressed, get_suppression_list, normalize_address
+from app.parse_cache import ParseCache
+from app.disk_cache import DISK_CACHE_DIR, FrameDiskCache
+from app.uploads import UPLOAD_MAX_BYTES, UPLOAD_MAX_ROWS, save_upload, discard_upload, start_reaper
+from app.templating import TemplateStore
+from app.metrics import registry
+from app.readers import READER_VERSION, UPLOAD_COLUMNS, read_frame
+from app.normalize import REQUIRED_COLUMNS, normalize_contacts
+from app.validation import ContactValidationError, MAX_REPORTED_ERRORS
 import os
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
 import traceback
-import pandas as pd
 
 load_dotenv()
 
-app = Flask(
-    __name__,
-    template_folder='app/templates',
-    static_folder='app/static'
-)
-app.config['UPLOAD_FOLDER'] = 'app/data'
-app.secret_key = os.urandom(24)
+views = Blueprint('views', __name__)
+
+# Startup settings: with gunicorn --preload, PRELOAD_DATA_STACK=1 imports pandas/openpyxl once in the
+# master so the forked workers share them instead of each importing them on its first upload
+PRELOAD_DATA_STACK = os.getenv("PRELOAD_DATA_STACK", "0") == "1"
+
+# Preview settings
+PREVIEW_PAGE_SIZE = int(os.getenv("PREVIEW_PAGE_SIZE", "200"))
+MAX_PREVIEW_PAGE_SIZE = 1000
+
+jobs = JobQueue()
+parse_cache = ParseCache()
+template_store = TemplateStore()
+
+
+def create_app(config=None):
+    # App factory; `gunicorn --preload "run:create_app()"` builds the app and reads the templates once
+    # in the master and forks the workers from it. Unless PRELOAD_DATA_STACK is set, pandas/openpyxl
+    # are only imported by the first upload
+    app = Flask(
+        __name__,
+        template_folder='app/templates',
+        static_folder='app/static'
+    )
+    # Oversized requests are refused before any of the body is read; save_upload enforces the exact limit
+    app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024 if UPLOAD_MAX_BYTES else None
+    # A fixed key keeps sessions valid across workers and restarts
+    app.secret_key = os.getenv("SECRET_KEY") or os.urandom(24)
+    app.config.update(config or {})
+    app.register_blueprint(views)
+
+    # Parsed uploads are shared between workers through this directory; set per app rather than at
+    # import so a test app keeps them out of the working tree
+    parse_cache.store = FrameDiskCache(app.config.get('DISK_CACHE_DIR', DISK_CACHE_DIR), version=READER_VERSION)
+
+    template_store.preload()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    if PRELOAD_DATA_STACK:
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+    return app
+
+
+def parse_upload(path):
+    return read_frame(path, UPLOAD_COLUMNS, max_rows=UPLOAD_MAX_ROWS)
+
+
+def load_upload(file):
+    # The upload is streamed to its own temp file and hashed on the way; the file is only
+    # parsed when these bytes are in neither cache, and is removed right after
+    # Started here rather than at import: a thread started in a preloading master would not survive the fork
+    start_reaper()
+    token, path = save_upload(file.stream, file.filename)
+    try:
+        return parse_cache.get_or_load(token, lambda: parse_upload(path))
+    finally:
+        discard_upload(path)
 
 
-@app.route('/')
+@views.route('/')
 def index():
     if 'MY_ADDRESS' not in session or 'PASSWORD' not in session:
-        return redirect(url_for('login'))
-
-    templates = {
-        'check': open('app/email_templates/check.txt', 'r', encoding='utf-8').read(),
-        'check_rim': open('app/email_templates/check_rim.txt', 'r', encoding='utf-8').read(),
-        'confirm': open('app/email_templates/confirm.txt', 'r', encoding='utf-8').read(),
-        'new_rim': open('app/email_templates/new_rim.txt', 'r', encoding='utf-8').read(),
-        'close': open('app/email_templates/close.txt', 'r', encoding='utf-8').read(),
-        'media': open('app/email_templates/media.txt', 'r', encoding='utf-8').read()
-    }
-    return render_template('index.html', templates=templates, default_template=templates['new_rim'])
+        return redirect(url_for('.login'))
+
+    return render_index()
+
 
+def render_index(sender_error=None, status_code=200):
+    templates = template_store.all()
+    return render_template('index.html', templates=templates, default_template=templates['new_rim'],
+                           senders=session.get('SENDERS', []), sender_error=sender_error), status_code
 
-@app.route('/login', methods=['GET', 'POST'])
+
+@views.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         display_name = request.form.get('display_name', '').strip()
@@ -50,79 +112,171 @@ def login():
             session['MY_ADDRESS'] = email
             session['PASSWORD'] = password
             session['DISPLAY_NAME'] = display_name
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         return render_template('login.html', error="Заполните оба поля")
     return render_template('login.html')
 
 
-@app.route('/logout')
+@views.route('/senders', methods=['POST'])
+def add_sender():
+    # Extra mailboxes a campaign is sharded across, next to the one used to log in
+    if 'MY_ADDRESS' not in session or 'PASSWORD' not in session:
+        return redirect(url_for('.login'))
+
+    address = request.form.get('email', '').strip()
+    known = [session['MY_ADDRESS']] + [s['address'] for s in session.get('SENDERS', [])]
+    if address in known:
+        return render_index(sender_error="❌ Этот ящик уже добавлен", status_code=400)
+    try:
+        sender = SenderAccount(
+            address,
+            request.form.get('password', ''),
+            request.form.get('display_name', '').strip() or session.get('DISPLAY_NAME'),
+            weight=request.form.get('weight') or 1,
+            daily_quota=request.form.get('daily_quota') or 0
+        )
+    except ValueError as e:
+        return render_index(sender_error=str(e), status_code=400)
+
+    session['SENDERS'] = session.get('SENDERS', []) + [sender.to_dict()]
+    return redirect(url_for('.index'))
+
+
+@views.route('/senders/remove', methods=['POST'])
+def remove_sender():
+    address = request.form.get('email', '')
+    session['SENDERS'] = [s for s in session.get('SENDERS', []) if s['address'] != address]
+    return redirect(url_for('.index'))
+
+
+@views.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 
-@app.route('/preview-excel', methods=['POST'])
+@views.route('/preview-excel', methods=['POST'])
 def preview_excel():
+    # format=json returns the first page of rows; the rest is fetched from /preview/<token>
+    as_json = request.values.get('format') == 'json'
     file = request.files.get('contacts_file')
     if not file:
+        if as_json:
+            return jsonify({'errors': ["❌ Файл не загружен."]}), 400
         return "❌ Файл не загружен.", 400
 
-    ALLOWED_COLUMNS = ["email", "name", "city", "mall", "rim", "link", "min", "sec"]
-
     try:
-        df = pd.read_excel(io.BytesIO(file.read()))
-        df = df[[col for col in df.columns if col in ALLOWED_COLUMNS]]
-        df = df.fillna('').astype(str).apply(lambda x: x.str.strip())
-
-        # Check required columns BEFORE dropping any empty columns
-        required_columns = {"email", "mall", "city"}
-        missing_columns = required_columns - set(df.columns)
-        if missing_columns:
-            return f"<div style='color:red;'>❌ В файле отсутствуют обязательные столбцы: {', '.join(missing_columns)}</div>", 400
-
-        # Drop only non-required columns that are entirely empty
-        cols_to_drop = [c for c in df.columns if c not in required_columns and df[c].eq('').all()]
-        if cols_to_drop:
-            df = df.drop(columns=cols_to_drop)
-
-        # Validate rows: email must not be empty
-        if df['email'].eq('').any():
-            return "<div style='color:red;'>❌ В файле есть строки без email. Удалите их или заполните.</div>", 400
-
+        try:
+            token, frame = load_upload(file)
+        except ValueError as e:
+            if as_json:
+                return jsonify({'errors': [str(e)]}), 400
+            return f"<div style='color:red;'>{str(e)}</div>", 400
         add_prefix = request.form.get('add_tc_prefix', 'true').lower() == 'true'
 
-        if 'mall' in df.columns:
-            def fix_mall(value):
-                if not value:
-                    return ''
-                prefixes = ("ТЦ", "ТРЦ", "ТРК", "ТД", "ТК")
-                if any(value.startswith(prefix) for prefix in prefixes):
-                    return value
-                return f"ТЦ {value}" if add_prefix else value
-            df['mall'] = df['mall'].str.replace('"', '', regex=False)
-            df['mall'] = df['mall'].apply(fix_mall)
-
-        # Ensure 'name' exists, then default blanks
-        if 'name' not in df.columns:
-            df['name'] = ''
-        df.loc[df['name'] == '', 'name'] = 'Коллеги'
+        try:
+            df = preview_frame(token, frame, add_prefix)
+        except ContactValidationError as e:
+            if as_json:
+                return jsonify({'errors': validation_error_lines(e.errors)}), 400
+            return validation_errors_html(e.errors), 400
+        except ValueError as e:
+            if as_json:
+                return jsonify({'errors': [str(e)]}), 400
+            return f"<div style='color:red;'>{str(e)}</div>", 400
+
+        if as_json:
+            page = preview_page(df, 0, PREVIEW_PAGE_SIZE)
+            first_row = df.iloc[0] if not df.empty else {}
+            page.update(token=token, first_row={'mall': first_row.get('mall', ''), 'city': first_row.get('city', '')},
+                        errors=[])
+            return jsonify(page)
 
         if 'rim' in df.columns:
-            df = (df.groupby(['city', 'mall', 'email', 'name'], as_index=False)
-                  .agg({'rim': lambda x: '\n'.join(map(str, x))}))
-            df['rim'] = df['rim'].astype(str).str.replace('\n', '<br>', regex=False)
+            df = df.assign(rim=df['rim'].str.replace('\n', '<br>', regex=False))
 
         first_row = df.iloc[0].to_dict() if not df.empty else {}
         attrs = f'data-mall="{first_row.get("mall", "")}" data-city="{first_row.get("city", "")}"' if first_row else ""
 
         table_html = df.to_html(classes="preview-table", index=False, escape=False)
-        return f'<div id="first-row-data" {attrs} style="display:none;"></div>' + table_html
+        return f'<div id="first-row-data" data-token="{token}" {attrs} style="display:none;"></div>' + table_html
 
     except Exception as e:
+        if as_json:
+            return jsonify({'errors': [f"❌ Ошибка при чтении файла: {str(e)}"]}), 500
         return f"<div style='color:red;'>❌ Ошибка при чтении файла: {str(e)}</div>"
 
 
-@app.route('/send-emails', methods=['POST'])
+@views.route('/preview/<token>')
+def preview_rows(token):
+    # Rows of an already uploaded sheet, page by page, for the virtualized preview table
+    if 'MY_ADDRESS' not in session:
+        return jsonify({'errors': ["❌ Сессия истекла. Войдите снова."]}), 401
+    add_prefix = request.args.get('add_tc_prefix', 'true').lower() == 'true'
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', PREVIEW_PAGE_SIZE, type=int)), MAX_PREVIEW_PAGE_SIZE)
+
+    frame = parse_cache.get(token)
+    if frame is None:
+        return jsonify({'errors': ["❌ Превью устарело. Загрузите файл заново."]}), 404
+    try:
+        df = preview_frame(token, frame, add_prefix)
+    except ContactValidationError as e:
+        return jsonify({'errors': validation_error_lines(e.errors)}), 400
+    except ValueError as e:
+        return jsonify({'errors': [str(e)]}), 400
+    return jsonify(preview_page(df, offset, limit))
+
+
+def normalized_contacts(token, frame, add_prefix):
+    # Preview and send share one normalized frame per upload and prefix setting
+    key = f"{token}:{'prefix' if add_prefix else 'plain'}"
+    df = parse_cache.get(key)
+    if df is None:
+        df = parse_cache.put(key, normalize_contacts(frame, add_prefix=add_prefix))
+    return df
+
+
+def preview_frame(token, frame, add_prefix):
+    key = f"{token}:{'prefix' if add_prefix else 'plain'}:preview"
+    df = parse_cache.get(key)
+    if df is None:
+        df = parse_cache.put(key, preview_table(normalized_contacts(token, frame, add_prefix)))
+    return df
+
+
+def preview_table(df):
+    df = df.copy()
+    df['cc'] = df.pop('_cc_emails').map(', '.join)
+
+    # Drop only non-required columns that are entirely empty
+    cols_to_drop = [c for c in df.columns if c not in REQUIRED_COLUMNS and df[c].eq('').all()]
+    return df.drop(columns=cols_to_drop).reset_index(drop=True)
+
+
+def preview_page(df, offset, limit):
+    page = df.iloc[offset:offset + limit]
+    return {
+        'columns': list(df.columns),
+        'total': len(df),
+        'offset': offset,
+        'rows': page.to_numpy().tolist()
+    }
+
+
+def validation_error_lines(errors):
+    lines = []
+    if any(e['error'] == 'missing' for e in errors):
+        lines.append("❌ В файле есть строки без email. Удалите их или заполните.")
+    lines += [e['message'] for e in errors if e['error'] != 'missing'][:MAX_REPORTED_ERRORS]
+    return lines
+
+
+def validation_errors_html(errors):
+    return "<div style='color:red;'>" + "<br>".join(validation_error_lines(errors)) + "</div>"
+
+
+@views.route('/send-emails', methods=['POST'])
 def send():
     display_name = session.get("DISPLAY_NAME")
     my_address = session.get("MY_ADDRESS")
@@ -137,38 +291,179 @@ def send():
 
     cc_addresses = [email.strip() for email in request.form.get('cc_list', '').split(',') if email.strip()]
 
-    uploaded_file = request.files.get('contacts_file')
-    if not uploaded_file or uploaded_file.filename == '':
-        return render_template("status.html", status="❌ Файл не загружен.")
+    # The preview step already parsed this file; its token saves a second upload and parse
+    token = request.form.get('contacts_token', '').strip()
+    frame = parse_cache.get(token) if token else None
+    if frame is None:
+        uploaded_file = request.files.get('contacts_file')
+        if not uploaded_file or uploaded_file.filename == '':
+            return render_template("status.html", status="❌ Файл не загружен.")
+        try:
+            token, frame = load_upload(uploaded_file)
+        except ValueError as e:
+            return render_template("status.html", status=str(e))
+        except Exception as e:
+            return render_template("status.html", status=f"❌ Ошибка при чтении файла: {str(e)}")
 
-    filename = secure_filename(uploaded_file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    uploaded_file.save(file_path)
     template_text = request.form.get('message_template', '')
+    resume = request.form.get('resume', 'false').lower() == 'true'
+    add_prefix = request.form.get('add_tc_prefix', 'false').lower() == 'true'
 
     if not display_name and my_address:
         display_name = my_address.split('@')[0].replace('.', ' ').title()
 
-    try:
-        contacts = get_contacts_from_excel(file_path, template_text=template_text, doc=doc)
-        send_emails(
-            my_address=my_address,
-            password=password,
-            contacts=contacts,
-            cc_addresses=cc_addresses,
-            brand=brand,
-            period=period,
-            doc=doc,
-            template_text=template_text,
-            display_name=display_name
-        )
-        count = len(contacts)
-        word = pluralize(count, ("адрес", "адреса", "адресов"))
-        status = f"✅ Письма успешно отправлены на {count} {word}."
-    except Exception as e:
-        status = f"❌ Ошибка: {str(e)}"
-    return render_template("status.html", status=status)
+    job = jobs.submit(
+        run_campaign,
+        owner=my_address,
+        token=token,
+        frame=frame,
+        add_prefix=add_prefix,
+        my_address=my_address,
+        password=password,
+        cc_addresses=cc_addresses,
+        brand=brand,
+        period=period,
+        doc=doc,
+        template_text=template_text,
+        display_name=display_name,
+        resume=resume,
+        senders=session.get('SENDERS', [])
+    )
+    return render_template("status.html", status="⏳ Рассылка поставлена в очередь...", job_id=job.id), 202
+
+
+def run_campaign(job, token, frame, add_prefix, my_address, password, cc_addresses, brand, period, doc, template_text,
+                 display_name, resume=False, senders=()):
+    df = normalized_contacts(token, frame, add_prefix)
+    # Keyed on the list before suppression: bounces recorded by the first run must not change the id
+    # a resumed run looks its deliveries up by
+    campaign_id = campaign_key(my_address, df[['email', 'city', 'mall']].to_dict(orient='records'), cc_addresses,
+                               brand, period, doc, template_text)
+    suppression = get_suppression_list()
+    df, suppressed = drop_suppressed(df, suppression)
+    # The form's CC goes on every letter; a suppressed one counts once
+    kept_cc = [address for address in cc_addresses if normalize_address(address) not in suppression.emails]
+    suppressed += len(cc_addresses) - len(kept_cc)
+    contacts = prepare_contacts(df, template_text=template_text, doc=doc)
+    accounts = [SenderAccount(my_address, password, display_name)] + [SenderAccount.from_dict(s) for s in senders]
+    job.update(total=len(contacts))
+    report = send_sharded(
+        accounts,
+        contacts,
+        cc_addresses=kept_cc,
+        brand=brand,
+        period=period,
+        doc=doc,
+        template_text=template_text,
+        on_result=job.record,
+        journal=get_journal(),
+        resume=resume,
+        campaign_id=campaign_id,
+        dead_letters=DeadLetterFile.for_job(job.id),
+        suppression=suppression
+    )
+    count = report.sent
+    word = pluralize(count, ("адрес", "адреса", "адресов"))
+    status = f"✅ Письма успешно отправлены на {count} {word}."
+    if report.skipped:
+        status += f" Пропущено уже отправленных ранее: {report.skipped}."
+    if suppressed:
+        status += f" Исключено адресов из стоп-листа: {suppressed}."
+    if report.failed:
+        status += f" Не доставлено: {report.failed}, список с причинами: /jobs/{job.id}/dead-letters"
+    if len(accounts) > 1:
+        lines = []
+        for address, counts in report.per_account().items():
+            line = f"{address}: {counts['sent']}"
+            if counts['error']:
+                line += f" (❌ {counts['error']})"
+            lines.append(line)
+        status += " По ящикам: " + "; ".join(lines) + "."
+    return status
+
+
+def owned_job(job_id):
+    # Only the mailbox that started a job sees it: its status names the sender mailboxes and
+    # counts every recipient's outcome
+    job = jobs.get(job_id)
+    if job is None or job.owner != session.get('MY_ADDRESS'):
+        return None
+    return job
+
+
+@views.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'MY_ADDRESS' not in session:
+        return jsonify({'error': "❌ Сессия истекла. Войдите снова."}), 401
+    job = owned_job(job_id)
+    if not job:
+        return jsonify({'error': "❌ Задача не найдена."}), 404
+    return jsonify(job.to_dict())
+
+
+@views.route('/jobs/<job_id>/dead-letters')
+def job_dead_letters(job_id):
+    # CSV of the recipients the campaign gave up on, with the server's reasons
+    if 'MY_ADDRESS' not in session:
+        return redirect(url_for('.login'))
+    # Job ids are uuid4 hex; anything else never reaches the filesystem. The file outlives the job
+    # in memory; while the job is known, only its owner gets it
+    dead_letters = DeadLetterFile.for_job(job_id) if re.fullmatch(r'[0-9a-f]{32}', job_id) else None
+    if jobs.get(job_id) is not None and owned_job(job_id) is None:
+        dead_letters = None
+    if dead_letters is None or not os.path.exists(dead_letters.path):
+        return jsonify({'error': "❌ Недоставленных писем нет."}), 404
+    return send_file(os.path.abspath(dead_letters.path), mimetype='text/csv', as_attachment=True,
+                     download_name=f"dead-letters-{job_id}.csv")
+
+
+@views.route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    if 'MY_ADDRESS' not in session:
+        return jsonify({'error': "❌ Сессия истекла. Войдите снова."}), 401
+    job = owned_job(job_id)
+    if not job:
+        return jsonify({'error': "❌ Задача не найдена."}), 404
+
+    def events():
+        version = None
+        while True:
+            version = job.wait_for_change(version, timeout=15)
+            yield f"data: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            if job.finished:
+                break
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@views.app_errorhandler(413)
+def upload_too_large(e):
+    # The form body is never parsed here, so only the query string can ask for JSON
+    message = f"❌ Файл слишком большой: больше {UPLOAD_MAX_BYTES // (1024 * 1024)} МБ"
+    if request.args.get('format') == 'json':
+        return jsonify({'errors': [message]}), 413
+    return render_template("status.html", status=message), 413
+
+
+@views.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+_app = None
+
+
+def __getattr__(name):
+    # run.app for servers and tests that want an app object, built on first use: importing run
+    # for `gunicorn "run:create_app()"` must not build a second one
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file